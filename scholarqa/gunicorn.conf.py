@@ -0,0 +1,34 @@
+"""
+Configuración de gunicorn para ScholarQA
+
+Uso: gunicorn -c gunicorn.conf.py
+"""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from utils.config import Config
+
+wsgi_app = "wsgi:app"
+pythonpath = str(Path(__file__).parent / 'src')
+bind = f"{Config.FLASK_HOST}:{Config.FLASK_PORT}"
+
+# Cargar modelos una sola vez en el maestro antes de hacer fork
+preload_app = True
+
+# Cada worker abre su propia copia del índice de ChromaDB, por lo que la
+# concurrencia se obtiene principalmente con hilos dentro de un proceso
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = "gthread"
+
+# La primera carga (modelos + índice) puede tardar
+timeout = 300
+
+
+def post_fork(server, worker):
+    """Arranca los hilos de fondo propios de cada worker"""
+    import wsgi
+    wsgi.restart_background_threads()
@@ -27,7 +27,11 @@ def main():
     print("\n1️⃣  Inicializando componentes...")
     processor = PDFProcessor()
     embedding_engine = EmbeddingEngine("sentence-transformers/all-MiniLM-L6-v2")
-    vector_store = VectorStore("temp_vector_store", "test_collection")
+    vector_store = VectorStore(
+        "temp_vector_store",
+        "test_collection",
+        embedding_engine=embedding_engine
+    )
     
     print("   ✓ Componentes inicializados")
     
@@ -114,6 +114,50 @@ def download_embedding_model():
         return False
 
 
+def export_onnx_embedding_model():
+    """Exporta el modelo de embeddings a ONNX con cuantización dinámica INT8"""
+    print("\n⚡ Exportando modelo de embeddings a ONNX (INT8)...")
+    
+    onnx_path = Path("models/downloaded/minilm.onnx")
+    if onnx_path.exists():
+        print(f"  ✓ {onnx_path} ya existe")
+        return True
+    
+    try:
+        import platform
+        import tempfile
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        
+        model_name = "sentence-transformers/all-MiniLM-L6-v2"
+        
+        with tempfile.TemporaryDirectory() as export_dir:
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            quantizer = ORTQuantizer.from_pretrained(model)
+            # Kernels int8 de la arquitectura del equipo (VNNI en x86, dot en ARM)
+            if platform.machine().lower() in ("arm64", "aarch64"):
+                quantization_config = AutoQuantizationConfig.arm64(
+                    is_static=False,
+                    per_channel=False
+                )
+            else:
+                quantization_config = AutoQuantizationConfig.avx512_vnni(
+                    is_static=False,
+                    per_channel=False
+                )
+            quantizer.quantize(save_dir=export_dir, quantization_config=quantization_config)
+            
+            onnx_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(Path(export_dir) / "model_quantized.onnx", onnx_path)
+        
+        print(f"  ✓ Modelo cuantizado guardado en {onnx_path}")
+        return True
+    except Exception as e:
+        print(f"  ⚠️  Error exportando a ONNX: {e}")
+        print("  Se usará Sentence Transformers (PyTorch) para los embeddings")
+        return False
+
+
 def show_llm_instructions():
     """Muestra instrucciones para descargar modelos LLM"""
     print("\n🦙 Modelos LLM Locales")
@@ -237,7 +281,8 @@ def main():
     
     if deps_ok:
         # Descargar modelo de embeddings
-        download_embedding_model()
+        if download_embedding_model():
+            export_onnx_embedding_model()
     
     # Mostrar instrucciones para LLM
     show_llm_instructions()
@@ -189,7 +189,9 @@ def performance_test():
         
         # Test de embeddings
         print("  Probando motor de embeddings...")
-        engine = EmbeddingEngine(Config.EMBEDDING_MODEL, batch_size=32)
+        engine = EmbeddingEngine(Config.EMBEDDING_MODEL, batch_size=Config.EMBEDDING_BATCH_SIZE)
+        engine.autotune_batch_size(Config.get_batch_size_cache_path())
+        print(f"    ✓ batch_size ajustado: {engine.batch_size}")
         
         test_texts = [f"Test text number {i}" for i in range(50)]
         
@@ -3,18 +3,36 @@ Aplicación web Flask para ScholarQA
 """
 
 from flask import Flask, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from collections import OrderedDict
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import logging
+import queue
+import shutil
 import sys
+import threading
+import uuid
+
+try:
+    import orjson
+except ImportError:  # Opcional: sin orjson se usa el json de Flask
+    orjson = None
 
 # Añadir src al path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from core.pdf_processor import PDFProcessor
+from core.pdf_processor import PDFProcessor, parse_parser_rules
 from core.embeddings import EmbeddingEngine
 from core.vector_store import VectorStore
 from core.llm_engine import LLMEngine
+from core.reranker import Reranker
+from core.semantic_cache import SemanticCache
+from core.exact_cache import ExactCache
+from core.embed_batcher import EmbedBatcher
+from core.cache_manager import CacheManager
 from utils.config import Config
 
 # Configurar logging
@@ -24,8 +42,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Serializa las respuestas con orjson (Rust) en lugar del json estándar"""
+    
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson else 0
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Construye la respuesta de jsonify directamente con los bytes de orjson"""
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.options | orjson.OPT_APPEND_NEWLINE
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
+
 # Crear aplicación Flask
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
 
@@ -34,31 +79,52 @@ pdf_processor = None
 embedding_engine = None
 vector_store = None
 llm_engine = None
-initialization_lock = False  # Para evitar inicializaciones concurrentes
+reranker = None
+semantic_cache = None
+exact_cache = None
+embed_batcher = None
+ingest_batcher = None
+_init_lock = threading.Lock()  # Evita inicializaciones concurrentes
+_init_done = threading.Event()  # Se activa cuando los componentes están listos
+INIT_TIMEOUT = 120  # segundos que una petición espera a otra inicialización
+UPLOAD_COPY_BUFFER = 1024 * 1024  # bytes por lectura al volcar un PDF subido
+
+# Indexación de PDFs en segundo plano: /api/upload responde 202 con un job_id
+# y el cliente consulta /api/jobs/<job_id> hasta que termina
+MAX_FINISHED_JOBS = 100  # trabajos terminados que se conservan para consulta
+_upload_executor = ThreadPoolExecutor(max_workers=Config.UPLOAD_WORKERS, thread_name_prefix="upload")
+_jobs: "OrderedDict[str, dict]" = OrderedDict()
+_jobs_lock = threading.Lock()
 
 
-def initialize_components():
-    """Inicializa los componentes de IA (lazy loading)"""
-    global pdf_processor, embedding_engine, vector_store, llm_engine, initialization_lock
+def initialize_components(timeout: float = INIT_TIMEOUT):
+    """
+    Inicializa los componentes de IA (lazy loading)
     
-    # Si ya están inicializados, no hacer nada
-    if pdf_processor is not None and embedding_engine is not None and vector_store is not None:
-        return
+    Solo un hilo carga los modelos; el resto se bloquea en el lock (sin
+    sondeo) y sale en cuanto termina. Si la carga falla, el siguiente
+    hilo en adquirir el lock lo reintenta.
     
-    # Evitar inicializaciones concurrentes
-    if initialization_lock:
-        logger.info("Inicialización en progreso, esperando...")
-        import time
-        max_wait = 120  # Esperar máximo 120 segundos (descarga de modelos)
-        waited = 0
-        while initialization_lock and waited < max_wait:
-            time.sleep(1)
-            waited += 1
-        if initialization_lock:
-            raise RuntimeError("Timeout esperando inicialización de componentes")
+    Args:
+        timeout: Espera máxima por una inicialización en curso (segundos)
+    """
+    # Camino rápido sin bloqueo una vez inicializado
+    if _init_done.is_set():
         return
     
-    initialization_lock = True
+    if not _init_lock.acquire(timeout=timeout):
+        raise RuntimeError(f"Los componentes no se inicializaron en {timeout}s")
+    try:
+        if not _init_done.is_set():
+            _initialize_components()
+            _init_done.set()
+    finally:
+        _init_lock.release()
+
+
+def _initialize_components():
+    """Carga los componentes (llamar con _init_lock adquirido)"""
+    global pdf_processor, embedding_engine, vector_store, llm_engine, reranker, semantic_cache, exact_cache, embed_batcher, ingest_batcher
     
     try:
         logger.info("Inicializando componentes...")
@@ -68,52 +134,352 @@ def initialize_components():
         temp_embedding_engine = None
         temp_vector_store = None
         temp_llm_engine = None
-        
-        # Inicializar PDF Processor
-        logger.info("Inicializando PDF Processor...")
-        temp_pdf_processor = PDFProcessor()
-        logger.info("✓ PDF Processor inicializado")
-        
-        # Inicializar Embedding Engine
-        logger.info(f"Inicializando Embedding Engine: {Config.EMBEDDING_MODEL}")
-        temp_embedding_engine = EmbeddingEngine(Config.EMBEDDING_MODEL)
-        logger.info("✓ Embedding Engine inicializado")
-        
-        # Inicializar Vector Store
-        vector_store_path = Config.get_vector_store_path()
-        logger.info(f"Inicializando Vector Store en: {vector_store_path}")
-        temp_vector_store = VectorStore(
-            str(vector_store_path),
-            Config.COLLECTION_NAME
-        )
-        logger.info("✓ Vector Store inicializado")
-        
-        # LLM es opcional
-        try:
-            llm_model_path = Config.get_llm_model_path()
-            logger.info(f"Inicializando LLM Engine: {llm_model_path}")
-            temp_llm_engine = LLMEngine(str(llm_model_path))
-            logger.info("✓ LLM Engine inicializado")
-        except FileNotFoundError as e:
-            logger.warning(f"Modelo LLM no disponible: {e}")
-            temp_llm_engine = None
-        except Exception as e:
-            logger.error(f"Error inicializando LLM Engine: {e}", exc_info=True)
-            temp_llm_engine = None
+        temp_reranker = None
+        temp_semantic_cache = None
+        temp_exact_cache = None
+        temp_embed_batcher = None
+        temp_ingest_batcher = None
+        
+        # Los modelos y ChromaDB se cargan en paralelo: el tiempo total es el
+        # del componente más lento y no la suma de todos
+        with ThreadPoolExecutor(max_workers=5, thread_name_prefix="init") as executor:
+            f_llm = executor.submit(_load_llm_engine)
+            f_rerank = executor.submit(_load_reranker) if Config.RERANKER_ENABLED else None
+            f_emb = executor.submit(_load_embedding_engine)
+            f_vs = executor.submit(_load_vector_store, f_emb)
+            f_pdf = executor.submit(
+                PDFProcessor,
+                max_workers=Config.MAX_WORKERS,
+                parser_rules=parse_parser_rules(Config.PDF_PARSER_RULES),
+                cache=_create_pdf_cache()
+            )
+            
+            temp_pdf_processor = f_pdf.result()
+            logger.info("✓ PDF Processor inicializado")
+            temp_embedding_engine = f_emb.result()
+            temp_vector_store = f_vs.result()
+            temp_llm_engine = f_llm.result()
+            temp_reranker = f_rerank.result() if f_rerank is not None else None
+        
+        temp_embed_batcher, temp_ingest_batcher = create_embed_batchers(temp_embedding_engine)
+        
+        # Cachés de respuestas: exacta (sin embedding) y semántica
+        if Config.ENABLE_CACHE:
+            temp_exact_cache = ExactCache(
+                maxsize=Config.EXACT_CACHE_SIZE,
+                ttl=Config.CACHE_TTL
+            )
+            temp_semantic_cache = SemanticCache(
+                temp_embedding_engine.dimension,
+                ttl=Config.CACHE_TTL_DAYS * 86400,
+                persist_path=Config.get_semantic_cache_path(),
+                index_version=temp_vector_store.get_collection_count()
+            )
         
         # Asignar a variables globales solo si todo fue exitoso
         pdf_processor = temp_pdf_processor
         embedding_engine = temp_embedding_engine
         vector_store = temp_vector_store
         llm_engine = temp_llm_engine
+        reranker = temp_reranker
+        semantic_cache = temp_semantic_cache
+        exact_cache = temp_exact_cache
+        embed_batcher = temp_embed_batcher
+        ingest_batcher = temp_ingest_batcher
             
         logger.info("✓ Todos los componentes inicializados correctamente")
         
     except Exception as e:
         logger.error(f"Error crítico inicializando componentes: {e}", exc_info=True)
         raise
+
+
+def create_embed_batchers(engine: EmbeddingEngine) -> Tuple[EmbedBatcher, EmbedBatcher]:
+    """
+    Crea los agrupadores de embeddings de preguntas y de ingesta
+    
+    Son independientes para que los lotes grandes de la ingesta no retrasen
+    las preguntas; el de ingesta une los chunks de todas las subidas en curso.
+    
+    Args:
+        engine: Motor de embeddings compartido
+        
+    Returns:
+        Tupla (batcher de preguntas, batcher de ingesta)
+    """
+    questions = EmbedBatcher(
+        engine,
+        max_batch_size=Config.EMBED_BATCH_SIZE,
+        max_wait_ms=Config.EMBED_BATCH_WAIT_MS
+    )
+    ingest = EmbedBatcher(
+        engine,
+        max_batch_size=Config.INGEST_EMBED_BATCH_SIZE,
+        max_wait_ms=Config.INGEST_EMBED_WAIT_MS
+    )
+    return questions, ingest
+
+
+def _create_pdf_cache() -> Optional[CacheManager]:
+    """Caché de páginas extraídas por hash de contenido (None si ENABLE_CACHE=False)"""
+    if not Config.ENABLE_CACHE:
+        return None
+    return CacheManager(
+        Config.get_pdf_cache_dir(),
+        ttl=Config.PDF_CACHE_TTL_DAYS * 86400,
+        max_memory_items=32  # cada entrada es el texto completo de un PDF
+    )
+
+
+def _load_embedding_engine() -> EmbeddingEngine:
+    """Carga el modelo de embeddings y ajusta su batch_size"""
+    logger.info(f"Inicializando Embedding Engine: {Config.EMBEDDING_MODEL}")
+    engine = EmbeddingEngine(
+        Config.EMBEDDING_MODEL,
+        batch_size=Config.EMBEDDING_BATCH_SIZE,
+        normalize_embeddings=Config.NORMALIZE_EMBEDDINGS,
+        onnx_path=str(Config.get_embedding_onnx_path()),
+        use_bettertransformer=Config.EMBEDDING_BETTERTRANSFORMER,
+        compile_model=Config.EMBEDDING_COMPILE,
+        cache_size=Config.EMBEDDING_CACHE_SIZE
+    )
+    if Config.EMBEDDING_COMPILE:
+        # La compilación ocurre en la primera inferencia: pagarla al arrancar
+        engine.warm_up()
+    if Config.AUTOTUNE_BATCH_SIZE:
+        engine.autotune_batch_size(Config.get_batch_size_cache_path())
+    logger.info("✓ Embedding Engine inicializado")
+    return engine
+
+
+def _load_vector_store(embedding_engine_future: Future) -> VectorStore:
+    """Abre ChromaDB con el motor de embeddings en cuanto esté cargado"""
+    vector_store_path = Config.get_vector_store_path()
+    logger.info(f"Inicializando Vector Store en: {vector_store_path}")
+    store = VectorStore(
+        str(vector_store_path),
+        Config.COLLECTION_NAME,
+        hnsw_m=Config.HNSW_M,
+        hnsw_construction_ef=Config.HNSW_EF_CONSTRUCTION,
+        hnsw_search_ef=Config.HNSW_EF_SEARCH,
+        hnsw_sync_threshold=Config.HNSW_SYNC_THRESHOLD,
+        embedding_engine=embedding_engine_future.result(),
+        rescore_candidates=Config.RESCORE_CANDIDATES,
+        cache_tokens=Config.CACHE_TOKENS
+    )
+    store.warm_up()
+    logger.info("✓ Vector Store inicializado")
+    return store
+
+
+def _load_reranker() -> Reranker:
+    """Carga el cross-encoder que reordena los chunks recuperados"""
+    logger.info(f"Inicializando Reranker: {Config.RERANKER_MODEL}")
+    engine = Reranker(Config.RERANKER_MODEL, batch_size=Config.RERANK_BATCH_SIZE)
+    logger.info("✓ Reranker inicializado")
+    return engine
+
+
+def _load_llm_engine() -> Optional[LLMEngine]:
+    """Carga el LLM (opcional: devuelve None si no está disponible)"""
+    try:
+        llm_model_path = Config.get_llm_model_path()
+        logger.info(f"Inicializando LLM Engine: {llm_model_path}")
+        engine = LLMEngine(
+            str(llm_model_path),
+            n_ctx=Config.N_CTX,
+            n_gpu_layers=Config.N_GPU_LAYERS,
+            n_batch=Config.N_BATCH,
+            use_mlock=Config.LLM_USE_MLOCK
+        )
+        logger.info("✓ LLM Engine inicializado")
+        return engine
+    except FileNotFoundError as e:
+        logger.warning(f"Modelo LLM no disponible: {e}")
+    except Exception as e:
+        logger.error(f"Error inicializando LLM Engine: {e}", exc_info=True)
+    return None
+
+
+def _produce_chunk_batches(filepath: Path, batch_queue: queue.Queue,
+                           cancel: threading.Event):
+    """
+    Extrae y divide el PDF página a página, encolando lotes de chunks
+    
+    Args:
+        filepath: Ruta al PDF
+        batch_queue: Cola acotada hacia el consumidor (None marca el final)
+        cancel: Evento para abortar si el consumidor falla
+    """
+    try:
+        batch = []
+        pages = pdf_processor.iter_pages(filepath, workers=Config.MAX_WORKERS)
+        for chunk in pdf_processor.iter_chunks(pages, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP):
+            if cancel.is_set():
+                return
+            
+            batch.append(chunk)
+            if len(batch) >= Config.CHROMA_BATCH_SIZE:
+                batch_queue.put(batch)
+                batch = []
+        
+        if batch:
+            batch_queue.put(batch)
     finally:
-        initialization_lock = False
+        batch_queue.put(None)
+
+
+def _ingest_pdf(filepath: Path, filename: str) -> Tuple[int, int, Dict]:
+    """
+    Indexa un PDF en tres etapas solapadas
+    
+    Un hilo extrae y divide páginas, el hilo que llama codifica cada
+    lote y otro hilo lo inserta en el vector store mientras se codifica el
+    siguiente. Cuando el documento supera PARALLEL_ENCODE_THRESHOLD chunks,
+    el resto se agrupa en bloques de ese tamaño que se codifican en varios
+    procesos. Los metadatos se leen de los que cacheó el productor al abrir
+    el PDF, así que el archivo solo se analiza una vez.
+    
+    Args:
+        filepath: Ruta al PDF
+        filename: Nombre del archivo (fuente de los chunks)
+        
+    Returns:
+        Tupla (chunks añadidos, chunks omitidos por estar ya indexados,
+        metadatos del documento)
+    """
+    batch_queue = queue.Queue(maxsize=4)
+    cancel = threading.Event()
+    total = 0
+    added = 0
+    skipped = 0
+    
+    id_prefix = f"{filename}_chunk_"
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        producer = executor.submit(_produce_chunk_batches, filepath, batch_queue, cancel)
+        pending_write = None
+        done = False  # el consumidor ya recibió el None final del productor
+        
+        def iter_batches(batch):
+            """Lotes del productor; pasado el umbral, agrupados para el pool"""
+            nonlocal done
+            threshold = Config.PARALLEL_ENCODE_THRESHOLD
+            seen = 0
+            group = []
+            while batch is not None:
+                seen += len(batch)
+                if seen <= threshold:
+                    # Documento pequeño hasta ahora: lote a lote, en streaming
+                    yield batch
+                else:
+                    group.extend(batch)
+                    if len(group) >= threshold:
+                        yield group
+                        group = []
+                batch = batch_queue.get()
+            done = True
+            if group:
+                yield group
+        
+        try:
+            batch = batch_queue.get()
+            
+            # Con el primer lote el productor ya abrió el PDF y cacheó sus
+            # metadatos; comunes a todos los chunks: cada chunk solo copia el dict
+            metadata = pdf_processor.extract_metadata(filepath)
+            base_metadata = {'source': filename, 'title': metadata.get('title', filename)}
+            
+            for batch in iter_batches(batch):
+                chunk_ids = range(total, total + len(batch))
+                metadatas = [dict(base_metadata, chunk_id=i) for i in chunk_ids]
+                ids = [f"{id_prefix}{i}" for i in chunk_ids]
+                total += len(batch)
+                
+                # Reprocesar un PDF ya indexado: no volver a codificar sus chunks
+                existing = vector_store.get_existing_ids(ids)
+                if existing:
+                    new_idx = [i for i, id_ in enumerate(ids) if id_ not in existing]
+                    skipped += len(ids) - len(new_idx)
+                    batch = [batch[i] for i in new_idx]
+                    metadatas = [metadatas[i] for i in new_idx]
+                    ids = [ids[i] for i in new_idx]
+                    if not batch:
+                        continue
+                
+                # Bloques grandes: repartir la codificación entre varios procesos
+                if len(batch) >= Config.PARALLEL_ENCODE_THRESHOLD:
+                    embeddings = embedding_engine.encode_parallel(batch, num_workers=Config.MAX_WORKERS)
+                else:
+                    # Se codifica junto a los chunks de otras subidas en curso
+                    embeddings = ingest_batcher.submit_many(batch).result()
+                
+                # Como mucho una inserción en curso: conserva el orden y acota memoria
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = executor.submit(
+                    vector_store.add_documents, batch, metadatas, ids, embeddings=embeddings
+                )
+                
+                added += len(batch)
+            
+            if pending_write is not None:
+                pending_write.result()
+        except Exception:
+            # Desbloquear al productor antes de propagar el error (si ya
+            # terminó, su None ya se consumió y no queda nada que vaciar)
+            cancel.set()
+            if not done:
+                while batch_queue.get() is not None:
+                    pass
+            raise
+        
+        producer.result()
+    
+    if skipped:
+        logger.info(f"{filename}: {skipped} de {total} chunks ya estaban indexados")
+    return added, skipped, metadata
+
+
+def _update_job(job_id: str, **fields):
+    """Actualiza el estado de un trabajo y descarta los terminados más antiguos"""
+    with _jobs_lock:
+        _jobs[job_id].update(fields)
+        
+        finished = [jid for jid, job in _jobs.items() if job['status'] in ('done', 'error')]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[jid]
+
+
+def _ingest_job(job_id: str, filepath: Path, filename: str):
+    """
+    Procesa un PDF subido en un hilo de _upload_executor
+    
+    Args:
+        job_id: Identificador del trabajo
+        filepath: Ruta del PDF guardado
+        filename: Nombre original del archivo
+    """
+    _update_job(job_id, status='processing')
+    logger.info(f"Procesando: {filename} (job {job_id})")
+    
+    try:
+        # Extraer, dividir e indexar en streaming
+        added, skipped, metadata = _ingest_pdf(filepath, filename)
+        
+        # Las respuestas cacheadas pueden quedar obsoletas con nuevos documentos
+        if added:
+            if semantic_cache is not None:
+                semantic_cache.clear(index_version=vector_store.get_collection_count())
+            if exact_cache is not None:
+                exact_cache.clear()
+        
+        _update_job(job_id, status='done', chunks=added + skipped,
+                    added=added, skipped=skipped, metadata=metadata)
+        
+    except Exception as e:
+        logger.error(f"Error procesando {filename} (job {job_id}): {e}", exc_info=True)
+        _update_job(job_id, status='error', error=str(e))
 
 
 @app.route('/')
@@ -133,7 +499,8 @@ def status():
             'pdf_processor': pdf_processor is not None,
             'embedding_engine': embedding_engine is not None,
             'vector_store': vector_store is not None,
-            'llm_engine': llm_engine is not None
+            'llm_engine': llm_engine is not None,
+            'reranker': reranker is not None
         },
         'documents_count': vector_store.get_collection_count() if vector_store else 0
     })
@@ -141,7 +508,7 @@ def status():
 
 @app.route('/api/upload', methods=['POST'])
 def upload_pdf():
-    """Sube y procesa un PDF"""
+    """Guarda un PDF y encola su indexación (202 + job_id)"""
     try:
         initialize_components()
         
@@ -165,47 +532,39 @@ def upload_pdf():
         upload_folder.mkdir(parents=True, exist_ok=True)
         
         filepath = upload_folder / file.filename
-        file.save(filepath)
-        
-        logger.info(f"Procesando: {file.filename}")
-        
-        # Extraer texto
-        text = pdf_processor.extract_text(filepath)
-        metadata = pdf_processor.extract_metadata(filepath)
-        
-        # Crear chunks
-        chunks = pdf_processor.chunk_text(
-            text, 
-            Config.CHUNK_SIZE, 
-            Config.CHUNK_OVERLAP
-        )
-        
-        # Añadir a vector store
-        metadatas = [
-            {
-                'source': file.filename,
-                'chunk_id': i,
-                'title': metadata.get('title', file.filename)
-            }
-            for i in range(len(chunks))
-        ]
+        with open(filepath, 'wb') as dst:
+            shutil.copyfileobj(file.stream, dst, UPLOAD_COPY_BUFFER)
         
-        ids = [f"{file.filename}_chunk_{i}" for i in range(len(chunks))]
-        
-        vector_store.add_documents(chunks, metadatas, ids)
+        job_id = uuid.uuid4().hex
+        with _jobs_lock:
+            _jobs[job_id] = {'job_id': job_id, 'filename': file.filename, 'status': 'queued'}
+        _upload_executor.submit(_ingest_job, job_id, filepath, file.filename)
         
         return jsonify({
             'success': True,
+            'job_id': job_id,
             'filename': file.filename,
-            'chunks': len(chunks),
-            'metadata': metadata
-        })
+            'status': 'queued'
+        }), 202
         
     except Exception as e:
         logger.error(f"Error en upload: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id: str):
+    """Estado de un trabajo de indexación"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        job = dict(job) if job is not None else None
+    
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify(job)
+
+
 @app.route('/api/ask', methods=['POST'])
 def ask_question():
     """Responde una pregunta sobre los documentos"""
@@ -218,41 +577,96 @@ def ask_question():
         if not question:
             return jsonify({'error': 'Pregunta vacía'}), 400
         
+        ef_search = data.get('ef_search', Config.HNSW_EF_SEARCH)
+        # bool es subclase de int: true/false de JSON no son un ef_search válido
+        if isinstance(ef_search, bool) or not isinstance(ef_search, int) or ef_search < 1:
+            return jsonify({'error': 'ef_search debe ser un entero positivo'}), 400
+        
+        # Las respuestas cacheadas se obtuvieron con el ef_search por defecto:
+        # con otro valor no se leen ni se guardan
+        use_cache = ef_search == Config.HNSW_EF_SEARCH
+        
         if not llm_engine:
             return jsonify({'error': 'Modelo LLM no disponible'}), 503
         
         logger.info(f"Pregunta: {question}")
         
-        # Buscar contexto relevante
-        results = vector_store.query(question, n_results=Config.MAX_CHUNKS_PER_QUERY)
+        # Pregunta repetida literalmente: responder sin calcular el embedding
+        if exact_cache is not None and use_cache:
+            cached = exact_cache.get(question)
+            if cached is not None:
+                logger.info("Respuesta obtenida de la caché exacta")
+                return jsonify(dict(cached, cache_hit=True))
+        
+        # Embedding de la pregunta (agrupado con peticiones concurrentes); el
+        # modelo puede estar ocupado con la codificación de una subida
+        try:
+            question_embedding = embed_batcher.submit(question).result(timeout=Config.EMBED_TIMEOUT)
+        except FutureTimeoutError:
+            logger.warning(f"Embedding de la pregunta sin respuesta tras {Config.EMBED_TIMEOUT}s")
+            return jsonify({'error': 'Servidor ocupado, inténtalo de nuevo en unos segundos'}), 503
+        
+        # Reutilizar la respuesta de una pregunta equivalente
+        if semantic_cache is not None and use_cache:
+            cached = semantic_cache.lookup(
+                question_embedding,
+                threshold=Config.CACHE_SIM_THRESHOLD
+            )
+            if cached is not None:
+                logger.info("Respuesta obtenida de la caché semántica")
+                return jsonify(dict(cached, cache_hit=True))
+        
+        # Buscar contexto relevante reutilizando el embedding de la pregunta;
+        # con reranker se recuperan más candidatos para que los reordene
+        n_results = Config.MAX_CHUNKS_PER_QUERY
+        if reranker is not None:
+            n_results *= Config.RERANK_OVERSAMPLE
+        
+        results = vector_store.query_by_vector(
+            question_embedding,
+            n_results=n_results,
+            ef_search=ef_search
+        )
+        
+        context_chunks = results['documents'][0]
+        metadatas = results['metadatas'][0]
         
-        if not results['documents'][0]:
+        if not context_chunks:
             return jsonify({
                 'answer': 'No encontré documentos relevantes. Por favor, sube un PDF primero.',
                 'sources': []
             })
         
+        if reranker is not None:
+            order = reranker.rerank(question, context_chunks, top_k=Config.MAX_CHUNKS_PER_QUERY)
+            context_chunks = [context_chunks[i] for i in order]
+            metadatas = [metadatas[i] for i in order]
+        
         # Generar respuesta
-        context_chunks = results['documents'][0]
         response = llm_engine.answer_question(
             question, 
             context_chunks,
             max_tokens=Config.MAX_TOKENS
         )
         
-        # Preparar fuentes
-        sources = []
-        for i, metadata in enumerate(results['metadatas'][0]):
-            sources.append({
-                'source': metadata.get('source', 'Unknown'),
-                'chunk_id': metadata.get('chunk_id', i)
-            })
+        # Preparar fuentes en una sola pasada
+        sources = [
+            {'source': metadata.get('source', 'Unknown'), 'chunk_id': metadata.get('chunk_id', i)}
+            for i, metadata in enumerate(metadatas)
+        ]
         
-        return jsonify({
+        payload = {
             'answer': response['answer'],
             'sources': sources,
             'context_used': response['context_used']
-        })
+        }
+        
+        if semantic_cache is not None and use_cache:
+            semantic_cache.add(question_embedding, payload)
+        if exact_cache is not None and use_cache:
+            exact_cache.set(question, payload)
+        
+        return jsonify(dict(payload, cache_hit=False))
         
     except Exception as e:
         logger.error(f"Error en ask: {e}", exc_info=True)
@@ -279,6 +693,12 @@ def list_documents():
 
 if __name__ == '__main__':
     logger.info("Iniciando ScholarQA...")
+    
+    # Cargar modelos e índice antes de aceptar peticiones
+    try:
+        initialize_components()
+    except Exception as e:
+        logger.warning(f"Inicialización diferida a la primera petición: {e}")
     logger.info(f"Servidor en http://{Config.FLASK_HOST}:{Config.FLASK_PORT}")
     
     app.run(
@@ -5,16 +5,18 @@ ScholarQA - Command Line Interface Optimizado
 
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Añadir src al path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from core.pdf_processor import PDFProcessor
+from core.pdf_processor import PDFProcessor, parse_parser_rules
 from core.embeddings import EmbeddingEngine
 from core.vector_store import VectorStore
 from core.llm_engine import LLMEngine
 from core.text_splitter import SemanticTextSplitter
+from core.cache_manager import CacheManager
 from utils.config import Config
 from utils.logger import setup_logging
 from utils.performance import Timer
@@ -23,33 +25,72 @@ from utils.performance import Timer
 logger = setup_logging(Config.LOG_LEVEL)
 
 
+def _create_pdf_cache():
+    """Caché de páginas extraídas por hash de contenido (None si ENABLE_CACHE=False)"""
+    if not Config.ENABLE_CACHE:
+        return None
+    return CacheManager(
+        Config.get_pdf_cache_dir(),
+        ttl=Config.PDF_CACHE_TTL_DAYS * 86400,
+        max_memory_items=32  # cada entrada es el texto completo de un PDF
+    )
+
+
+def _load_llm_engine():
+    """Carga el LLM (opcional: devuelve None si no está disponible)"""
+    try:
+        return LLMEngine(
+            str(Config.get_llm_model_path()),
+            n_ctx=Config.N_CTX,
+            n_gpu_layers=Config.N_GPU_LAYERS,
+            n_batch=Config.N_BATCH,
+            use_mlock=Config.LLM_USE_MLOCK
+        )
+    except FileNotFoundError as e:
+        logger.warning(f"Modelo LLM no disponible: {e}")
+        return None
+
+
+def _load_vector_store(embedding_engine_future):
+    """Abre ChromaDB en cuanto el motor de embeddings está cargado"""
+    return VectorStore(
+        str(Config.get_vector_store_path()),
+        Config.COLLECTION_NAME,
+        hnsw_m=Config.HNSW_M,
+        hnsw_construction_ef=Config.HNSW_EF_CONSTRUCTION,
+        hnsw_search_ef=Config.HNSW_EF_SEARCH,
+        hnsw_sync_threshold=Config.HNSW_SYNC_THRESHOLD,
+        embedding_engine=embedding_engine_future.result(),
+        rescore_candidates=Config.RESCORE_CANDIDATES,
+        cache_tokens=Config.CACHE_TOKENS
+    )
+
+
 def init_components():
-    """Inicializa componentes necesarios con optimizaciones"""
+    """Inicializa en paralelo los componentes necesarios"""
     logger.info("Inicializando componentes...")
     
-    with Timer("Inicialización"):
-        pdf_processor = PDFProcessor(max_workers=Config.MAX_WORKERS)
-        
-        embedding_engine = EmbeddingEngine(
+    with Timer("Inicialización"), ThreadPoolExecutor(max_workers=4) as executor:
+        f_llm = executor.submit(_load_llm_engine)
+        f_emb = executor.submit(
+            EmbeddingEngine,
             Config.EMBEDDING_MODEL,
             batch_size=Config.EMBEDDING_BATCH_SIZE,
-            normalize_embeddings=Config.NORMALIZE_EMBEDDINGS
+            normalize_embeddings=Config.NORMALIZE_EMBEDDINGS,
+            onnx_path=str(Config.get_embedding_onnx_path())
         )
-        
-        vector_store = VectorStore(
-            str(Config.get_vector_store_path()),
-            Config.COLLECTION_NAME
+        f_vs = executor.submit(_load_vector_store, f_emb)
+        f_pdf = executor.submit(
+            PDFProcessor,
+            max_workers=Config.MAX_WORKERS,
+            parser_rules=parse_parser_rules(Config.PDF_PARSER_RULES),
+            cache=_create_pdf_cache()
         )
         
-        try:
-            llm_engine = LLMEngine(
-                str(Config.get_llm_model_path()),
-                n_ctx=Config.N_CTX,
-                n_gpu_layers=Config.N_GPU_LAYERS
-            )
-        except FileNotFoundError as e:
-            logger.warning(f"Modelo LLM no disponible: {e}")
-            llm_engine = None
+        pdf_processor = f_pdf.result()
+        embedding_engine = f_emb.result()
+        vector_store = f_vs.result()
+        llm_engine = f_llm.result()
     
     return pdf_processor, embedding_engine, vector_store, llm_engine
 
@@ -79,50 +120,82 @@ def upload_command(args):
     
     print(f"📄 Procesando: {pdf_path.name}")
     
-    with Timer("Extracción de texto"):
-        # Extraer texto
-        text = pdf_processor.extract_text(pdf_path)
-        metadata = pdf_processor.extract_metadata(pdf_path)
-    
-    print(f"📊 Metadatos: {metadata.get('num_pages', 0)} páginas, {len(text)} caracteres")
-    
-    with Timer("Chunking"):
-        # Crear chunks (usar chunking semántico si está habilitado)
-        if Config.USE_SEMANTIC_CHUNKING:
-            from core.text_splitter import SemanticTextSplitter
-            splitter = SemanticTextSplitter(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-            chunks = splitter.split_text(text)
-        else:
-            chunks = pdf_processor.chunk_text(text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-    
-    print(f"📦 Dividido en {len(chunks)} chunks")
-    
-    # Preparar metadatos
-    metadatas = [
-        {
-            'source': pdf_path.name,
-            'chunk_id': i,
-            'title': metadata.get('title', pdf_path.name),
-            'num_pages': metadata.get('num_pages', 0)
-        }
-        for i in range(len(chunks))
-    ]
-    
-    ids = [f"{pdf_path.name}_chunk_{i}" for i in range(len(chunks))]
-    
-    # Añadir a vector store con batches
-    with Timer("Almacenamiento"):
-        vector_store.add_documents(
-            chunks, 
-            metadatas, 
-            ids,
-            batch_size=Config.CHROMA_BATCH_SIZE
-        )
+    metadata = pdf_processor.extract_metadata(pdf_path)
+    print(f"📊 Metadatos: {metadata.get('num_pages', 0)} páginas")
+    
+    # Páginas → chunks → lotes → vector store en streaming: la memoria
+    # depende del tamaño de lote y no del tamaño del PDF
+    pages = pdf_processor.iter_pages(pdf_path, workers=Config.MAX_WORKERS)
+    if Config.USE_SEMANTIC_CHUNKING:
+        splitter = SemanticTextSplitter(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
+        chunks = splitter.iter_chunks(pages)
+    else:
+        chunks = pdf_processor.iter_chunks(pages, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
+    
+    # Metadatos comunes a todos los chunks
+    base_metadata = {
+        'source': pdf_path.name,
+        'title': metadata.get('title', pdf_path.name),
+        'num_pages': metadata.get('num_pages', 0)
+    }
+    
+    num_chunks = 0
+    skipped = 0
+    batch = []
+    with Timer("Extracción, chunking y almacenamiento"):
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= Config.CHROMA_BATCH_SIZE:
+                skipped += _add_chunk_batch(vector_store, batch, base_metadata, pdf_path.name, num_chunks)
+                num_chunks += len(batch)
+                batch = []
+        
+        if batch:
+            skipped += _add_chunk_batch(vector_store, batch, base_metadata, pdf_path.name, num_chunks)
+            num_chunks += len(batch)
     
+    # Las respuestas guardadas pueden quedar obsoletas con nuevos documentos
+    if num_chunks > skipped:
+        _clear_semantic_cache()
+    
+    print(f"📦 Dividido en {num_chunks} chunks")
+    if skipped:
+        print(f"⏭️  {skipped} chunks ya estaban indexados (omitidos)")
     print(f"✅ Procesado exitosamente")
     print(f"📊 Total en base de datos: {vector_store.get_collection_count()} chunks")
 
 
+def _clear_semantic_cache():
+    """Elimina la caché semántica de respuestas guardada por la aplicación web"""
+    cache_path = Config.get_semantic_cache_path()
+    if cache_path.exists():
+        cache_path.unlink()
+        logger.info("Caché semántica eliminada")
+
+
+def _add_chunk_batch(vector_store, chunks, base_metadata, source, first_id):
+    """
+    Inserta un lote de chunks numerados a partir de first_id
+    
+    Los chunks cuyo ID ya existe en la colección no se vuelven a codificar.
+    
+    Returns:
+        Número de chunks omitidos por estar ya indexados
+    """
+    ids = [f"{source}_chunk_{i}" for i in range(first_id, first_id + len(chunks))]
+    existing = vector_store.get_existing_ids(ids)
+    new_idx = [i for i, id_ in enumerate(ids) if id_ not in existing]
+    
+    if new_idx:
+        vector_store.add_documents(
+            [chunks[i] for i in new_idx],
+            [dict(base_metadata, chunk_id=first_id + i) for i in new_idx],
+            [ids[i] for i in new_idx],
+            batch_size=Config.CHROMA_BATCH_SIZE
+        )
+    return len(ids) - len(new_idx)
+
+
 def ask_command(args):
     """Hace una pregunta sobre los documentos con optimizaciones"""
     _, _, vector_store, llm_engine = init_components()
@@ -159,7 +232,7 @@ def ask_command(args):
     print(f"\n💡 Respuesta:\n{response['answer']}\n")
     
     # Mostrar fuentes y estadísticas
-    sources = set(m['source'] for m in results['metadatas'][0])
+    sources = {m.get('source', 'Unknown') for m in results['metadatas'][0]}
     print(f"📚 Fuentes: {', '.join(sources)}")
     print(f"📊 Contexto usado: {response['context_used']} chunks")
     print(f"⏱️  Tiempo de generación: {response.get('generation_time', 0):.2f}s")
@@ -201,6 +274,7 @@ def clear_command(args):
             return
     
     vector_store.delete_collection()
+    _clear_semantic_cache()
     print("✅ Base de datos eliminada")
 
 
@@ -241,7 +315,8 @@ def stats_command(args):
     # Uso de memoria
     from utils.performance import PerformanceMonitor
     mem_stats = PerformanceMonitor.get_memory_usage()
-    sys_stats = PerformanceMonitor.get_system_info()
+    # Consulta única: medir la CPU durante un intervalo corto
+    sys_stats = PerformanceMonitor.get_system_info(interval=0.1)
     
     print("\n💻 Sistema:")
     print(f"  CPUs: {sys_stats['cpu_count']}")
@@ -2,38 +2,107 @@
 Sistema de caché para optimizar rendimiento
 """
 
-from typing import Any, Optional, Callable
+from typing import Any, Optional, Callable, Dict, List, NamedTuple, Tuple
+from collections import OrderedDict
 import hashlib
+import os
 import pickle
+import shutil
+import threading
 import time
 from pathlib import Path
 import logging
 from functools import wraps
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:  # Opcional: hash no criptográfico mucho más rápido
+    xxhash = None
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:  # Opcional: sin ellos los arrays también se guardan con pickle
+    msgpack = None
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
+# Cabecera de los archivos de caché con arrays numpy (msgpack + zstd)
+_ARRAY_MAGIC = b"SQA\x01"
+
+
+class QuantizedEmbedding(NamedTuple):
+    """Embedding cuantizado a int8 con escala simétrica por vector"""
+    values: np.ndarray
+    scale: float
+    
+    @classmethod
+    def quantize(cls, embedding: np.ndarray) -> "QuantizedEmbedding":
+        """Cuantiza un embedding float a int8"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        scale = float(np.abs(embedding).max()) / 127.0 or 1.0
+        return cls(np.round(embedding / scale).astype(np.int8), scale)
+    
+    def dequantize(self) -> np.ndarray:
+        """Reconstruye el embedding en float32"""
+        return self.values.astype(np.float32) * np.float32(self.scale)
+
 
 class CacheManager:
     """
     Gestor de caché para embeddings y resultados de LLM
     """
     
-    def __init__(self, cache_dir: Optional[Path] = None, ttl: int = 3600):
+    # Inserciones entre barridos de entradas expiradas en memoria
+    SWEEP_INTERVAL = 1000
+    
+    def __init__(self, cache_dir: Optional[Path] = None, ttl: int = 3600,
+                 max_memory_items: int = 10_000):
         """
         Inicializa el gestor de caché
         
         Args:
             cache_dir: Directorio para caché persistente
             ttl: Time-to-live en segundos
+            max_memory_items: Entradas en memoria antes de descartar la usada
+                hace más tiempo (LRU); el disco no tiene límite
         """
         self.cache_dir = cache_dir
         self.ttl = ttl
-        self.memory_cache = {}
+        self.max_memory_items = max_memory_items
+        self.memory_cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._sets_since_sweep = 0
+        # Protege la capa en memoria (orden LRU, desalojo y barrido): una
+        # misma instancia se comparte entre los hilos de extracción de PDFs
+        self._memory_lock = threading.Lock()
         
         if cache_dir:
             cache_dir.mkdir(parents=True, exist_ok=True)
+            self._remove_legacy_files()
             logger.info(f"Caché persistente habilitada en: {cache_dir}")
     
+    def _remove_legacy_files(self):
+        """
+        Elimina los archivos del formato plano anterior (cache_dir/<clave>.pkl)
+        
+        Usaban claves SHA-256 de 64 caracteres que ninguna clave actual
+        reproduce: no se pueden migrar y solo ocupaban disco.
+        """
+        removed = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.pkl'):
+                    try:
+                        os.unlink(entry.path)
+                        removed += 1
+                    except OSError as e:
+                        logger.warning(f"No se pudo eliminar {entry.name}: {e}")
+        
+        if removed:
+            logger.info(f"Eliminados {removed} archivos de caché del formato anterior")
+    
     def _generate_key(self, *args, **kwargs) -> str:
         """
         Genera una clave única basada en argumentos
@@ -43,15 +112,94 @@ class CacheManager:
             **kwargs: Argumentos con nombre
             
         Returns:
-            Clave hash única
+            Clave hash única (128 bits en hexadecimal)
         """
-        # Crear string representativo
-        key_parts = [str(arg) for arg in args]
-        key_parts.extend([f"{k}={v}" for k, v in sorted(kwargs.items())])
-        key_string = "|".join(key_parts)
+        # Bytes representativos sin construir un str intermedio completo
+        key_parts = [str(arg).encode() for arg in args]
+        key_parts.extend([f"{k}={v}".encode() for k, v in sorted(kwargs.items())])
+        key_bytes = b"|".join(key_parts)
         
-        # Generar hash
-        return hashlib.sha256(key_string.encode()).hexdigest()
+        # La clave no necesita un hash criptográfico: xxh3 si está disponible
+        if xxhash is not None:
+            return xxhash.xxh3_128_hexdigest(key_bytes)
+        return hashlib.sha256(key_bytes).hexdigest()[:32]
+    
+    def _cache_file(self, key: str) -> Path:
+        """
+        Ruta del archivo de caché de una clave
+        
+        Los archivos se reparten en 256 subdirectorios según los dos primeros
+        caracteres hexadecimales de la clave para no crear un directorio enorme.
+        
+        Args:
+            key: Clave de caché
+            
+        Returns:
+            Ruta del archivo .pkl
+        """
+        return self.cache_dir / key[:2] / f"{key[2:]}.pkl"
+    
+    @staticmethod
+    def _serialize(value: Any, timestamp: float) -> bytes:
+        """
+        Serializa una entrada de caché
+        
+        Los arrays numpy se guardan como bytes crudos con una cabecera
+        (dtype, shape) en msgpack comprimida con zstd, igual que las listas
+        de textos (p. ej. páginas de un PDF); el resto con pickle.
+        
+        Args:
+            value: Valor a guardar
+            timestamp: Momento de creación
+            
+        Returns:
+            Contenido del archivo de caché
+        """
+        if isinstance(value, (np.ndarray, QuantizedEmbedding)) and msgpack is not None:
+            header = {'t': timestamp, 'precision': 'raw'}
+            if isinstance(value, QuantizedEmbedding):
+                header.update(precision='int8', scale=value.scale)
+                value = value.values
+            
+            payload = msgpack.packb({
+                **header,
+                'dtype': value.dtype.str,
+                'shape': list(value.shape),
+                'data': np.ascontiguousarray(value).tobytes()
+            })
+            return _ARRAY_MAGIC + zstandard.ZstdCompressor(level=1).compress(payload)
+        
+        if (isinstance(value, list) and msgpack is not None
+                and all(isinstance(item, str) for item in value)):
+            payload = msgpack.packb({'t': timestamp, 'precision': 'text', 'data': value})
+            return _ARRAY_MAGIC + zstandard.ZstdCompressor(level=1).compress(payload)
+        
+        return pickle.dumps((value, timestamp), protocol=pickle.HIGHEST_PROTOCOL)
+    
+    @staticmethod
+    def _deserialize(data: bytes) -> Tuple[Any, float]:
+        """
+        Reconstruye una entrada de caché
+        
+        Args:
+            data: Contenido del archivo de caché
+            
+        Returns:
+            Tupla (valor, timestamp)
+        """
+        if data.startswith(_ARRAY_MAGIC):
+            payload = msgpack.unpackb(
+                zstandard.ZstdDecompressor().decompress(data[len(_ARRAY_MAGIC):])
+            )
+            if payload.get('precision') == 'text':
+                return payload['data'], payload['t']
+            
+            value = np.frombuffer(payload['data'], dtype=payload['dtype']).reshape(payload['shape'])
+            if payload.get('precision') == 'int8':
+                value = QuantizedEmbedding(value, payload['scale'])
+            return value, payload['t']
+        
+        return pickle.loads(data)
     
     def get(self, key: str) -> Optional[Any]:
         """
@@ -64,27 +212,31 @@ class CacheManager:
             Valor cacheado o None
         """
         # Intentar caché en memoria primero
-        if key in self.memory_cache:
-            value, timestamp = self.memory_cache[key]
-            if time.time() - timestamp < self.ttl:
-                logger.debug(f"Cache hit (memory): {key[:16]}...")
-                return value
-            else:
-                # Expiró, eliminar
-                del self.memory_cache[key]
+        with self._memory_lock:
+            entry = self.memory_cache.get(key)
+            if entry is not None:
+                value, timestamp = entry
+                if time.time() - timestamp < self.ttl:
+                    logger.debug("Cache hit (memory): %.16s...", key)
+                    self.memory_cache.move_to_end(key)
+                    return value
+                else:
+                    # Expiró, eliminar
+                    del self.memory_cache[key]
         
         # Intentar caché persistente
         if self.cache_dir:
-            cache_file = self.cache_dir / f"{key}.pkl"
+            cache_file = self._cache_file(key)
+            
             if cache_file.exists():
                 try:
-                    with open(cache_file, 'rb') as f:
-                        value, timestamp = pickle.load(f)
+                    value, timestamp = self._deserialize(cache_file.read_bytes())
                     
                     if time.time() - timestamp < self.ttl:
-                        logger.debug(f"Cache hit (disk): {key[:16]}...")
+                        logger.debug("Cache hit (disk): %.16s...", key)
                         # Cargar a memoria para acceso rápido
-                        self.memory_cache[key] = (value, timestamp)
+                        with self._memory_lock:
+                            self._remember(key, value, timestamp)
                         return value
                     else:
                         # Expiró, eliminar
@@ -92,7 +244,7 @@ class CacheManager:
                 except Exception as e:
                     logger.warning(f"Error leyendo caché: {e}")
         
-        logger.debug(f"Cache miss: {key[:16]}...")
+        logger.debug("Cache miss: %.16s...", key)
         return None
     
     def set(self, key: str, value: Any):
@@ -105,31 +257,96 @@ class CacheManager:
         """
         timestamp = time.time()
         
-        # Guardar en memoria
-        self.memory_cache[key] = (value, timestamp)
+        with self._memory_lock:
+            # Guardar en memoria
+            self._remember(key, value, timestamp)
+            
+            # Barrido periódico de entradas expiradas que nadie vuelve a pedir
+            self._sets_since_sweep += 1
+            if self._sets_since_sweep >= self.SWEEP_INTERVAL:
+                self._sweep_expired()
         
         # Guardar en disco si está habilitado
         if self.cache_dir:
-            cache_file = self.cache_dir / f"{key}.pkl"
+            cache_file = self._cache_file(key)
             try:
-                with open(cache_file, 'wb') as f:
-                    pickle.dump((value, timestamp), f)
-                logger.debug(f"Cached to disk: {key[:16]}...")
+                cache_file.parent.mkdir(exist_ok=True)
+                cache_file.write_bytes(self._serialize(value, timestamp))
+                logger.debug("Cached to disk: %.16s...", key)
             except Exception as e:
                 logger.warning(f"Error guardando caché: {e}")
     
+    def _remember(self, key: str, value: Any, timestamp: float):
+        """
+        Guarda una entrada en memoria como la más reciente y aplica el límite LRU
+        
+        Se llama con _memory_lock adquirido.
+        
+        Args:
+            key: Clave de caché
+            value: Valor a cachear
+            timestamp: Momento de creación
+        """
+        self.memory_cache[key] = (value, timestamp)
+        self.memory_cache.move_to_end(key)
+        
+        while len(self.memory_cache) > self.max_memory_items:
+            self.memory_cache.popitem(last=False)
+    
+    def _sweep_expired(self):
+        """Elimina de memoria las entradas que superaron el TTL (con _memory_lock adquirido)"""
+        now = time.time()
+        expired = [key for key, (_, timestamp) in self.memory_cache.items()
+                   if now - timestamp >= self.ttl]
+        for key in expired:
+            del self.memory_cache[key]
+        
+        self._sets_since_sweep = 0
+        if expired:
+            logger.debug(f"Eliminadas {len(expired)} entradas expiradas de memoria")
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Obtiene varios valores de caché en una sola pasada
+        
+        Args:
+            keys: Claves de caché
+            
+        Returns:
+            Diccionario clave -> valor solo con los aciertos
+        """
+        now = time.time()
+        
+        # Aciertos en memoria de una vez; el resto se busca en disco
+        with self._memory_lock:
+            hits = {
+                key: entry[0]
+                for key, entry in ((key, self.memory_cache.get(key)) for key in keys)
+                if entry is not None and now - entry[1] < self.ttl
+            }
+            for key in hits:
+                self.memory_cache.move_to_end(key)
+        
+        if self.cache_dir:
+            for key in keys:
+                if key not in hits:
+                    value = self.get(key)
+                    if value is not None:
+                        hits[key] = value
+        
+        return hits
+    
     def clear(self):
         """
         Limpia toda la caché
         """
-        self.memory_cache.clear()
+        # Un dict nuevo libera también la tabla de buckets
+        with self._memory_lock:
+            self.memory_cache = OrderedDict()
         
         if self.cache_dir and self.cache_dir.exists():
-            for cache_file in self.cache_dir.glob("*.pkl"):
-                try:
-                    cache_file.unlink()
-                except Exception as e:
-                    logger.warning(f"Error eliminando caché: {e}")
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         logger.info("Caché limpiada")
     
@@ -142,13 +359,29 @@ class CacheManager:
         """
         stats = {
             'memory_items': len(self.memory_cache),
+            'max_memory_items': self.max_memory_items,
             'disk_items': 0
         }
         
         if self.cache_dir and self.cache_dir.exists():
-            stats['disk_items'] = len(list(self.cache_dir.glob("*.pkl")))
+            stats['disk_items'] = self._count_disk_items()
         
         return stats
+    
+    def _count_disk_items(self) -> int:
+        """
+        Cuenta los archivos de caché recorriendo los subdirectorios con scandir
+        
+        Returns:
+            Número de archivos .pkl
+        """
+        count = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    with os.scandir(entry.path) as shard:
+                        count += sum(1 for item in shard if item.name.endswith('.pkl'))
+        return count
 
 
 def cached(cache_manager: CacheManager):
@@ -187,6 +420,10 @@ def cached(cache_manager: CacheManager):
 class EmbeddingCache:
     """
     Caché especializada para embeddings
+    
+    Los embeddings numpy se guardan cuantizados a int8 (escala por vector):
+    una cuarta parte del tamaño en disco y en memoria, con un error muy
+    inferior a la variabilidad propia de la búsqueda por coseno.
     """
     
     def __init__(self, cache_dir: Path):
@@ -198,18 +435,23 @@ class EmbeddingCache:
         """
         self.cache_manager = CacheManager(cache_dir, ttl=86400)  # 24 horas
     
-    def get_embedding(self, text: str) -> Optional[Any]:
+    def get_embedding(self, text: str, dequantize: bool = True) -> Optional[Any]:
         """
         Obtiene embedding cacheado
         
         Args:
             text: Texto del embedding
+            dequantize: Devolver float32; con False se devuelve el
+                QuantizedEmbedding (int8 + escala) tal cual
             
         Returns:
             Embedding o None
         """
         key = self.cache_manager._generate_key("embedding", text)
-        return self.cache_manager.get(key)
+        value = self.cache_manager.get(key)
+        if dequantize and isinstance(value, QuantizedEmbedding):
+            return value.dequantize()
+        return value
     
     def set_embedding(self, text: str, embedding: Any):
         """
@@ -220,27 +462,31 @@ class EmbeddingCache:
             embedding: Embedding a guardar
         """
         key = self.cache_manager._generate_key("embedding", text)
+        if isinstance(embedding, np.ndarray) and np.issubdtype(embedding.dtype, np.floating):
+            embedding = QuantizedEmbedding.quantize(embedding)
         self.cache_manager.set(key, embedding)
     
-    def get_batch_embeddings(self, texts: list) -> Optional[list]:
+    def get_batch_embeddings(self, texts: list) -> Tuple[List[Optional[Any]], List[int]]:
         """
-        Obtiene embeddings de un batch
+        Obtiene embeddings de un batch conservando los aciertos parciales
         
         Args:
             texts: Lista de textos
             
         Returns:
-            Lista de embeddings o None
+            Tupla (embeddings con None en los fallos, índices de los fallos)
+            para codificar solo los textos que faltan
         """
-        # Intentar obtener todos los embeddings del caché
-        embeddings = []
-        for text in texts:
-            emb = self.get_embedding(text)
-            if emb is None:
-                return None  # Si falta uno, recalcular todos
-            embeddings.append(emb)
+        keys = [self.cache_manager._generate_key("embedding", text) for text in texts]
+        hits = self.cache_manager.get_many(keys)
+        
+        embeddings = [
+            value.dequantize() if isinstance(value, QuantizedEmbedding) else value
+            for value in (hits.get(key) for key in keys)
+        ]
+        miss_indices = [i for i, emb in enumerate(embeddings) if emb is None]
         
-        return embeddings
+        return embeddings, miss_indices
     
     def set_batch_embeddings(self, texts: list, embeddings: list):
         """
@@ -0,0 +1,139 @@
+"""
+Agrupación de peticiones de embedding concurrentes en micro-lotes
+"""
+
+from concurrent.futures import Future
+from typing import List, Tuple
+import queue
+import threading
+import time
+import logging
+import numpy as np
+
+from .embeddings import EmbeddingEngine
+
+logger = logging.getLogger(__name__)
+
+
+class EmbedBatcher:
+    """
+    Reúne textos de varias peticiones y los codifica en una sola llamada
+    
+    Un hilo en segundo plano espera hasta max_wait_ms desde la primera
+    petición (o hasta reunir max_batch_size textos) y resuelve los Future de
+    cada petición con su parte del resultado.
+    """
+    
+    def __init__(self, embedding_engine: EmbeddingEngine, max_batch_size: int = 16,
+                 max_wait_ms: float = 10):
+        """
+        Inicializa el batcher y arranca el hilo consumidor
+        
+        Args:
+            embedding_engine: Motor de embeddings compartido
+            max_batch_size: Textos a partir de los cuales se cierra el lote
+                (una sola petición más grande se codifica entera)
+            max_wait_ms: Espera máxima para completar un lote (milisegundos)
+        """
+        self.embedding_engine = embedding_engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self._queue: "queue.Queue[Tuple[List[str], Future, bool]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+        
+        logger.info(f"EmbedBatcher iniciado (lote={max_batch_size}, espera={max_wait_ms}ms)")
+    
+    def submit(self, text: str) -> Future:
+        """
+        Encola un texto para codificar
+        
+        Args:
+            text: Texto a codificar
+        
+        Returns:
+            Future que se resuelve con el embedding (np.ndarray)
+        """
+        return self._submit([text], single=True)
+    
+    def submit_many(self, texts: List[str]) -> Future:
+        """
+        Encola varios textos para codificarlos junto a los de otras peticiones
+        
+        Args:
+            texts: Textos a codificar
+        
+        Returns:
+            Future que se resuelve con la matriz de embeddings (len(texts), dim)
+        """
+        return self._submit(list(texts), single=False)
+    
+    def _submit(self, texts: List[str], single: bool) -> Future:
+        """Encola una petición"""
+        if self._closed:
+            raise RuntimeError("EmbedBatcher cerrado")
+        
+        future = Future()
+        self._queue.put((texts, future, single))
+        return future
+    
+    def _collect(self) -> List[Tuple[List[str], Future, bool]]:
+        """Bloquea hasta la primera petición y completa el lote sin superar la espera"""
+        item = self._queue.get()
+        if item is None:
+            return []
+        
+        batch = [item]
+        num_texts = len(item[0])
+        deadline = time.monotonic() + self.max_wait
+        
+        while num_texts < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Reencolar la señal de cierre para después de este lote
+                self._queue.put(None)
+                break
+            batch.append(item)
+            num_texts += len(item[0])
+        
+        return batch
+    
+    def _run(self):
+        """Bucle del hilo consumidor"""
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            
+            texts = [text for item_texts, _, _ in batch for text in item_texts]
+            try:
+                embeddings = np.asarray(self.embedding_engine.encode(texts, show_progress=False))
+            except Exception as e:
+                logger.error(f"Error codificando lote de {len(texts)} textos: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            
+            # Repartir las filas entre las peticiones en el orden de llegada
+            start = 0
+            for item_texts, future, single in batch:
+                end = start + len(item_texts)
+                future.set_result(embeddings[start] if single else embeddings[start:end])
+                start = end
+    
+    def close(self):
+        """Detiene el hilo consumidor tras procesar lo pendiente"""
+        if self._closed:
+            return
+        
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
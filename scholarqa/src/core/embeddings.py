@@ -3,14 +3,55 @@ Motor de embeddings optimizado usando Sentence Transformers
 """
 
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional, Union
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Union
+import atexit
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 import numpy as np
 from pathlib import Path
 import torch
 
+from .cache_manager import EmbeddingCache
+
+try:
+    import onnxruntime as ort
+except ImportError:  # Backend ONNX opcional
+    ort = None
+
+try:
+    import simsimd
+except ImportError:  # Kernels SIMD opcionales para la similitud
+    simsimd = None
+
+try:
+    import xxhash
+except ImportError:  # Hash más rápido para la caché en memoria
+    xxhash = None
+
+try:
+    import faiss
+except ImportError:  # Índices FAISS opcionales para find_most_similar
+    faiss = None
+
 logger = logging.getLogger(__name__)
 
+# Candidatos a partir de los que build_index(approximate=True) usa IVF+PQ:
+# por debajo el entrenamiento de PQ no tiene datos suficientes
+APPROXIMATE_INDEX_MIN_SIZE = 10_000
+
+
+def _text_key(text: str) -> int:
+    """Clave de 64 bits del contenido de un texto para la caché en memoria"""
+    data = text.encode('utf-8')
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
 
 class EmbeddingEngine:
     """Genera embeddings de texto usando modelos locales con optimizaciones"""
@@ -18,7 +59,12 @@ class EmbeddingEngine:
     def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
                  device: Optional[str] = None,
                  batch_size: int = 32,
-                 normalize_embeddings: bool = True):
+                 normalize_embeddings: bool = True,
+                 onnx_path: Optional[str] = None,
+                 max_seq_length: int = 256,
+                 use_bettertransformer: bool = True,
+                 compile_model: bool = False,
+                 cache_size: int = 0):
         """
         Inicializa el motor de embeddings
         
@@ -27,6 +73,14 @@ class EmbeddingEngine:
             device: Dispositivo ('cuda', 'cpu', o None para auto-detección)
             batch_size: Tamaño de batch para procesamiento
             normalize_embeddings: Normalizar embeddings a norma unitaria
+            onnx_path: Modelo ONNX cuantizado (INT8) a usar en CPU si existe
+            max_seq_length: Longitud máxima en tokens (backend ONNX)
+            use_bettertransformer: Convertir el transformer a BetterTransformer
+                (atención SDPA fusionada) si optimum lo soporta
+            compile_model: Compilar el transformer con torch.compile; la
+                compilación se paga en la primera inferencia (warm_up)
+            cache_size: Embeddings recientes que encode guarda en memoria por
+                hash del texto (0 = sin caché)
         """
         logger.info(f"Cargando modelo de embeddings: {model_name}")
         
@@ -37,16 +91,257 @@ class EmbeddingEngine:
         self.device = device
         self.batch_size = batch_size
         self.normalize_embeddings = normalize_embeddings
-        
-        # Cargar modelo
-        self.model = SentenceTransformer(model_name, device=device)
-        self.dimension = self.model.get_sentence_embedding_dimension()
+        # Con embeddings normalizados el coseno es el producto escalar
+        self._sim = self._cosine_fast if normalize_embeddings else self._cosine_full
+        self.max_seq_length = max_seq_length
         self.model_name = model_name
+        self.model = None
+        self.session = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        
+        # Preferir el modelo ONNX INT8 en CPU; si no, Sentence Transformers
+        if onnx_path and device == 'cpu' and self._load_onnx(Path(onnx_path)):
+            self.backend = 'onnx'
+        else:
+            self.model = SentenceTransformer(model_name, device=device)
+            self.dimension = self.model.get_sentence_embedding_dimension()
+            self.backend = 'sentence-transformers'
+            self._optimize_transformer(use_bettertransformer, compile_model)
+        
+        logger.info(f"Modelo cargado en '{device}' con backend '{self.backend}' "
+                    f"(dimensión: {self.dimension})")
+        
+        # Índice de candidatos reutilizable (ver build_index)
+        self._index = None
+        self._index_texts: List[str] = []
         
-        logger.info(f"Modelo cargado en '{device}' (dimensión: {self.dimension})")
+        # Caché LRU en memoria: hash del texto -> embedding
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         # Estadísticas
         self._total_encoded = 0
+        self._cache_hits = 0
+    
+    def _optimize_transformer(self, use_bettertransformer: bool, compile_model: bool):
+        """
+        Sustituye el transformer del modelo por una versión optimizada
+        
+        Args:
+            use_bettertransformer: Usar atención SDPA fusionada (BetterTransformer)
+            compile_model: Compilar el transformer con torch.compile
+        """
+        transformer = self.model[0]
+        auto_model = transformer.auto_model
+        
+        if use_bettertransformer:
+            try:
+                auto_model = auto_model.to_bettertransformer()
+                logger.info("Transformer convertido a BetterTransformer")
+            except Exception as e:
+                logger.info(f"BetterTransformer no disponible ({e}), atención estándar")
+        
+        if compile_model and hasattr(torch, 'compile'):
+            # CUDA graphs solo compensan en GPU
+            mode = 'reduce-overhead' if self.device.startswith('cuda') else 'default'
+            auto_model = torch.compile(auto_model, mode=mode, dynamic=True)
+            logger.info(f"Transformer compilado con torch.compile (mode={mode})")
+        
+        transformer.auto_model = auto_model
+    
+    def _load_onnx(self, onnx_path: Path) -> bool:
+        """
+        Carga el modelo ONNX cuantizado con ONNX Runtime
+        
+        Args:
+            onnx_path: Ruta al modelo .onnx
+            
+        Returns:
+            True si el modelo se cargó correctamente
+        """
+        if ort is None:
+            logger.info("onnxruntime no instalado, usando Sentence Transformers")
+            return False
+        
+        if not onnx_path.exists():
+            logger.info(f"Modelo ONNX no encontrado en {onnx_path}, usando Sentence Transformers")
+            return False
+        
+        try:
+            from transformers import AutoTokenizer
+            
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # Fusiones de grafo completas (atención, GELU, LayerNorm) sobre el
+            # modelo cuantizado
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = ort.InferenceSession(
+                str(onnx_path),
+                sess_options=options,
+                providers=['CPUExecutionProvider']
+            )
+            self._onnx_inputs = {inp.name for inp in self.session.get_inputs()}
+            self.dimension = self.session.get_outputs()[0].shape[-1]
+            return True
+            
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el modelo ONNX ({e}), usando Sentence Transformers")
+            self.session = None
+            return False
+    
+    def _encode_onnx(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """
+        Genera embeddings con ONNX Runtime (mean pooling + normalización)
+        
+        Args:
+            texts: Lista de textos
+            batch_size: Tamaño de batch
+            
+        Returns:
+            Array numpy (n_textos, dimensión) en float32
+        """
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        
+        # Agrupar textos de longitud parecida: cada batch se rellena hasta su
+        # texto más largo (Sentence Transformers ya lo hace internamente)
+        if len(texts) > batch_size:
+            lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+            order = np.argsort(-lengths, kind='stable')
+        else:
+            order = np.arange(len(texts))
+        
+        for start in range(0, len(texts), batch_size):
+            indices = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in indices],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            embeddings[indices] = self._run_onnx(dict(encoded))
+        
+        return embeddings
+    
+    def _run_onnx(self, encoded: dict) -> np.ndarray:
+        """
+        Ejecuta el modelo ONNX sobre un batch ya tokenizado y con padding
+        
+        Args:
+            encoded: Arrays input_ids, attention_mask (y token_type_ids)
+            
+        Returns:
+            Embeddings del batch (mean pooling + normalización)
+        """
+        feeds = {
+            name: value.astype(np.int64)
+            for name, value in encoded.items()
+            if name in self._onnx_inputs
+        }
+        if 'token_type_ids' in self._onnx_inputs and 'token_type_ids' not in feeds:
+            feeds['token_type_ids'] = np.zeros_like(feeds['input_ids'])
+        token_embeddings = self.session.run(None, feeds)[0]
+        
+        # Mean pooling respetando la máscara de atención
+        mask = encoded['attention_mask'][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if self.normalize_embeddings:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        
+        return pooled
+    
+    @property
+    def tokenizer_name(self) -> str:
+        """Identificador del tokenizador (para validar ids cacheados)"""
+        tokenizer = self.tokenizer if self.session is not None else self.model.tokenizer
+        return tokenizer.name_or_path
+    
+    def tokenize(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Tokeniza textos sin padding, truncando a la longitud del modelo
+        
+        Args:
+            texts: Lista de textos
+            
+        Returns:
+            Lista de arrays int32 con los ids de cada texto
+        """
+        if self.session is not None:
+            tokenizer, max_length = self.tokenizer, self.max_seq_length
+        else:
+            tokenizer, max_length = self.model.tokenizer, self.model.max_seq_length
+        
+        encoded = tokenizer(texts, padding=False, truncation=True, max_length=max_length)
+        return [np.asarray(ids, dtype=np.int32) for ids in encoded['input_ids']]
+    
+    def encode_pretokenized(self, input_ids: Sequence[Sequence[int]],
+                            batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Genera embeddings a partir de ids ya tokenizados (sin pasar por el tokenizador)
+        
+        Args:
+            input_ids: Ids de cada texto, tal como los devuelve tokenize()
+            batch_size: Tamaño de batch (usa default si es None)
+            
+        Returns:
+            Array numpy (n_textos, dimensión) en float32
+        """
+        if len(input_ids) == 0:
+            return np.array([])
+        
+        batch_size = batch_size or self.batch_size
+        tokenizer = self.tokenizer if self.session is not None else self.model.tokenizer
+        pad_id = tokenizer.pad_token_id or 0
+        
+        # Agrupar por longitud para minimizar padding
+        order = np.argsort([-len(ids) for ids in input_ids], kind='stable')
+        embeddings = np.empty((len(input_ids), self.dimension), dtype=np.float32)
+        
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            length = max(len(input_ids[i]) for i in indices)
+            
+            batch_ids = np.full((len(indices), length), pad_id, dtype=np.int64)
+            batch_mask = np.zeros((len(indices), length), dtype=np.int64)
+            for row, i in enumerate(indices):
+                batch_ids[row, :len(input_ids[i])] = input_ids[i]
+                batch_mask[row, :len(input_ids[i])] = 1
+            
+            embeddings[indices] = self._forward_ids(batch_ids, batch_mask)
+        
+        self._total_encoded += len(input_ids)
+        return embeddings
+    
+    def _forward_ids(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        Pasa un batch de ids con padding por el modelo
+        
+        Args:
+            input_ids: Matriz (batch, longitud) de ids
+            attention_mask: Máscara de atención de la misma forma
+            
+        Returns:
+            Embeddings del batch en float32
+        """
+        if self.session is not None:
+            return self._run_onnx({'input_ids': input_ids, 'attention_mask': attention_mask})
+        
+        features = {
+            'input_ids': torch.from_numpy(input_ids).to(self.device),
+            'attention_mask': torch.from_numpy(attention_mask).to(self.device)
+        }
+        if 'token_type_ids' in self.model.tokenizer.model_input_names:
+            features['token_type_ids'] = torch.zeros_like(features['input_ids'])
+        
+        with torch.no_grad():
+            pooled = self.model(features)['sentence_embedding']
+            if self.normalize_embeddings:
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        
+        return pooled.cpu().numpy().astype(np.float32)
     
     def encode(self, texts: List[str], 
                batch_size: Optional[int] = None,
@@ -69,16 +364,101 @@ class EmbeddingEngine:
         
         batch_size = batch_size or self.batch_size
         
-        logger.debug(f"Generando embeddings para {len(texts)} textos (batch_size={batch_size})")
+        if self.cache_size > 0 and convert_to_numpy:
+            return self._encode_with_cache(texts, batch_size, show_progress)
+        return self._encode_model(texts, batch_size, show_progress, convert_to_numpy)
+    
+    def _encode_with_cache(self, texts: List[str], batch_size: int,
+                           show_progress: bool) -> np.ndarray:
+        """
+        Genera embeddings pasando por el modelo solo los textos no cacheados
+        
+        Args:
+            texts: Lista de textos
+            batch_size: Tamaño de batch
+            show_progress: Mostrar barra de progreso
+            
+        Returns:
+            Array numpy (n_textos, dimensión) en float32
+        """
+        keys = [_text_key(text) for text in texts]
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        miss_indices = []
+        
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    miss_indices.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    embeddings[i] = cached
+            self._cache_hits += len(texts) - len(miss_indices)
+        
+        if not miss_indices:
+            return embeddings
+        
+        # Los textos repetidos dentro del lote se codifican una sola vez
+        first_index = {}
+        for i in miss_indices:
+            first_index.setdefault(keys[i], i)
+        
+        new_embeddings = self._encode_model(
+            [texts[i] for i in first_index.values()], batch_size, show_progress, True
+        )
+        rows = dict(zip(first_index, new_embeddings.astype(np.float32, copy=False)))
+        for i in miss_indices:
+            embeddings[i] = rows[keys[i]]
+        
+        with self._cache_lock:
+            for key, row in rows.items():
+                # Copia: no retener el array del lote completo
+                self._cache[key] = row.copy()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
+        return embeddings
+    
+    def preload(self, texts: List[str]):
+        """
+        Codifica textos conocidos de antemano para que encode los sirva de la caché
+        
+        Args:
+            texts: Textos a precargar (p. ej. preguntas frecuentes)
+        """
+        if self.cache_size > 0 and texts:
+            self._encode_with_cache(texts, self.batch_size, False)
+            logger.info(f"{len(texts)} textos precargados en la caché de embeddings")
+    
+    def _encode_model(self, texts: List[str], batch_size: int, show_progress: bool,
+                      convert_to_numpy: bool) -> Union[np.ndarray, torch.Tensor]:
+        """
+        Genera embeddings con el modelo (sin caché)
+        
+        Args:
+            texts: Lista de textos
+            batch_size: Tamaño de batch
+            show_progress: Mostrar barra de progreso
+            convert_to_numpy: Convertir resultado a numpy array
+            
+        Returns:
+            Array numpy o tensor con los embeddings
+        """
+        logger.debug("Generando embeddings para %d textos (batch_size=%d)", len(texts), batch_size)
         
         try:
-            embeddings = self.model.encode(
-                texts,
-                batch_size=batch_size,
-                show_progress_bar=show_progress,
-                convert_to_numpy=convert_to_numpy,
-                normalize_embeddings=self.normalize_embeddings
-            )
+            if self.session is not None:
+                embeddings = self._encode_onnx(texts, batch_size)
+                if not convert_to_numpy:
+                    embeddings = torch.from_numpy(embeddings)
+            else:
+                embeddings = self.model.encode(
+                    texts,
+                    batch_size=batch_size,
+                    show_progress_bar=show_progress,
+                    convert_to_numpy=convert_to_numpy,
+                    normalize_embeddings=self.normalize_embeddings
+                )
             
             self._total_encoded += len(texts)
             
@@ -88,6 +468,128 @@ class EmbeddingEngine:
             logger.error(f"Error generando embeddings: {e}", exc_info=True)
             raise
     
+    def encode_parallel(self, texts: List[str], num_workers: int = 4) -> np.ndarray:
+        """
+        Genera embeddings repartiendo los textos entre varios procesos
+        
+        Pensado para ingestas grandes: en CPU cada worker tiene su propia copia
+        del modelo y usa solo su parte de los núcleos, evitando el GIL; con
+        varias GPU se lanza un proceso por GPU.
+        
+        Args:
+            texts: Lista de textos
+            num_workers: Número de procesos (solo en CPU)
+            
+        Returns:
+            Array numpy con los embeddings
+        """
+        if not texts:
+            return np.array([])
+        
+        devices = self._pool_devices(num_workers)
+        if devices is None:
+            return self.encode(texts)
+        
+        logger.info(f"Generando embeddings para {len(texts)} textos en {len(devices)} procesos")
+        
+        # Un mismo pool no admite llamadas concurrentes (colas compartidas)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = self._start_pool(devices)
+            
+            embeddings = self.model.encode_multi_process(
+                texts,
+                self._pool,
+                batch_size=self.batch_size
+            )
+        
+        if self.normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        
+        self._total_encoded += len(texts)
+        
+        return embeddings
+    
+    def _pool_devices(self, num_workers: int) -> Optional[List[str]]:
+        """
+        Elige los dispositivos del pool de procesos
+        
+        Args:
+            num_workers: Número de procesos en CPU
+            
+        Returns:
+            Un dispositivo por proceso, o None si no compensa usar el pool (el
+            backend ONNX ya paraleliza con sus hilos y una sola GPU no gana nada)
+        """
+        if self.model is None:
+            return None
+        
+        if self.device.startswith('cuda'):
+            gpu_count = torch.cuda.device_count()
+            return [f'cuda:{i}' for i in range(gpu_count)] if gpu_count > 1 else None
+        
+        return ['cpu'] * num_workers if num_workers > 1 else None
+    
+    def _start_pool(self, devices: List[str]) -> dict:
+        """
+        Arranca el pool de procesos de Sentence Transformers
+        
+        Args:
+            devices: Dispositivo de cada proceso
+            
+        Returns:
+            Pool de procesos
+        """
+        # Los workers heredan el entorno: repartir los núcleos para no sobresuscribir
+        threads_per_worker = max(1, (os.cpu_count() or 1) // len(devices))
+        previous = os.environ.get('OMP_NUM_THREADS')
+        os.environ['OMP_NUM_THREADS'] = str(threads_per_worker)
+        
+        try:
+            pool = self.model.start_multi_process_pool(devices)
+        finally:
+            if previous is None:
+                os.environ.pop('OMP_NUM_THREADS', None)
+            else:
+                os.environ['OMP_NUM_THREADS'] = previous
+        
+        atexit.register(self.close)
+        return pool
+    
+    def close(self):
+        """Detiene el pool de procesos si está activo"""
+        with self._pool_lock:
+            if self._pool is not None:
+                SentenceTransformer.stop_multi_process_pool(self._pool)
+                self._pool = None
+    
+    def encode_cached(self, texts: List[str], cache: EmbeddingCache) -> np.ndarray:
+        """
+        Genera embeddings codificando solo los textos que no están en caché
+        
+        Args:
+            texts: Lista de textos
+            cache: Caché de embeddings
+            
+        Returns:
+            Array numpy con los embeddings en el orden de texts
+        """
+        if not texts:
+            return np.array([])
+        
+        embeddings, miss_indices = cache.get_batch_embeddings(texts)
+        
+        # Una sola pasada del modelo para todos los fallos
+        if miss_indices:
+            miss_texts = [texts[i] for i in miss_indices]
+            new_embeddings = self.encode(miss_texts)
+            cache.set_batch_embeddings(miss_texts, new_embeddings)
+            for i, embedding in zip(miss_indices, new_embeddings):
+                embeddings[i] = embedding
+        
+        logger.debug("Embeddings en caché: %d/%d", len(texts) - len(miss_indices), len(texts))
+        return np.vstack(embeddings).astype(np.float32)
+    
     def encode_single(self, text: str, convert_to_numpy: bool = True) -> Union[np.ndarray, torch.Tensor]:
         """
         Genera embedding para un solo texto
@@ -116,18 +618,22 @@ class EmbeddingEngine:
         if not texts:
             return np.array([])
         
+        # Varias GPU: repartir todo el lote entre ellas en vez de iterar en una
+        if len(texts) >= 2 * chunk_size and self._pool_devices(1) is not None:
+            return self.encode_parallel(texts)
+        
         logger.info(f"Generando embeddings en streaming para {len(texts)} textos")
         
-        all_embeddings = []
+        # Cada chunk se escribe en su tramo: sin lista intermedia ni vstack
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
         
         for i in range(0, len(texts), chunk_size):
             chunk = texts[i:i + chunk_size]
-            chunk_embeddings = self.encode(chunk, show_progress=False)
-            all_embeddings.append(chunk_embeddings)
+            embeddings[i:i + len(chunk)] = self.encode(chunk, show_progress=False)
             
-            logger.debug(f"Procesado chunk {i//chunk_size + 1}/{(len(texts)-1)//chunk_size + 1}")
+            logger.debug("Procesado chunk %d/%d", i // chunk_size + 1, (len(texts) - 1) // chunk_size + 1)
         
-        return np.vstack(all_embeddings)
+        return embeddings
     
     def similarity(self, text1: str, text2: str) -> float:
         """
@@ -138,41 +644,145 @@ class EmbeddingEngine:
             text2: Segundo texto
             
         Returns:
-            Similitud coseno (0 a 1)
+            Similitud coseno (-1 a 1)
+        """
+        emb1 = np.ascontiguousarray(self.encode_single(text1), dtype=np.float32)
+        emb2 = np.ascontiguousarray(self.encode_single(text2), dtype=np.float32)
+        return self._sim(emb1, emb2)
+    
+    @staticmethod
+    def _cosine_fast(emb1: np.ndarray, emb2: np.ndarray) -> float:
+        """Coseno entre embeddings de norma unitaria (producto escalar)"""
+        if simsimd is not None:
+            return float(simsimd.inner(emb1, emb2))
+        return float(np.dot(emb1, emb2))
+    
+    @staticmethod
+    def _cosine_full(emb1: np.ndarray, emb2: np.ndarray) -> float:
+        """Coseno entre embeddings sin normalizar"""
+        if simsimd is not None:
+            # Kernel SIMD: producto y normas en una sola pasada
+            return float(1 - simsimd.cosine(emb1, emb2))
+        
+        # Una sola raíz y sin el despacho de np.linalg.norm
+        den = np.sqrt(np.vdot(emb1, emb1) * np.vdot(emb2, emb2))
+        return float(np.dot(emb1, emb2) / (den or 1.0))
+    
+    def _unit_rows(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Devuelve los embeddings como matriz contigua float32 de norma unitaria
+        
+        Args:
+            embeddings: Array (N, D) o (D,)
+            
+        Returns:
+            Array (N, D) listo para que el producto escalar sea el coseno
+        """
+        embeddings = np.ascontiguousarray(np.atleast_2d(embeddings), dtype=np.float32)
+        if not self.normalize_embeddings:
+            embeddings = embeddings / np.maximum(
+                np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12
+            )
+        return embeddings
+    
+    def build_index(self, candidates: List[str], approximate: bool = False,
+                    use_gpu: bool = False):
+        """
+        Codifica una sola vez los candidatos y los indexa para find_most_similar
+        
+        Con FAISS instalado la búsqueda se hace en C++ (IndexFlatIP exacto o
+        IVF+PQ aproximado); sin FAISS se conserva la matriz y se busca con NumPy.
+        
+        Args:
+            candidates: Textos candidatos
+            approximate: Usar IVF+PQ (menos memoria, resultados aproximados)
+                si hay al menos APPROXIMATE_INDEX_MIN_SIZE candidatos
+            use_gpu: Mover el índice FAISS a la GPU
+        """
+        embeddings = self._unit_rows(self.encode(candidates)) if candidates else None
+        
+        if embeddings is None or faiss is None:
+            index = embeddings
+        else:
+            index = self._build_faiss_index(embeddings, approximate)
+            if use_gpu:
+                index = faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+        
+        self._index = index
+        self._index_texts = list(candidates)
+        logger.info(f"Índice de candidatos construido: {len(candidates)} textos "
+                    f"({type(index).__name__})")
+    
+    def _build_faiss_index(self, embeddings: np.ndarray, approximate: bool):
+        """
+        Crea y llena un índice FAISS de producto interno
+        
+        Args:
+            embeddings: Matriz (N, D) normalizada
+            approximate: Preferir IVF+PQ cuando haya datos para entrenarlo
+            
+        Returns:
+            Índice FAISS con los embeddings añadidos
         """
-        emb1 = self.encode_single(text1)
-        emb2 = self.encode_single(text2)
+        n, dimension = embeddings.shape
         
-        # Similitud coseno
-        similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+        if approximate and n >= APPROXIMATE_INDEX_MIN_SIZE and dimension % 16 == 0:
+            nlist = min(256, int(4 * np.sqrt(n)))
+            index = faiss.index_factory(dimension, f"IVF{nlist},PQ16", faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+            faiss.extract_index_ivf(index).nprobe = min(16, nlist)
+        else:
+            index = faiss.IndexFlatIP(dimension)
         
-        return float(similarity)
+        index.add(embeddings)
+        return index
     
-    def find_most_similar(self, query: str, candidates: List[str], 
+    def find_most_similar(self, query: str, candidates: Optional[List[str]] = None,
                          top_k: int = 5) -> List[tuple]:
         """
         Encuentra los textos más similares a una consulta
         
         Args:
             query: Texto de consulta
-            candidates: Lista de textos candidatos
+            candidates: Lista de textos candidatos (None = buscar en el índice
+                creado con build_index)
             top_k: Número de resultados a retornar
             
         Returns:
-            Lista de tuplas (índice, texto, similitud)
+            Lista de tuplas (índice, texto, similitud coseno entre -1 y 1)
         """
-        if not candidates:
+        if candidates is None:
+            candidates = self._index_texts
+            index = self._index
+        else:
+            index = None
+        
+        top_k = min(top_k, len(candidates))
+        if top_k <= 0:
             return []
         
-        # Generar embeddings
-        query_emb = self.encode_single(query)
-        candidate_embs = self.encode(candidates)
+        query_emb = self._unit_rows(self.encode_single(query))
         
-        # Calcular similitudes
-        similarities = np.dot(candidate_embs, query_emb)
+        # Índice FAISS: búsqueda en C++ sin pasar por NumPy
+        if faiss is not None and index is not None and not isinstance(index, np.ndarray):
+            scores, indices = index.search(query_emb, top_k)
+            return [
+                (int(idx), candidates[idx], float(score))
+                for idx, score in zip(indices[0], scores[0]) if idx >= 0
+            ]
         
-        # Obtener top-k
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Matriz contigua (N, D) en float32: la del índice o codificada ahora
+        candidate_embs = index if index is not None else self._unit_rows(self.encode(candidates))
+        
+        # Una única multiplicación matriz-vector (BLAS)
+        similarities = candidate_embs @ query_emb[0]
+        
+        # Top-k parcial en O(N) y ordenar solo los seleccionados
+        if top_k < len(candidates):
+            top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+            top_indices = top_indices[np.argsort(-similarities[top_indices])]
+        else:
+            top_indices = np.argsort(-similarities)
         
         results = [
             (int(idx), candidates[idx], float(similarities[idx]))
@@ -181,6 +791,67 @@ class EmbeddingEngine:
         
         return results
     
+    def autotune_batch_size(self, cache_file: Optional[Path] = None,
+                            candidates: Sequence[int] = (8, 16, 32, 64, 128),
+                            num_samples: int = 64) -> int:
+        """
+        Elige el batch_size con menor tiempo por texto en este dispositivo
+        
+        En CPU el rendimiento se estanca con lotes pequeños y en GPU crece
+        hasta saturar memoria; se mide una vez y se guarda el resultado.
+        
+        Args:
+            cache_file: Archivo JSON donde persistir el resultado por
+                backend/dispositivo/modelo (None = no persistir)
+            candidates: Tamaños de batch a probar
+            num_samples: Textos de prueba por medición
+            
+        Returns:
+            batch_size seleccionado
+        """
+        key = f"{self.backend}:{self.device}:{self.model_name}"
+        
+        tuned = {}
+        if cache_file is not None and cache_file.exists():
+            try:
+                tuned = json.loads(cache_file.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f"No se pudo leer {cache_file}: {e}")
+        
+        if key in tuned:
+            self.batch_size = int(tuned[key])
+            logger.info(f"batch_size de embeddings (cacheado): {self.batch_size}")
+            return self.batch_size
+        
+        # Textos de prueba distintos con la longitud típica de un chunk; se
+        # mide _encode_model directamente para no cronometrar la caché en
+        # memoria en vez del modelo
+        sample = "Representative sentence of an academic paper chunk. " * 20
+        texts = [f"{sample}{i}" for i in range(num_samples)]
+        total_encoded = self._total_encoded
+        
+        self._encode_model(texts[:min(candidates)], min(candidates), False, True)
+        timings = {}
+        for batch_size in candidates:
+            start_time = time.perf_counter()
+            self._encode_model(texts, batch_size, False, True)
+            timings[batch_size] = (time.perf_counter() - start_time) / num_samples
+        
+        self._total_encoded = total_encoded
+        self.batch_size = min(timings, key=timings.get)
+        logger.info(f"batch_size de embeddings ajustado a {self.batch_size} "
+                    f"({timings[self.batch_size] * 1000:.2f}ms/texto)")
+        
+        if cache_file is not None:
+            tuned[key] = self.batch_size
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                cache_file.write_text(json.dumps(tuned, indent=2))
+            except OSError as e:
+                logger.warning(f"No se pudo guardar {cache_file}: {e}")
+        
+        return self.batch_size
+    
     def get_stats(self) -> dict:
         """
         Obtiene estadísticas del motor de embeddings
@@ -192,8 +863,13 @@ class EmbeddingEngine:
             'model_name': self.model_name,
             'dimension': self.dimension,
             'device': self.device,
+            'backend': self.backend,
             'batch_size': self.batch_size,
             'normalize_embeddings': self.normalize_embeddings,
+            'indexed_candidates': len(self._index_texts),
+            'cache_size': self.cache_size,
+            'cache_items': len(self._cache),
+            'cache_hits': self._cache_hits,
             'total_encoded': self._total_encoded
         }
     
@@ -0,0 +1,103 @@
+"""
+Caché de respuestas para preguntas repetidas literalmente
+"""
+
+from typing import Any, Optional
+import hashlib
+import threading
+import logging
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ExactCache:
+    """
+    Caché en memoria indexada por el SHA-256 de la pregunta normalizada
+    
+    Se consulta antes que la caché semántica: un acierto evita incluso
+    calcular el embedding de la pregunta.
+    """
+    
+    def __init__(self, maxsize: int = 10_000, ttl: int = 3600):
+        """
+        Inicializa la caché exacta
+        
+        Args:
+            maxsize: Máximo de respuestas guardadas
+            ttl: Time-to-live en segundos
+        """
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        
+        # Estadísticas
+        self._hits = 0
+        self._misses = 0
+    
+    @staticmethod
+    def make_key(question: str) -> str:
+        """
+        Genera la clave de una pregunta
+        
+        Args:
+            question: Texto de la pregunta
+        
+        Returns:
+            Hash SHA-256 de la pregunta normalizada
+        """
+        return hashlib.sha256(question.strip().lower().encode()).hexdigest()
+    
+    def get(self, question: str) -> Optional[Any]:
+        """
+        Obtiene la respuesta cacheada de una pregunta
+        
+        Args:
+            question: Texto de la pregunta
+        
+        Returns:
+            Payload cacheado o None
+        """
+        key = self.make_key(question)
+        
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                logger.debug("Cache hit (exacta): %.16s...", key)
+        
+        return payload
+    
+    def set(self, question: str, payload: Any):
+        """
+        Guarda la respuesta de una pregunta
+        
+        Args:
+            question: Texto de la pregunta
+            payload: Respuesta a cachear
+        """
+        key = self.make_key(question)
+        
+        with self._lock:
+            self._cache[key] = payload
+    
+    def clear(self):
+        """Elimina todas las respuestas cacheadas"""
+        with self._lock:
+            self._cache.clear()
+        
+        logger.info("Caché exacta limpiada")
+    
+    def get_stats(self) -> dict:
+        """
+        Obtiene estadísticas de la caché
+        
+        Returns:
+            Diccionario con estadísticas
+        """
+        return {
+            'items': len(self._cache),
+            'hits': self._hits,
+            'misses': self._misses
+        }
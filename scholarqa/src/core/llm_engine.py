@@ -3,20 +3,49 @@ Motor LLM local optimizado usando llama.cpp
 """
 
 from llama_cpp import Llama
+import llama_cpp
 from typing import Optional, List, Dict, Generator
 import logging
+import os
 from pathlib import Path
 import time
 
 logger = logging.getLogger(__name__)
 
+# Instrucción fija con la que empiezan todos los prompts de Q&A. llama.cpp
+# conserva la caché KV del prefijo de tokens común con la llamada anterior,
+# así que este bloque solo se evalúa una vez
+QA_PROMPT_PREFIX = """<s>[INST] Eres un asistente académico especializado. Responde la pregunta basándote ÚNICAMENTE en el contexto proporcionado. Si no puedes responder con la información dada, di "No tengo suficiente información en el contexto para responder esa pregunta."
+
+Contexto:
+"""
+
+# Resto del prompt tras el contexto
+QA_PROMPT_SUFFIX = """
+
+Pregunta: {question}
+
+Respuesta: [/INST]"""
+
+
+def _gpu_offload_available() -> bool:
+    """Indica si llama.cpp está compilado con soporte de GPU (CUDA, Metal...)"""
+    supports_gpu_offload = getattr(llama_cpp, 'llama_supports_gpu_offload', None)
+    if supports_gpu_offload is not None:
+        return bool(supports_gpu_offload())
+    # Versiones anteriores solo exponen la constante de compilación
+    return bool(getattr(llama_cpp, 'GGML_USE_CUBLAS', False))
+
 
 class LLMEngine:
     """Motor de inferencia LLM local con optimizaciones"""
     
     def __init__(self, model_path: str, n_ctx: int = 2048, 
                  n_threads: Optional[int] = None,
-                 n_gpu_layers: int = 0):
+                 n_gpu_layers: Optional[int] = None,
+                 n_batch: int = 512,
+                 use_mmap: bool = True,
+                 use_mlock: bool = False):
         """
         Inicializa el motor LLM
         
@@ -24,7 +53,11 @@ class LLMEngine:
             model_path: Ruta al modelo .gguf
             n_ctx: Tamaño del contexto
             n_threads: Número de threads (None = auto)
-            n_gpu_layers: Capas a cargar en GPU (0 = solo CPU)
+            n_gpu_layers: Capas a cargar en GPU (0 = solo CPU, -1 = todas,
+                None = todas si llama.cpp tiene soporte de GPU)
+            n_batch: Tokens del prompt evaluados por lote (prefill)
+            use_mmap: Mapear el modelo en memoria en lugar de copiarlo
+            use_mlock: Fijar el modelo en RAM para que no se pagine
         """
         model_path = Path(model_path)
         
@@ -35,23 +68,80 @@ class LLMEngine:
             )
         
         logger.info(f"Cargando modelo LLM: {model_path.name}")
+        self._prefetch(model_path)
+        
+        if n_gpu_layers is None:
+            n_gpu_layers = -1 if _gpu_offload_available() else 0
         
         self.model_path = model_path
         self.n_ctx = n_ctx
+        self.n_gpu_layers = n_gpu_layers
         
         self.llm = Llama(
             model_path=str(model_path),
             n_ctx=n_ctx,
             n_threads=n_threads,
             n_gpu_layers=n_gpu_layers,
+            n_batch=n_batch,
+            use_mmap=use_mmap,
+            use_mlock=use_mlock,
+            logits_all=False,
+            offload_kqv=True,
             verbose=False
         )
         
         self._total_tokens = 0
         self._total_requests = 0
         
+        # Tokens del prefijo fijo: se descuentan del presupuesto de contexto
+        self._prefix_token_count = len(self._tokenize(QA_PROMPT_PREFIX))
+        self._cache_prompt_prefix()
+        
         logger.info("Modelo LLM cargado exitosamente")
     
+    @staticmethod
+    def _prefetch(model_path: Path):
+        """
+        Pide al kernel que lea el modelo en la page cache en segundo plano
+        
+        llama.cpp mapea el .gguf con mmap y, sin esto, cada página se lee
+        con un fallo de página síncrono durante la carga y las primeras
+        generaciones.
+        
+        Args:
+            model_path: Ruta al modelo .gguf
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        
+        try:
+            fd = os.open(model_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug(f"No se pudo precargar el modelo: {e}")
+    
+    def _tokenize(self, text: str, add_bos: bool = True) -> List[int]:
+        """Tokeniza texto como lo hace llama.cpp con el prompt completo"""
+        return self.llm.tokenize(text.encode('utf-8'), add_bos=add_bos, special=True)
+    
+    def _cache_prompt_prefix(self):
+        """
+        Evalúa QA_PROMPT_PREFIX para dejar su caché KV lista
+        
+        Así también la primera pregunta solo procesa los tokens del contexto
+        y la pregunta.
+        """
+        try:
+            start_time = time.time()
+            self.llm.eval(self._tokenize(QA_PROMPT_PREFIX))
+            logger.info(f"Prefijo de prompt cacheado en {time.time() - start_time:.2f}s")
+        except Exception as e:
+            logger.warning(f"No se pudo cachear el prefijo del prompt: {e}")
+            self.llm.reset()
+    
     def generate(self, prompt: str, max_tokens: int = 512, 
                 temperature: float = 0.7, top_p: float = 0.95,
                 stop: Optional[List[str]] = None,
@@ -71,29 +161,57 @@ class LLMEngine:
             Texto generado
         """
         start_time = time.time()
-        logger.debug(f"Generando respuesta (max_tokens={max_tokens})")
+        text = "".join(self.generate_stream(
+            prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stop=stop,
+            repeat_penalty=repeat_penalty
+        )).strip()
+        
+        elapsed = time.time() - start_time
+        logger.debug("Respuesta generada en %.2fs", elapsed)
+        
+        return text
+    
+    def generate_stream(self, prompt: str, max_tokens: int = 512,
+                        temperature: float = 0.7, top_p: float = 0.95,
+                        stop: Optional[List[str]] = None,
+                        repeat_penalty: float = 1.1) -> Generator[str, None, None]:
+        """
+        Genera texto devolviendo cada fragmento en cuanto se produce
+        
+        Args:
+            prompt: Prompt de entrada
+            max_tokens: Máximo de tokens a generar
+            temperature: Temperature para sampling
+            top_p: Top-p para sampling
+            stop: Secuencias de parada
+            repeat_penalty: Penalización por repetición
+            
+        Yields:
+            Fragmentos de texto (sin recortar espacios)
+        """
+        logger.debug("Generando respuesta (max_tokens=%d)", max_tokens)
         
         try:
-            response = self.llm(
+            for chunk in self.llm(
                 prompt,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 top_p=top_p,
                 stop=stop or [],
                 repeat_penalty=repeat_penalty,
-                echo=False
-            )
+                echo=False,
+                stream=True
+            ):
+                # En streaming llama.cpp emite un fragmento por token
+                self._total_tokens += 1
+                yield chunk['choices'][0]['text']
             
-            text = response['choices'][0]['text'].strip()
-            
-            self._total_tokens += response['usage']['completion_tokens']
             self._total_requests += 1
             
-            elapsed = time.time() - start_time
-            logger.debug(f"Respuesta generada en {elapsed:.2f}s")
-            
-            return text
-            
         except Exception as e:
             logger.error(f"Error generando texto: {e}", exc_info=True)
             raise
@@ -109,19 +227,11 @@ class LLMEngine:
         Returns:
             Prompt formateado
         """
-        prompt = f"""<s>[INST] Eres un asistente académico especializado. Responde la pregunta basándote ÚNICAMENTE en el contexto proporcionado. Si no puedes responder con la información dada, di "No tengo suficiente información en el contexto para responder esa pregunta."
-
-Contexto:
-{context}
-
-Pregunta: {question}
-
-Respuesta: [/INST]"""
-        
-        return prompt
+        return QA_PROMPT_PREFIX + context + QA_PROMPT_SUFFIX.format(question=question)
     
     def answer_question(self, question: str, context_chunks: List[str],
-                       max_tokens: int = 512, temperature: float = 0.7) -> Dict:
+                       max_tokens: int = 512, temperature: float = 0.7,
+                       stream: bool = False) -> Dict:
         """
         Responde una pregunta usando chunks de contexto
         
@@ -130,6 +240,8 @@ Respuesta: [/INST]"""
             context_chunks: Lista de chunks relevantes
             max_tokens: Máximo de tokens
             temperature: Temperature
+            stream: Devolver en 'answer' un generador de fragmentos en lugar
+                del texto completo (sin 'generation_time')
             
         Returns:
             Diccionario con respuesta y metadatos
@@ -137,15 +249,25 @@ Respuesta: [/INST]"""
         # Combinar chunks en contexto
         context = "\n\n".join(context_chunks)
         
-        # Truncar contexto si es muy largo
-        max_context_length = self.n_ctx - max_tokens - 200
-        if len(context) > max_context_length:
-            context = context[:max_context_length] + "..."
-            logger.warning(f"Contexto truncado a {max_context_length} caracteres")
+        # Truncar contexto si es muy largo: n_ctx se mide en tokens, no en
+        # caracteres (se reservan los tokens de los puntos suspensivos)
+        suffix_tokens = len(self._tokenize(QA_PROMPT_SUFFIX.format(question=question) + "...", add_bos=False))
+        max_context_tokens = max(0, self.n_ctx - max_tokens - self._prefix_token_count - suffix_tokens)
+        context_tokens = self._tokenize(context, add_bos=False)
+        if len(context_tokens) > max_context_tokens:
+            context = self.llm.detokenize(context_tokens[:max_context_tokens]).decode('utf-8', errors='ignore') + "..."
+            logger.warning(f"Contexto truncado a {max_context_tokens} tokens")
         
         # Crear prompt
         prompt = self.create_qa_prompt(question, context)
         
+        if stream:
+            return {
+                'answer': self.generate_stream(prompt, max_tokens=max_tokens, temperature=temperature),
+                'context_used': len(context_chunks),
+                'prompt_length': len(prompt)
+            }
+        
         # Generar respuesta
         start_time = time.time()
         answer = self.generate(prompt, max_tokens=max_tokens, temperature=temperature)
@@ -163,6 +285,7 @@ Respuesta: [/INST]"""
         return {
             'model_path': str(self.model_path),
             'context_size': self.n_ctx,
+            'n_gpu_layers': self.n_gpu_layers,
             'total_tokens_generated': self._total_tokens,
             'total_requests': self._total_requests
         }
@@ -3,37 +3,202 @@ Procesador de PDFs académicos optimizado
 """
 
 import pypdf
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator, Sequence, Tuple
 import logging
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import hashlib
 
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # Backend opcional: se usa pypdf
+    fitz = None
+
+try:
+    import blake3
+except ImportError:  # Opcional: hash de contenido con SHA-256
+    blake3 = None
+
+from .cache_manager import CacheManager
+
 logger = logging.getLogger(__name__)
 
+# Estrategia de extracción con PyMuPDF según el tamaño del documento:
+# (máximo de páginas o None, páginas por tarea; 0 = secuencial en proceso).
+# PyMuPDF no libera el GIL, así que el paralelismo es entre procesos; en
+# documentos pequeños arrancarlos cuesta más de lo que ahorran y en los
+# grandes conviene repartir rangos más largos para amortizar cada tarea.
+DEFAULT_PARSER_RULES: List[Tuple[Optional[int], int]] = [
+    (50, 0),      # tiny/small: secuencial
+    (200, 25),    # medium
+    (500, 50),    # large
+    (None, 100),  # huge
+]
+
+# Patrones de _clean_text compilados una vez. Solo se sustituyen las
+# repeticiones: ' +' reemplazaba también cada espacio simple
+_MULTIPLE_SPACES = re.compile(r' {2,}')
+_MULTIPLE_NEWLINES = re.compile(r'\n{3,}')
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]')
+
+
+def parse_parser_rules(spec: str) -> List[Tuple[Optional[int], int]]:
+    """
+    Convierte "50:0,200:25,500:50,*:100" en reglas de extracción
+    
+    Args:
+        spec: Reglas "max_paginas:paginas_por_tarea" separadas por comas
+            ("*" = sin límite; 0 páginas por tarea = secuencial)
+        
+    Returns:
+        Lista de reglas ordenada por máximo de páginas
+    """
+    rules = []
+    for rule in filter(None, (part.strip() for part in spec.split(","))):
+        max_pages, pages_per_task = rule.split(":")
+        rules.append((None if max_pages.strip() == "*" else int(max_pages), int(pages_per_task)))
+    
+    return sorted(rules, key=lambda rule: float("inf") if rule[0] is None else rule[0])
+
+
+def _page_text_fitz(page, page_num: int) -> str:
+    """
+    Extrae el texto de una página de PyMuPDF con su cabecera
+    
+    Args:
+        page: Página de PyMuPDF
+        page_num: Índice de la página (desde 0)
+        
+    Returns:
+        Texto de la página o cadena vacía
+    """
+    try:
+        page_text = page.get_text("text")
+    except Exception as e:
+        logger.warning(f"Error en página {page_num + 1}: {e}")
+        return ""
+    
+    return f"\n--- Página {page_num + 1} ---\n{page_text}" if page_text else ""
+
+
+def _page_text_pypdf(page, page_num: int) -> str:
+    """
+    Extrae el texto de una página de pypdf con su cabecera
+    
+    Args:
+        page: Página de pypdf
+        page_num: Índice de la página (desde 0)
+        
+    Returns:
+        Texto de la página o cadena vacía
+    """
+    try:
+        page_text = page.extract_text()
+    except Exception as e:
+        logger.warning(f"Error en página {page_num + 1}: {e}")
+        return ""
+    
+    return f"\n--- Página {page_num + 1} ---\n{page_text}" if page_text else ""
+
+
+def _extract_page_range_pypdf(pdf_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extrae un rango de páginas con pypdf en un proceso hijo
+    
+    Los lectores de pypdf no se pueden serializar: cada proceso abre el PDF.
+    
+    Args:
+        pdf_path: Ruta al archivo PDF
+        start: Primera página (incluida)
+        stop: Última página (excluida)
+        
+    Returns:
+        Textos no vacíos de las páginas, en orden
+    """
+    with open(pdf_path, 'rb') as file:
+        pages = pypdf.PdfReader(file).pages
+        texts = (_page_text_pypdf(pages[page_num], page_num) for page_num in range(start, stop))
+        return [text for text in texts if text]
+
+
+def _extract_page_range_fitz(pdf_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extrae un rango de páginas en un proceso hijo (abre su propio documento)
+    
+    Args:
+        pdf_path: Ruta al archivo PDF
+        start: Primera página (incluida)
+        stop: Última página (excluida)
+        
+    Returns:
+        Textos no vacíos de las páginas, en orden
+    """
+    with fitz.open(pdf_path) as doc:
+        texts = (_page_text_fitz(doc[page_num], page_num) for page_num in range(start, stop))
+        return [text for text in texts if text]
+
+
+def _file_digest(file_path: Path) -> str:
+    """
+    Hash del contenido de un archivo (BLAKE3 multihilo si está disponible)
+    
+    Args:
+        file_path: Ruta del archivo
+        
+    Returns:
+        Hash en hexadecimal
+    """
+    if blake3 is not None:
+        return blake3.blake3(max_threads=blake3.blake3.AUTO).update_mmap(file_path).hexdigest()
+    
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
 
 class PDFProcessor:
     """Procesa archivos PDF y extrae texto de manera optimizada"""
     
-    def __init__(self, max_workers: int = 4):
+    def __init__(self, max_workers: int = 4,
+                 parser_rules: Optional[Sequence[Tuple[Optional[int], int]]] = None,
+                 cache: Optional[CacheManager] = None,
+                 max_cached_texts: int = 64):
         """
         Inicializa el procesador de PDFs
         
         Args:
             max_workers: Número máximo de workers para procesamiento paralelo
+            parser_rules: Reglas (máximo de páginas, páginas por tarea) que
+                eligen cómo extraer con PyMuPDF (None = DEFAULT_PARSER_RULES)
+            cache: Caché de páginas extraídas por hash de contenido; un PDF
+                idéntico (aunque cambie el nombre) no se vuelve a analizar
+            max_cached_texts: Textos completos (y metadatos) que se conservan
+                en memoria (se descartan los menos usados)
         """
         self.supported_extensions = ['.pdf']
         self.max_workers = max_workers
-        self._page_cache = {}
+        self.parser_rules = list(parser_rules or DEFAULT_PARSER_RULES)
+        self.cache = cache
+        self.max_cached_texts = max_cached_texts
+        self._page_cache: OrderedDict = OrderedDict()
+        self._meta_cache: OrderedDict = OrderedDict()
+        self._page_cache_lock = threading.Lock()
     
-    def extract_text(self, pdf_path: str, use_cache: bool = True) -> str:
+    def extract_text(self, pdf_path: str, use_cache: bool = True,
+                     workers: Optional[int] = None) -> str:
         """
         Extrae todo el texto de un PDF con optimizaciones
         
         Args:
             pdf_path: Ruta al archivo PDF
             use_cache: Usar caché de páginas
+            workers: Procesos para extraer páginas en paralelo con PyMuPDF
+                (None = max_workers)
             
         Returns:
             Texto extraído del PDF
@@ -45,28 +210,21 @@ class PDFProcessor:
             
             # Verificar caché
             cache_key = self._get_file_hash(pdf_path) if use_cache else None
-            if cache_key and cache_key in self._page_cache:
-                logger.debug(f"Usando texto cacheado para {pdf_path.name}")
-                return self._page_cache[cache_key]
+            text = self._cache_get(self._page_cache, cache_key) if cache_key else None
+            if text is not None:
+                logger.debug("Usando texto cacheado para %s", pdf_path.name)
+                return text
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                
-                logger.info(f"Procesando {num_pages} páginas de {pdf_path.name}")
-                
-                # Extracción paralela de páginas
-                if num_pages > 10 and self.max_workers > 1:
-                    text = self._extract_pages_parallel(pdf_reader)
-                else:
-                    text = self._extract_pages_sequential(pdf_reader)
+            # MuPDF (C) es un orden de magnitud más rápido que pypdf; sin
+            # PyMuPDF las páginas se leen en streaming con pypdf
+            text = "".join(self._iter_raw_pages(pdf_path, workers))
             
             # Limpiar texto
             text = self._clean_text(text)
             
             # Guardar en caché
             if cache_key:
-                self._page_cache[cache_key] = text
+                self._cache_put(self._page_cache, cache_key, text)
             
             logger.info(f"Texto extraído: {len(text)} caracteres, {text.count(' ')} palabras aprox.")
             return text
@@ -75,72 +233,217 @@ class PDFProcessor:
             logger.error(f"Error procesando PDF: {e}", exc_info=True)
             raise
     
-    def _extract_pages_sequential(self, pdf_reader: pypdf.PdfReader) -> str:
+    def process(self, pdf_path: str, workers: Optional[int] = None) -> Dict:
         """
-        Extrae páginas secuencialmente
+        Extrae texto y metadatos de un PDF
+        
+        Los metadatos se toman del documento ya abierto para extraer el
+        texto, así que el PDF no se vuelve a analizar.
         
         Args:
-            pdf_reader: Lector de PDF
+            pdf_path: Ruta al archivo PDF
+            workers: Procesos para extraer páginas en paralelo (None = max_workers)
             
         Returns:
-            Texto completo
+            Diccionario con 'text' y 'metadata'
+        """
+        text = self.extract_text(pdf_path, workers=workers)
+        return {'text': text, 'metadata': self.extract_metadata(pdf_path)}
+    
+    def _cache_get(self, cache: OrderedDict, key: str):
+        """Lee una entrada de una caché LRU en memoria (None si no está)"""
+        with self._page_cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+    
+    def _cache_put(self, cache: OrderedDict, key: str, value):
+        """Guarda una entrada en una caché LRU en memoria respetando max_cached_texts"""
+        if self.max_cached_texts <= 0:
+            return
+        with self._page_cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_cached_texts:
+                cache.popitem(last=False)
+    
+    def _remember_metadata(self, pdf_path: Path, build_metadata):
         """
-        text_parts = []
-        for page_num, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(f"\n--- Página {page_num + 1} ---\n{page_text}")
+        Cachea los metadatos de un documento abierto para otra operación
         
-        return "".join(text_parts)
+        Args:
+            pdf_path: Ruta al archivo PDF
+            build_metadata: Función sin argumentos que devuelve los metadatos
+        """
+        try:
+            self._cache_put(self._meta_cache, self._get_file_hash(pdf_path), build_metadata())
+        except Exception as e:
+            logger.debug(f"No se pudieron cachear los metadatos de {pdf_path.name}: {e}")
     
-    def _extract_pages_parallel(self, pdf_reader: pypdf.PdfReader) -> str:
+    def iter_pages(self, pdf_path: str, workers: Optional[int] = None) -> Iterator[str]:
         """
-        Extrae páginas en paralelo para PDFs grandes
+        Extrae el texto página a página sin materializar el documento completo
         
         Args:
-            pdf_reader: Lector de PDF
+            pdf_path: Ruta al archivo PDF
+            workers: Procesos para extraer páginas en paralelo con PyMuPDF
+                (None = max_workers)
             
-        Returns:
-            Texto completo
+        Yields:
+            Texto limpio de cada página con su cabecera
         """
-        pages = list(pdf_reader.pages)
-        text_parts = [None] * len(pages)
+        pdf_path = Path(pdf_path)
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"PDF no encontrado: {pdf_path}")
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_page = {
-                executor.submit(self._extract_page, page, idx): idx 
-                for idx, page in enumerate(pages)
-            }
+        for page_text in self._iter_raw_pages(pdf_path, workers):
+            yield self._clean_text(page_text) + "\n\n"
+    
+    def _iter_raw_pages(self, pdf_path: Path, workers: Optional[int] = None) -> Iterator[str]:
+        """
+        Texto sin limpiar de cada página, desde la caché si el contenido ya se extrajo
+        
+        Args:
+            pdf_path: Ruta al archivo PDF
+            workers: Procesos para extraer páginas en paralelo
             
-            for future in as_completed(future_to_page):
-                idx = future_to_page[future]
-                try:
-                    text_parts[idx] = future.result()
-                except Exception as e:
-                    logger.warning(f"Error extrayendo página {idx + 1}: {e}")
-                    text_parts[idx] = ""
+        Yields:
+            Texto de cada página con su cabecera
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache._generate_key("pdf_pages", _file_digest(pdf_path))
+            cached_pages = self.cache.get(key)
+            if cached_pages is not None:
+                logger.info(f"Usando páginas cacheadas para {pdf_path.name}")
+                yield from cached_pages
+                return
         
-        return "".join(filter(None, text_parts))
+        pages = []
+        if fitz is not None:
+            page_iter = self._iter_pages_fitz(pdf_path, workers)
+        else:
+            page_iter = self._iter_pages_pypdf(pdf_path, workers)
+        
+        for page_text in page_iter:
+            if key is not None:
+                pages.append(page_text)
+            yield page_text
+        
+        if key is not None:
+            self.cache.set(key, pages)
     
-    def _extract_page(self, page: pypdf.PageObject, page_num: int) -> str:
+    def _iter_pages_pypdf(self, pdf_path: Path, workers: Optional[int] = None) -> Iterator[str]:
         """
-        Extrae texto de una página
+        Extrae las páginas con pypdf
+        
+        pypdf es Python puro y retiene el GIL: los documentos grandes se
+        reparten en rangos de páginas entre procesos según parser_rules.
         
         Args:
-            page: Objeto de página
-            page_num: Número de página
+            pdf_path: Ruta al archivo PDF
+            workers: Número de procesos (None = max_workers)
             
-        Returns:
-            Texto de la página
+        Yields:
+            Texto de cada página con su cabecera
         """
-        try:
-            page_text = page.extract_text()
-            if page_text:
-                return f"\n--- Página {page_num + 1} ---\n{page_text}"
-        except Exception as e:
-            logger.warning(f"Error en página {page_num + 1}: {e}")
+        workers = self.max_workers if workers is None else workers
         
-        return ""
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = pypdf.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            self._remember_metadata(pdf_path, lambda: self._metadata_from_pypdf(pdf_reader, pdf_path))
+            
+            pages_per_task = self._pages_per_task(page_count)
+            
+            if workers <= 1 or pages_per_task <= 0:
+                logger.info(f"Procesando {page_count} páginas de {pdf_path.name} en streaming (pypdf)")
+                for page_num, page in enumerate(pdf_reader.pages):
+                    page_text = _page_text_pypdf(page, page_num)
+                    if page_text:
+                        yield page_text
+                return
+        
+        yield from self._iter_page_ranges(_extract_page_range_pypdf, pdf_path, page_count,
+                                          pages_per_task, workers, "pypdf")
+    
+    def _iter_pages_fitz(self, pdf_path: Path, workers: Optional[int] = None) -> Iterator[str]:
+        """
+        Extrae las páginas con PyMuPDF
+        
+        Según parser_rules, el documento se extrae en el propio proceso o
+        se reparte en rangos de páginas entre varios procesos; los rangos se
+        devuelven en orden a medida que terminan.
+        
+        Args:
+            pdf_path: Ruta al archivo PDF
+            workers: Número de procesos (None = max_workers)
+            
+        Yields:
+            Texto de cada página con su cabecera
+        """
+        workers = self.max_workers if workers is None else workers
+        
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+            self._remember_metadata(pdf_path, lambda: self._metadata_from_fitz(doc, pdf_path))
+            
+            pages_per_task = self._pages_per_task(page_count)
+            
+            if workers <= 1 or pages_per_task <= 0:
+                logger.info(f"Procesando {page_count} páginas de {pdf_path.name} (PyMuPDF)")
+                for page_num, page in enumerate(doc):
+                    page_text = _page_text_fitz(page, page_num)
+                    if page_text:
+                        yield page_text
+                return
+        
+        yield from self._iter_page_ranges(_extract_page_range_fitz, pdf_path, page_count,
+                                          pages_per_task, workers, "PyMuPDF")
+    
+    def _iter_page_ranges(self, extract_range, pdf_path: Path, page_count: int,
+                          pages_per_task: int, workers: int, backend: str) -> Iterator[str]:
+        """
+        Reparte rangos de páginas entre procesos y los devuelve en orden
+        
+        Args:
+            extract_range: Función de módulo (pdf_path, start, stop) -> textos
+            pdf_path: Ruta al archivo PDF
+            page_count: Número de páginas del documento
+            pages_per_task: Páginas por rango
+            workers: Número máximo de procesos
+            backend: Nombre del extractor (para el log)
+            
+        Yields:
+            Texto de cada página con su cabecera
+        """
+        starts = range(0, page_count, pages_per_task)
+        stops = [min(start + pages_per_task, page_count) for start in starts]
+        workers = min(workers, len(starts))
+        logger.info(f"Procesando {page_count} páginas de {pdf_path.name} ({backend}, {workers} procesos)")
+        
+        # Contexto por defecto (fork): con spawn cada hijo reimportaría el
+        # paquete core, incluidos torch y sentence-transformers
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for page_texts in executor.map(extract_range, [str(pdf_path)] * len(starts),
+                                           starts, stops):
+                yield from page_texts
+    
+    def _pages_per_task(self, page_count: int) -> int:
+        """
+        Páginas por tarea para un documento según parser_rules
+        
+        Args:
+            page_count: Número de páginas del documento
+            
+        Returns:
+            Páginas por tarea (0 = extracción secuencial)
+        """
+        for max_pages, pages_per_task in self.parser_rules:
+            if max_pages is None or page_count <= max_pages:
+                return pages_per_task
+        return self.parser_rules[-1][1]
     
     def _clean_text(self, text: str) -> str:
         """
@@ -153,30 +456,31 @@ class PDFProcessor:
             Texto limpio
         """
         # Eliminar múltiples espacios
-        text = re.sub(r' +', ' ', text)
+        text = _MULTIPLE_SPACES.sub(' ', text)
         
         # Eliminar múltiples saltos de línea
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = _MULTIPLE_NEWLINES.sub('\n\n', text)
         
         # Eliminar caracteres de control excepto saltos de línea y tabs
-        text = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+        text = _CONTROL_CHARS.sub('', text)
         
         return text.strip()
     
     def _get_file_hash(self, file_path: Path) -> str:
         """
-        Genera hash único del archivo para caché
+        Genera una clave del archivo para la caché en memoria
+        
+        Ruta, tamaño y mtime identifican la versión del archivo igual que un
+        hash de esos mismos datos, sin calcularlo.
         
         Args:
             file_path: Ruta del archivo
             
         Returns:
-            Hash MD5 del archivo
+            Clave "ruta:tamaño:mtime_ns"
         """
-        hasher = hashlib.md5()
-        hasher.update(str(file_path).encode())
-        hasher.update(str(file_path.stat().st_mtime).encode())
-        return hasher.hexdigest()
+        stat = file_path.stat()
+        return f"{file_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
     
     def extract_metadata(self, pdf_path: str) -> Dict:
         """
@@ -189,27 +493,21 @@ class PDFProcessor:
             Diccionario con metadatos
         """
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                metadata = pdf_reader.metadata or {}
-                
-                # Extraer y limpiar metadatos
-                def clean_metadata(value):
-                    if value is None:
-                        return ''
-                    return str(value).strip()
-                
-                return {
-                    'title': clean_metadata(metadata.get('/Title', Path(pdf_path).stem)),
-                    'author': clean_metadata(metadata.get('/Author', 'Desconocido')),
-                    'subject': clean_metadata(metadata.get('/Subject', '')),
-                    'creator': clean_metadata(metadata.get('/Creator', '')),
-                    'producer': clean_metadata(metadata.get('/Producer', '')),
-                    'num_pages': len(pdf_reader.pages),
-                    'file_size': Path(pdf_path).stat().st_size,
-                    'created': metadata.get('/CreationDate', ''),
-                    'modified': metadata.get('/ModDate', '')
-                }
+            pdf_path = Path(pdf_path)
+            cache_key = self._get_file_hash(pdf_path)
+            metadata = self._cache_get(self._meta_cache, cache_key)
+            
+            if metadata is None:
+                if fitz is not None:
+                    with fitz.open(pdf_path) as doc:
+                        metadata = self._metadata_from_fitz(doc, pdf_path)
+                else:
+                    with open(pdf_path, 'rb') as file:
+                        metadata = self._metadata_from_pypdf(pypdf.PdfReader(file), pdf_path)
+                self._cache_put(self._meta_cache, cache_key, metadata)
+            
+            # Copia: el llamador puede modificarla sin alterar la caché
+            return dict(metadata)
         except Exception as e:
             logger.warning(f"No se pudieron extraer metadatos: {e}")
             return {
@@ -224,6 +522,62 @@ class PDFProcessor:
                 'modified': ''
             }
     
+    def _metadata_from_pypdf(self, pdf_reader: pypdf.PdfReader, pdf_path: Path) -> Dict:
+        """
+        Lee los metadatos de un PDF abierto con pypdf
+        
+        Args:
+            pdf_reader: Lector de PDF
+            pdf_path: Ruta al archivo PDF
+            
+        Returns:
+            Diccionario con metadatos
+        """
+        metadata = pdf_reader.metadata or {}
+        
+        # Extraer y limpiar metadatos
+        def clean_metadata(value):
+            if value is None:
+                return ''
+            return str(value).strip()
+        
+        return {
+            'title': clean_metadata(metadata.get('/Title', pdf_path.stem)),
+            'author': clean_metadata(metadata.get('/Author', 'Desconocido')),
+            'subject': clean_metadata(metadata.get('/Subject', '')),
+            'creator': clean_metadata(metadata.get('/Creator', '')),
+            'producer': clean_metadata(metadata.get('/Producer', '')),
+            'num_pages': len(pdf_reader.pages),
+            'file_size': pdf_path.stat().st_size,
+            'created': metadata.get('/CreationDate', ''),
+            'modified': metadata.get('/ModDate', '')
+        }
+    
+    def _metadata_from_fitz(self, doc, pdf_path: Path) -> Dict:
+        """
+        Lee los metadatos de un PDF abierto con PyMuPDF
+        
+        Args:
+            doc: Documento de PyMuPDF
+            pdf_path: Ruta al archivo PDF
+            
+        Returns:
+            Diccionario con metadatos
+        """
+        metadata = doc.metadata or {}
+        
+        return {
+            'title': (metadata.get('title') or pdf_path.stem).strip(),
+            'author': (metadata.get('author') or 'Desconocido').strip(),
+            'subject': (metadata.get('subject') or '').strip(),
+            'creator': (metadata.get('creator') or '').strip(),
+            'producer': (metadata.get('producer') or '').strip(),
+            'num_pages': doc.page_count,
+            'file_size': pdf_path.stat().st_size,
+            'created': metadata.get('creationDate', ''),
+            'modified': metadata.get('modDate', '')
+        }
+    
     def chunk_text(self, text: str, chunk_size: int = 1000, 
                    chunk_overlap: int = 200) -> List[str]:
         """
@@ -240,21 +594,49 @@ class PDFProcessor:
         if not text or not text.strip():
             return []
         
-        chunks = []
-        start = 0
-        text_length = len(text)
+        chunks = list(self.iter_chunks([text], chunk_size, chunk_overlap))
+        
+        logger.info(f"Texto dividido en {len(chunks)} chunks")
+        return chunks
+    
+    def iter_chunks(self, pages: Iterable[str], chunk_size: int = 1000,
+                    chunk_overlap: int = 200) -> Iterator[str]:
+        """
+        Divide en chunks un texto que llega por partes (p. ej. páginas)
+        
+        Produce los mismos chunks que chunk_text sobre el texto concatenado,
+        pero solo retiene en memoria el resto que aún no forma un chunk.
         
-        while start < text_length:
-            end = start + chunk_size
-            chunk = text[start:end]
+        Args:
+            pages: Partes del texto en orden
+            chunk_size: Tamaño de cada chunk
+            chunk_overlap: Overlap entre chunks
             
-            if chunk.strip():
-                chunks.append(chunk.strip())
+        Yields:
+            Chunks de texto
+        """
+        step = chunk_size - chunk_overlap
+        if step <= 0:
+            raise ValueError("chunk_overlap debe ser menor que chunk_size")
+        buffer = ""
+        
+        for page in pages:
+            buffer += page
+            
+            # Emitir los chunks completos (offsets precalculados con range) y
+            # conservar solo el resto
+            starts = range(0, max(len(buffer) - chunk_size + 1, 0), step)
+            for start in starts:
+                chunk = buffer[start:start + chunk_size].strip()
+                if chunk:
+                    yield chunk
             
-            start += chunk_size - chunk_overlap
+            buffer = buffer[len(starts) * step:]
         
-        logger.info(f"Texto dividido en {len(chunks)} chunks")
-        return chunks
+        for start in range(0, len(buffer), step):
+            chunk = buffer[start:start + chunk_size].strip()
+            if chunk:
+                yield chunk
     
     def extract_text_with_layout(self, pdf_path: str) -> List[Dict]:
         """
@@ -270,19 +652,14 @@ class PDFProcessor:
             pdf_path = Path(pdf_path)
             pages_data = []
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    
-                    if page_text:
-                        pages_data.append({
-                            'page_number': page_num + 1,
-                            'text': page_text,
-                            'char_count': len(page_text),
-                            'word_count': len(page_text.split())
-                        })
+            for page_num, page_text in enumerate(self._iter_plain_pages(pdf_path)):
+                if page_text:
+                    pages_data.append({
+                        'page_number': page_num + 1,
+                        'text': page_text,
+                        'char_count': len(page_text),
+                        'word_count': len(page_text.split())
+                    })
             
             return pages_data
             
@@ -290,9 +667,30 @@ class PDFProcessor:
             logger.error(f"Error extrayendo con layout: {e}")
             return []
     
+    def _iter_plain_pages(self, pdf_path: Path) -> Iterator[str]:
+        """
+        Extrae el texto de cada página sin cabecera (PyMuPDF o pypdf)
+        
+        Args:
+            pdf_path: Ruta al archivo PDF
+            
+        Yields:
+            Texto de cada página (vacío si no tiene texto)
+        """
+        if fitz is not None:
+            with fitz.open(pdf_path) as doc:
+                for page in doc:
+                    yield page.get_text("text")
+        else:
+            with open(pdf_path, 'rb') as file:
+                for page in pypdf.PdfReader(file).pages:
+                    yield page.extract_text()
+    
     def clear_cache(self):
         """Limpia la caché de páginas"""
-        self._page_cache.clear()
+        with self._page_cache_lock:
+            self._page_cache.clear()
+            self._meta_cache.clear()
         logger.info("Caché de páginas limpiada")
     
     def validate_pdf(self, pdf_path: str) -> Dict[str, any]:
@@ -333,18 +731,18 @@ class PDFProcessor:
             if file_size > 100 * 1024 * 1024:  # 100 MB
                 result['warnings'].append('Archivo muy grande (>100MB)')
             
-            # Intentar abrir y leer
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                
-                if len(pdf_reader.pages) == 0:
-                    result['errors'].append('PDF sin páginas')
-                    return result
-                
-                # Intentar extraer texto de primera página
-                first_page_text = pdf_reader.pages[0].extract_text()
-                if not first_page_text or len(first_page_text.strip()) == 0:
-                    result['warnings'].append('Primera página sin texto extraíble')
+            # Intentar abrir y leer la primera página
+            pages = self._iter_plain_pages(pdf_path)
+            try:
+                first_page_text = next(pages, None)
+            finally:
+                pages.close()
+            if first_page_text is None:
+                result['errors'].append('PDF sin páginas')
+                return result
+            
+            if not first_page_text or len(first_page_text.strip()) == 0:
+                result['warnings'].append('Primera página sin texto extraíble')
             
             result['valid'] = True
             
@@ -0,0 +1,105 @@
+"""
+Reordenación de resultados con un cross-encoder
+"""
+
+from sentence_transformers import CrossEncoder
+from typing import Dict, List, Optional
+import logging
+import time
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """
+    Puntúa pares (pregunta, chunk) con un cross-encoder
+    
+    El bi-encoder del vector store recupera candidatos de forma barata; el
+    cross-encoder atiende a la pregunta y al chunk a la vez y los reordena con
+    más precisión antes de pasarlos al LLM.
+    """
+    
+    def __init__(self, model_name: str = "BAAI/bge-reranker-v2-m3",
+                 device: Optional[str] = None,
+                 batch_size: int = 32,
+                 max_length: int = 512):
+        """
+        Carga el cross-encoder
+        
+        Args:
+            model_name: Modelo de Sentence Transformers (CrossEncoder)
+            device: Dispositivo ('cuda', 'cpu', o None para auto-detección)
+            batch_size: Pares por lote al puntuar
+            max_length: Longitud máxima en tokens de cada par
+        """
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        
+        logger.info(f"Cargando reranker: {model_name}")
+        self.model = CrossEncoder(model_name, device=device, max_length=max_length)
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        
+        # Estadísticas
+        self._total_pairs = 0
+        self._total_time = 0.0
+        
+        logger.info(f"Reranker cargado en '{device}'")
+    
+    def predict(self, query: str, documents: List[str]) -> np.ndarray:
+        """
+        Puntúa la relevancia de cada documento para la pregunta
+        
+        Args:
+            query: Pregunta
+            documents: Textos candidatos
+        
+        Returns:
+            Array con una puntuación por documento (mayor = más relevante)
+        """
+        if not documents:
+            return np.empty(0, dtype=np.float32)
+        
+        start_time = time.time()
+        scores = self.model.predict(
+            [(query, document) for document in documents],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        
+        self._total_pairs += len(documents)
+        self._total_time += time.time() - start_time
+        return np.asarray(scores, dtype=np.float32)
+    
+    def rerank(self, query: str, documents: List[str], top_k: Optional[int] = None) -> List[int]:
+        """
+        Ordena los documentos por relevancia para la pregunta
+        
+        Args:
+            query: Pregunta
+            documents: Textos candidatos
+            top_k: Número de índices a devolver (None = todos)
+        
+        Returns:
+            Índices de los documentos de más a menos relevante
+        """
+        scores = self.predict(query, documents)
+        return np.argsort(-scores, kind='stable')[:top_k].tolist()
+    
+    def get_stats(self) -> Dict:
+        """
+        Obtiene estadísticas del reranker
+        
+        Returns:
+            Diccionario con estadísticas
+        """
+        return {
+            'model_name': self.model_name,
+            'device': self.device,
+            'batch_size': self.batch_size,
+            'total_pairs': self._total_pairs,
+            'avg_time_per_pair': self._total_time / self._total_pairs if self._total_pairs else 0.0
+        }
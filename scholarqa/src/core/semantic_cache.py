@@ -0,0 +1,203 @@
+"""
+Caché semántica de respuestas indexada por el embedding de la pregunta
+"""
+
+from pathlib import Path
+from typing import Any, Optional
+import json
+import os
+import threading
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Caché de respuestas que reconoce preguntas equivalentes por similitud coseno
+    """
+    
+    def __init__(self, dimension: int, ttl: int = 7 * 86400, max_items: int = 1000,
+                 dtype: np.dtype = np.float16, persist_path: Optional[Path] = None,
+                 index_version: Optional[Any] = None):
+        """
+        Inicializa la caché semántica
+        
+        Args:
+            dimension: Dimensión de los embeddings de pregunta
+            ttl: Time-to-live en segundos
+            max_items: Máximo de respuestas guardadas (se descartan las más antiguas)
+            dtype: Tipo de almacenamiento de los embeddings (float16 reduce
+                memoria y ancho de banda a la mitad frente a float32)
+            persist_path: Archivo .npz donde se conserva la caché entre
+                reinicios (None = solo en memoria); los payloads deben ser
+                serializables a JSON
+            index_version: Versión de la colección de documentos sobre la que
+                se calcularon las respuestas (p. ej. su número de chunks); se
+                guarda con la caché y una caché guardada con otra versión se
+                descarta al cargarla
+        """
+        self.dimension = dimension
+        self.ttl = ttl
+        self.max_items = max_items
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.index_version = index_version
+        
+        # Buffer circular: matriz de embeddings normalizados + payloads
+        self._embeddings = np.zeros((max_items, dimension), dtype=dtype)
+        self._timestamps = np.zeros(max_items, dtype=np.float64)
+        self._payloads = [None] * max_items
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        
+        # Estadísticas
+        self._hits = 0
+        self._misses = 0
+        
+        if self.persist_path is not None and self.persist_path.exists():
+            self._load()
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """Convierte el embedding a float32 con norma unitaria"""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+    
+    def lookup(self, embedding: np.ndarray, threshold: float = 0.95) -> Optional[Any]:
+        """
+        Busca una respuesta cacheada para una pregunta equivalente
+        
+        Args:
+            embedding: Embedding de la pregunta
+            threshold: Similitud coseno mínima para considerar un hit
+        
+        Returns:
+            Payload cacheado o None
+        """
+        query = self._normalize(embedding)
+        
+        with self._lock:
+            if self._size > 0:
+                # Acumular en float32 aunque se almacene en menor precisión
+                scores = self._embeddings[:self._size].astype(np.float32) @ query
+                best = int(np.argmax(scores))
+                
+                if (scores[best] >= threshold and
+                        time.time() - self._timestamps[best] < self.ttl):
+                    self._hits += 1
+                    logger.debug("Cache hit (semántica): similitud=%.3f", scores[best])
+                    return self._payloads[best]
+            
+            self._misses += 1
+        
+        return None
+    
+    def add(self, embedding: np.ndarray, payload: Any):
+        """
+        Guarda la respuesta de una pregunta
+        
+        Args:
+            embedding: Embedding de la pregunta
+            payload: Respuesta a cachear
+        """
+        vector = self._normalize(embedding)
+        
+        with self._lock:
+            slot = self._next
+            self._embeddings[slot] = vector
+            self._timestamps[slot] = time.time()
+            self._payloads[slot] = payload
+            
+            self._next = (slot + 1) % self.max_items
+            self._size = min(self._size + 1, self.max_items)
+            
+            if self.persist_path is not None:
+                self._save()
+    
+    def clear(self, index_version: Optional[Any] = None):
+        """
+        Elimina todas las respuestas cacheadas
+        
+        Args:
+            index_version: Nueva versión de la colección (None = conservar la actual)
+        """
+        with self._lock:
+            if index_version is not None:
+                self.index_version = index_version
+            self._payloads = [None] * self.max_items
+            self._size = 0
+            self._next = 0
+            
+            if self.persist_path is not None and self.persist_path.exists():
+                self.persist_path.unlink()
+        
+        logger.info("Caché semántica limpiada")
+    
+    def _save(self):
+        """Escribe la caché en persist_path (llamar con _lock adquirido)"""
+        tmp_path = self.persist_path.with_name(self.persist_path.name + ".tmp")
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    embeddings=self._embeddings[:self._size],
+                    timestamps=self._timestamps[:self._size],
+                    next=self._next,
+                    payloads=json.dumps(self._payloads[:self._size]),
+                    index_version=json.dumps(self.index_version)
+                )
+            # Reemplazo atómico: un lector nunca ve un archivo a medio escribir
+            os.replace(tmp_path, self.persist_path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"No se pudo guardar la caché semántica: {e}")
+    
+    def _load(self):
+        """Carga la caché guardada en persist_path si es compatible"""
+        try:
+            with np.load(self.persist_path) as data:
+                embeddings = data['embeddings']
+                timestamps = data['timestamps']
+                next_slot = int(data['next'])
+                payloads = json.loads(str(data['payloads']))
+                index_version = (json.loads(str(data['index_version']))
+                                 if 'index_version' in data.files else None)
+        except Exception as e:
+            logger.warning(f"No se pudo cargar la caché semántica: {e}")
+            return
+        
+        size = len(embeddings)
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.dimension or size > self.max_items:
+            logger.warning("Caché semántica guardada incompatible, se descarta")
+            return
+        
+        # Documentos añadidos o borrados desde que se guardó (p. ej. desde la
+        # CLI): las respuestas podrían citar chunks que ya no existen
+        if self.index_version is not None and index_version != self.index_version:
+            logger.info("Caché semántica guardada para otra versión de la colección, se descarta")
+            return
+        
+        self._embeddings[:size] = embeddings
+        self._timestamps[:size] = timestamps
+        self._payloads[:size] = payloads
+        self._size = size
+        self._next = next_slot % self.max_items
+        
+        logger.info(f"Caché semántica cargada: {size} respuestas")
+    
+    def get_stats(self) -> dict:
+        """
+        Obtiene estadísticas de la caché
+        
+        Returns:
+            Diccionario con estadísticas
+        """
+        return {
+            'items': self._size,
+            'hits': self._hits,
+            'misses': self._misses
+        }
@@ -2,7 +2,7 @@
 Divisor de texto optimizado con chunking semántico
 """
 
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Sequence
 import re
 import logging
 
@@ -14,6 +14,12 @@ class SemanticTextSplitter:
     Divisor de texto inteligente que respeta límites semánticos
     """
     
+    # Patrones para detectar límites semánticos (compilados una sola vez)
+    sentence_endings = re.compile(r'[.!?]\s+')
+    # Los párrafos se separan con str.split: los saltos de línea sobrantes
+    # de una racha \n\n\n... quedan en los extremos y se eliminan al limpiar
+    paragraph_separator = "\n\n"
+    
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
         """
         Inicializa el divisor de texto
@@ -24,10 +30,6 @@ class SemanticTextSplitter:
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        
-        # Patrones para detectar límites semánticos
-        self.sentence_endings = re.compile(r'[.!?]\s+')
-        self.paragraph_endings = re.compile(r'\n\n+')
     
     def split_text(self, text: str) -> List[str]:
         """
@@ -42,11 +44,64 @@ class SemanticTextSplitter:
         if not text or not text.strip():
             return []
         
-        # Primero intentar dividir por párrafos
-        paragraphs = self.paragraph_endings.split(text)
+        chunks = list(self.iter_chunks([text]))
         
-        chunks = []
-        current_chunk = ""
+        logger.info(f"Texto dividido en {len(chunks)} chunks semánticos")
+        return chunks
+    
+    def iter_chunks(self, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Divide en chunks un texto que llega por partes (p. ej. páginas)
+        
+        Produce los mismos chunks que split_text sobre el texto concatenado,
+        pero solo retiene el párrafo incompleto y el chunk en construcción.
+        
+        Args:
+            pages: Partes del texto en orden
+            
+        Yields:
+            Chunks de texto con overlap
+        """
+        prev_chunk = None
+        for chunk in self._pack_paragraphs(self._iter_paragraphs(pages)):
+            if prev_chunk is None or self.chunk_overlap == 0:
+                yield chunk
+            else:
+                yield self._overlap(prev_chunk, chunk)
+            prev_chunk = chunk
+    
+    def _iter_paragraphs(self, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Separa en párrafos un texto que llega por partes
+        
+        Args:
+            pages: Partes del texto en orden
+            
+        Yields:
+            Párrafos (sin limpiar)
+        """
+        tail = ""
+        for page in pages:
+            paragraphs = (tail + page).split(self.paragraph_separator)
+            # El último trozo puede continuar en la siguiente parte
+            tail = paragraphs.pop()
+            yield from paragraphs
+        yield tail
+    
+    def _pack_paragraphs(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        """
+        Agrupa párrafos en chunks de hasta chunk_size caracteres
+        
+        Args:
+            paragraphs: Párrafos en orden
+            
+        Yields:
+            Chunks sin overlap
+        """
+        # Partes del chunk actual y su longitud una vez unidas (evita
+        # concatenar cadenas repetidamente)
+        current_parts = []
+        current_length = 0
         
         for paragraph in paragraphs:
             paragraph = paragraph.strip()
@@ -54,33 +109,26 @@ class SemanticTextSplitter:
                 continue
             
             # Si el párrafo cabe en el chunk actual
-            if len(current_chunk) + len(paragraph) + 2 <= self.chunk_size:
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
-                else:
-                    current_chunk = paragraph
+            if current_length + len(paragraph) + 2 <= self.chunk_size:
+                current_length += len(paragraph) + (2 if current_parts else 0)
+                current_parts.append(paragraph)
             else:
-                # Guardar chunk actual si existe
-                if current_chunk:
-                    chunks.append(current_chunk)
+                # Emitir chunk actual si existe
+                if current_parts:
+                    yield "\n\n".join(current_parts)
                 
                 # Si el párrafo es muy largo, dividirlo por oraciones
                 if len(paragraph) > self.chunk_size:
                     para_chunks = self._split_long_paragraph(paragraph)
-                    chunks.extend(para_chunks[:-1])
-                    current_chunk = para_chunks[-1] if para_chunks else ""
+                    yield from para_chunks[:-1]
+                    current_parts = para_chunks[-1:]
                 else:
-                    current_chunk = paragraph
-        
-        # Añadir el último chunk
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        # Añadir overlap
-        chunks = self._add_overlap(chunks)
+                    current_parts = [paragraph]
+                current_length = len(current_parts[0]) if current_parts else 0
         
-        logger.info(f"Texto dividido en {len(chunks)} chunks semánticos")
-        return chunks
+        # Emitir el último chunk
+        if current_parts:
+            yield "\n\n".join(current_parts)
     
     def _split_long_paragraph(self, paragraph: str) -> List[str]:
         """
@@ -94,31 +142,32 @@ class SemanticTextSplitter:
         """
         sentences = self.sentence_endings.split(paragraph)
         chunks = []
-        current_chunk = ""
+        current_parts = []
+        current_length = 0
         
         for sentence in sentences:
             sentence = sentence.strip()
             if not sentence:
                 continue
             
-            if len(current_chunk) + len(sentence) + 2 <= self.chunk_size:
-                if current_chunk:
-                    current_chunk += ". " + sentence
-                else:
-                    current_chunk = sentence
+            if current_length + len(sentence) + 2 <= self.chunk_size:
+                current_length += len(sentence) + (2 if current_parts else 0)
+                current_parts.append(sentence)
             else:
-                if current_chunk:
-                    chunks.append(current_chunk)
+                if current_parts:
+                    chunks.append(". ".join(current_parts))
                 
                 # Si una sola oración es muy larga, dividirla por caracteres
                 if len(sentence) > self.chunk_size:
                     chunks.extend(self._split_by_chars(sentence))
-                    current_chunk = ""
+                    current_parts = []
+                    current_length = 0
                 else:
-                    current_chunk = sentence
+                    current_parts = [sentence]
+                    current_length = len(sentence)
         
-        if current_chunk:
-            chunks.append(current_chunk)
+        if current_parts:
+            chunks.append(". ".join(current_parts))
         
         return chunks
     
@@ -132,45 +181,32 @@ class SemanticTextSplitter:
         Returns:
             Lista de chunks
         """
-        chunks = []
-        for i in range(0, len(text), self.chunk_size - self.chunk_overlap):
-            chunk = text[i:i + self.chunk_size]
-            if chunk.strip():
-                chunks.append(chunk)
-        return chunks
+        step = self.chunk_size - self.chunk_overlap
+        if step <= 0:
+            raise ValueError("chunk_overlap debe ser menor que chunk_size")
+        
+        chunks = (text[i:i + self.chunk_size] for i in range(0, len(text), step))
+        return [chunk for chunk in chunks if not chunk.isspace()]
     
-    def _add_overlap(self, chunks: List[str]) -> List[str]:
+    def _overlap(self, prev_chunk: str, current_chunk: str) -> str:
         """
-        Añade overlap entre chunks para mantener contexto
+        Antepone a un chunk el final del anterior
         
         Args:
-            chunks: Lista de chunks sin overlap
+            prev_chunk: Chunk anterior (sin overlap)
+            current_chunk: Chunk actual (sin overlap)
             
         Returns:
-            Lista de chunks con overlap
+            Chunk actual con overlap
         """
-        if len(chunks) <= 1 or self.chunk_overlap == 0:
-            return chunks
-        
-        overlapped_chunks = [chunks[0]]
-        
-        for i in range(1, len(chunks)):
-            prev_chunk = chunks[i - 1]
-            current_chunk = chunks[i]
-            
-            # Tomar las últimas palabras del chunk anterior
-            overlap_text = prev_chunk[-self.chunk_overlap:]
-            
-            # Buscar un límite de palabra limpio
-            space_idx = overlap_text.find(' ')
-            if space_idx > 0:
-                overlap_text = overlap_text[space_idx + 1:]
-            
-            # Combinar overlap con chunk actual
-            overlapped_chunk = overlap_text + " " + current_chunk
-            overlapped_chunks.append(overlapped_chunk)
-        
-        return overlapped_chunks
+        # Tomar las últimas palabras del chunk anterior, empezando en un
+        # límite de palabra limpio (sin copiar antes la cola completa)
+        cutoff = max(len(prev_chunk) - self.chunk_overlap, 0)
+        space_idx = prev_chunk.find(' ', cutoff)
+        overlap_text = prev_chunk[space_idx + 1 if space_idx > cutoff else cutoff:]
+        
+        # Combinar overlap con chunk actual (una sola cadena nueva)
+        return f"{overlap_text} {current_chunk}"
 
 
 class RecursiveTextSplitter:
@@ -178,12 +214,12 @@ class RecursiveTextSplitter:
     Divisor recursivo que prueba múltiples separadores
     """
     
+    # Separadores en orden de preferencia
+    separators = ("\n\n", "\n", ". ", ", ", " ", "")
+    
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        
-        # Separadores en orden de preferencia
-        self.separators = ["\n\n", "\n", ". ", ", ", " ", ""]
     
     def split_text(self, text: str) -> List[str]:
         """
@@ -195,9 +231,24 @@ class RecursiveTextSplitter:
         Returns:
             Lista de chunks
         """
-        return self._split_text_recursive(text, self.separators)
+        return list(self.iter_chunks(text))
+    
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """
+        Divide texto recursivamente produciendo cada chunk al cerrarlo
+        
+        Permite empezar a codificar los primeros chunks sin construir la
+        lista completa.
+        
+        Args:
+            text: Texto a dividir
+            
+        Yields:
+            Chunks de texto
+        """
+        return self._iter_split_recursive(text, self.separators)
     
-    def _split_text_recursive(self, text: str, separators: List[str]) -> List[str]:
+    def _iter_split_recursive(self, text: str, separators: Sequence[str]) -> Iterator[str]:
         """
         División recursiva del texto
         
@@ -205,60 +256,65 @@ class RecursiveTextSplitter:
             text: Texto a dividir
             separators: Lista de separadores a probar
             
-        Returns:
-            Lista de chunks
+        Yields:
+            Chunks de texto
         """
         if not text or not text.strip():
-            return []
+            return
         
         # Si el texto cabe en un chunk, retornarlo
         if len(text) <= self.chunk_size:
-            return [text]
+            yield text
+            return
         
         # Probar con el primer separador
         if not separators:
             # No hay más separadores, dividir por caracteres
-            return self._split_by_length(text)
+            yield from self._split_by_length(text)
+            return
         
         separator = separators[0]
         remaining_separators = separators[1:]
         
+        if not separator:
+            # Trozos consecutivos de chunk_size caracteres, sin crear una
+            # cadena por carácter
+            for i in range(0, len(text), self.chunk_size):
+                yield text[i:i + self.chunk_size]
+            return
+        
         # Dividir por el separador actual
-        splits = text.split(separator) if separator else list(text)
+        splits = text.split(separator)
         
-        # Recombinar splits en chunks
-        chunks = []
+        # Recombinar splits en chunks (atributos y longitudes fijas en locales)
+        chunk_size = self.chunk_size
+        sep_len = len(separator)
         current_chunk = []
         current_length = 0
         
         for split in splits:
             split_len = len(split)
             
-            if current_length + split_len + len(separator) <= self.chunk_size:
+            if current_length + split_len + sep_len <= chunk_size:
                 current_chunk.append(split)
-                current_length += split_len + len(separator)
+                current_length += split_len + sep_len
             else:
-                # Guardar chunk actual
+                # Emitir chunk actual
                 if current_chunk:
-                    chunk_text = separator.join(current_chunk)
-                    chunks.append(chunk_text)
+                    yield separator.join(current_chunk)
                 
                 # Si el split actual es muy grande, dividirlo recursivamente
-                if split_len > self.chunk_size:
-                    sub_chunks = self._split_text_recursive(split, remaining_separators)
-                    chunks.extend(sub_chunks)
+                if split_len > chunk_size:
+                    yield from self._iter_split_recursive(split, remaining_separators)
                     current_chunk = []
                     current_length = 0
                 else:
                     current_chunk = [split]
                     current_length = split_len
         
-        # Añadir último chunk
+        # Emitir último chunk
         if current_chunk:
-            chunk_text = separator.join(current_chunk)
-            chunks.append(chunk_text)
-        
-        return chunks
+            yield separator.join(current_chunk)
     
     def _split_by_length(self, text: str) -> List[str]:
         """
@@ -270,16 +326,12 @@ class RecursiveTextSplitter:
         Returns:
             Lista de chunks
         """
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            
-            if chunk.strip():
-                chunks.append(chunk)
-            
-            start += self.chunk_size - self.chunk_overlap
-        
-        return chunks
+        step = self.chunk_size - self.chunk_overlap
+        if step <= 0:
+            raise ValueError("chunk_overlap debe ser menor que chunk_size")
+        
+        # Offsets precalculados con range: el bucle y el corte corren en C.
+        # Los trozos nunca están vacíos, así que isspace() descarta los de
+        # solo espacios igual que strip() pero sin crear otra cadena
+        chunks = (text[start:start + self.chunk_size] for start in range(0, len(text), step))
+        return [chunk for chunk in chunks if not chunk.isspace()]
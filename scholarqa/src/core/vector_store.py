@@ -4,10 +4,15 @@ Gestión de base de datos vectorial optimizada usando ChromaDB
 
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 import logging
 from pathlib import Path
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .embeddings import EmbeddingEngine
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +20,35 @@ logger = logging.getLogger(__name__)
 class VectorStore:
     """Gestiona almacenamiento y búsqueda en ChromaDB con optimizaciones"""
     
-    def __init__(self, persist_directory: str, collection_name: str = "academic_papers"):
+    def __init__(self, persist_directory: str, collection_name: str = "academic_papers",
+                 hnsw_m: int = 16,
+                 hnsw_construction_ef: int = 128,
+                 hnsw_search_ef: int = 100,
+                 hnsw_sync_threshold: int = 1000,
+                 embedding_engine: Optional[EmbeddingEngine] = None,
+                 rescore_candidates: int = 50,
+                 cache_tokens: bool = False,
+                 add_workers: int = 1):
         """
         Inicializa la conexión con ChromaDB
         
         Args:
             persist_directory: Directorio para persistir datos
             collection_name: Nombre de la colección
+            hnsw_m: Conectividad del grafo HNSW (vecinos por nodo)
+            hnsw_construction_ef: Tamaño de la lista de candidatos al insertar
+            hnsw_search_ef: Tamaño de la lista de candidatos al buscar
+            hnsw_sync_threshold: Inserciones acumuladas antes de volcar el
+                índice HNSW a disco
+            embedding_engine: Motor para calcular los embeddings (None = función
+                por defecto de ChromaDB)
+            rescore_candidates: Candidatos mínimos que query_by_vector recupera
+                del grafo HNSW (búsqueda más amplia) antes de quedarse con los
+                n_results más cercanos (0 = desactivar)
+            cache_tokens: Guardar los ids tokenizados de cada chunk en ficheros
+                .npz junto a la colección (re-embedding sin tokenizar)
+            add_workers: Hilos para insertar lotes en paralelo cuando ChromaDB
+                calcula los embeddings (sin embedding_engine ni embeddings dados)
         """
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
@@ -38,10 +65,19 @@ class VectorStore:
         )
         
         self.collection_name = collection_name
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"description": "Academic papers collection"}
-        )
+        self.hnsw_m = hnsw_m
+        self.hnsw_construction_ef = hnsw_construction_ef
+        self.hnsw_search_ef = hnsw_search_ef
+        self.hnsw_sync_threshold = hnsw_sync_threshold
+        self.embedding_engine = embedding_engine
+        self.rescore_candidates = rescore_candidates
+        self.cache_tokens = cache_tokens and embedding_engine is not None
+        self.add_workers = max(1, add_workers)
+        self.tokens_dir = self.persist_directory / "tokens" / collection_name
+        self.collection = self._get_or_create_collection()
+        
+        # Conteo de documentos cacheado (None = consultar a ChromaDB)
+        self._count_cache: Optional[int] = None
         
         # Estadísticas
         self._query_count = 0
@@ -49,9 +85,50 @@ class VectorStore:
         
         logger.info(f"Colección '{collection_name}' lista con {self.get_collection_count()} documentos")
     
+    def _get_or_create_collection(self):
+        """
+        Obtiene la colección o la crea con el índice HNSW configurado
+        
+        Los parámetros HNSW solo se aplican al crear la colección: en una
+        colección existente el índice ya está construido con los suyos.
+        
+        Returns:
+            Colección de ChromaDB
+        """
+        try:
+            return self.client.get_collection(name=self.collection_name)
+        except ValueError:
+            return self.client.create_collection(
+                name=self.collection_name,
+                metadata={
+                    "description": "Academic papers collection",
+                    "hnsw:space": "cosine",
+                    "hnsw:M": self.hnsw_m,
+                    "hnsw:construction_ef": self.hnsw_construction_ef,
+                    "hnsw:search_ef": self.hnsw_search_ef,
+                    "hnsw:sync_threshold": self.hnsw_sync_threshold
+                }
+            )
+    
+    def warm_up(self):
+        """
+        Carga en memoria el índice HNSW persistido
+        
+        ChromaDB abre el segmento vectorial en el primer acceso a embeddings;
+        forzarlo aquí evita que la primera consulta pague la carga.
+        """
+        if self.get_collection_count() == 0:
+            return
+        
+        start_time = time.time()
+        self.collection.get(limit=1, include=['embeddings'])
+        logger.info(f"Índice HNSW cargado en {time.time() - start_time:.2f}s")
+    
     def add_documents(self, texts: List[str], metadatas: List[Dict], 
                      ids: Optional[List[str]] = None,
-                     batch_size: int = 100):
+                     batch_size: int = 100,
+                     embeddings: Optional[Any] = None,
+                     parallel: bool = True):
         """
         Añade documentos a la colección con procesamiento por lotes
         
@@ -60,48 +137,196 @@ class VectorStore:
             metadatas: Lista de metadatos
             ids: Lista de IDs (opcional)
             batch_size: Tamaño de batch para inserción
+            embeddings: Embeddings ya calculados (opcional, array o lista)
+            parallel: Insertar lotes en paralelo (add_workers hilos) cuando
+                ChromaDB tiene que calcular los embeddings. Con embeddings ya
+                calculados las inserciones se serializan en el lock de
+                escritura de ChromaDB y se hacen siempre en secuencia
         """
         if not texts:
             logger.warning("No hay textos para añadir")
             return
         
-        if ids is None:
-            timestamp = int(time.time() * 1000)
-            ids = [f"doc_{timestamp}_{i}" for i in range(len(texts))]
+        num_texts = len(texts)
         
-        if len(texts) != len(metadatas) or len(texts) != len(ids):
+        # Validar antes de generar IDs o codificar nada
+        if len(metadatas) != num_texts or (ids is not None and len(ids) != num_texts):
             raise ValueError("Las listas texts, metadatas e ids deben tener la misma longitud")
         
-        logger.info(f"Añadiendo {len(texts)} documentos a la colección")
+        if embeddings is not None and len(embeddings) != num_texts:
+            raise ValueError("embeddings debe tener la misma longitud que texts")
+        
+        if ids is None:
+            # Un prefijo aleatorio por lote: sin colisiones entre lotes del
+            # mismo milisegundo y sin formatear un timestamp por elemento
+            prefix = f"doc_{uuid.uuid4().hex}_"
+            ids = [prefix + format(i, 'x') for i in range(num_texts)]
+        
+        logger.info(f"Añadiendo {num_texts} documentos a la colección")
+        
+        # Codificar todo de una vez: el modelo ordena por longitud y minimiza padding
+        if self.cache_tokens:
+            token_ids = self.embedding_engine.tokenize(texts)
+            self._save_token_ids(ids, token_ids)
+            if embeddings is None:
+                embeddings = self.embedding_engine.encode_pretokenized(token_ids)
+        elif embeddings is None and self.embedding_engine is not None:
+            embeddings = self.embedding_engine.encode(texts)
+        
+        if embeddings is not None and not isinstance(embeddings, list):
+            embeddings = embeddings.tolist()
         
         # Procesar por lotes para mejor rendimiento
-        total_batches = (len(texts) + batch_size - 1) // batch_size
+        total_batches = (num_texts + batch_size - 1) // batch_size
+        
+        if total_batches == 1:
+            # Un solo lote (lo habitual en la ingesta): sin copiar las listas
+            batches = [(texts, metadatas, ids, embeddings)]
+        else:
+            batches = [
+                (texts[i:i + batch_size], metadatas[i:i + batch_size], ids[i:i + batch_size],
+                 embeddings[i:i + batch_size] if embeddings is not None else None)
+                for i in range(0, num_texts, batch_size)
+            ]
+        
+        try:
+            if parallel and self.add_workers > 1 and embeddings is None and total_batches > 1:
+                # El embedding de ChromaDB libera el GIL: solapar varios lotes
+                with ThreadPoolExecutor(max_workers=self.add_workers) as executor:
+                    futures = [
+                        executor.submit(self._add_batch, batch_num, total_batches, *batch)
+                        for batch_num, batch in enumerate(batches, 1)
+                    ]
+                    for future in futures:
+                        future.result()
+            else:
+                for batch_num, batch in enumerate(batches, 1):
+                    self._add_batch(batch_num, total_batches, *batch)
+        except Exception:
+            self._count_cache = None
+            raise
+        
+        self._add_count += num_texts
+        self._count_cache = None
+        logger.info(f"✓ {num_texts} documentos añadidos exitosamente")
+    
+    def _add_batch(self, batch_num: int, total_batches: int, texts: List[str],
+                   metadatas: List[Dict], ids: List[str], embeddings: Optional[List]):
+        """
+        Inserta un lote en la colección
         
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_metadatas = metadatas[i:i + batch_size]
-            batch_ids = ids[i:i + batch_size]
+        Args:
+            batch_num: Número del lote (para logs)
+            total_batches: Número total de lotes
+            texts: Textos del lote
+            metadatas: Metadatos del lote
+            ids: IDs del lote
+            embeddings: Embeddings del lote (None = los calcula ChromaDB)
+        """
+        try:
+            self.collection.add(
+                documents=texts,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                ids=ids
+            )
+            logger.debug("Batch %d/%d añadido", batch_num, total_batches)
+        except Exception as e:
+            logger.error(f"Error añadiendo batch {batch_num}: {e}")
+            raise
+    
+    def get_existing_ids(self, ids: List[str]) -> set:
+        """
+        Comprueba qué IDs ya están en la colección
+        
+        Una sola consulta de metadatos, sin cargar documentos ni embeddings;
+        permite descartar chunks ya indexados antes de codificarlos.
+        
+        Args:
+            ids: IDs a comprobar
+        
+        Returns:
+            Conjunto con los IDs que ya existen
+        """
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=list(ids), include=[])['ids'])
+    
+    def _save_token_ids(self, ids: List[str], token_ids: List[np.ndarray]):
+        """
+        Guarda los ids tokenizados de un lote en un fichero .npz
+        
+        Los ids de todos los chunks se concatenan en un único array con sus
+        offsets para no crear una entrada por chunk.
+        
+        Args:
+            ids: IDs de los chunks
+            token_ids: Ids tokenizados de cada chunk
+        """
+        self.tokens_dir.mkdir(parents=True, exist_ok=True)
+        lengths = np.fromiter((len(t) for t in token_ids), dtype=np.int64, count=len(token_ids))
+        
+        np.savez(
+            self.tokens_dir / f"{time.time_ns()}.npz",
+            ids=np.asarray(ids),
+            offsets=np.concatenate(([0], np.cumsum(lengths))),
+            tokens=np.concatenate(token_ids) if token_ids else np.array([], dtype=np.int32),
+            tokenizer=np.asarray(self.embedding_engine.tokenizer_name)
+        )
+    
+    def load_token_ids(self) -> Dict[str, np.ndarray]:
+        """
+        Carga los ids tokenizados guardados para el tokenizador actual
+        
+        Returns:
+            Diccionario chunk_id -> array de ids (los lotes más recientes prevalecen)
+        """
+        token_ids = {}
+        if not self.cache_tokens or not self.tokens_dir.exists():
+            return token_ids
+        
+        tokenizer_name = self.embedding_engine.tokenizer_name
+        for path in sorted(self.tokens_dir.glob("*.npz")):
+            with np.load(path) as data:
+                if str(data['tokenizer']) != tokenizer_name:
+                    continue
+                offsets, tokens = data['offsets'], data['tokens']
+                for i, chunk_id in enumerate(data['ids'].tolist()):
+                    token_ids[chunk_id] = tokens[offsets[i]:offsets[i + 1]]
+        
+        return token_ids
+    
+    def reembed_from_tokens(self, batch_size: int = 1000) -> int:
+        """
+        Recalcula los embeddings de la colección desde los ids cacheados
+        
+        Útil tras cambiar el modelo manteniendo el tokenizador: no se vuelve
+        a tokenizar ningún chunk.
+        
+        Args:
+            batch_size: Chunks por actualización
             
-            try:
-                self.collection.add(
-                    documents=batch_texts,
-                    metadatas=batch_metadatas,
-                    ids=batch_ids
-                )
-                
-                batch_num = i // batch_size + 1
-                logger.debug(f"Batch {batch_num}/{total_batches} añadido")
-                
-            except Exception as e:
-                logger.error(f"Error añadiendo batch {i//batch_size + 1}: {e}")
-                raise
-        
-        self._add_count += len(texts)
-        logger.info(f"✓ {len(texts)} documentos añadidos exitosamente")
+        Returns:
+            Número de chunks recalculados
+        """
+        token_ids = self.load_token_ids()
+        existing = set(self.collection.get(include=[])['ids'])
+        chunk_ids = [chunk_id for chunk_id in token_ids if chunk_id in existing]
+        
+        for i in range(0, len(chunk_ids), batch_size):
+            batch_ids = chunk_ids[i:i + batch_size]
+            embeddings = self.embedding_engine.encode_pretokenized(
+                [token_ids[chunk_id] for chunk_id in batch_ids]
+            )
+            self.collection.update(ids=batch_ids, embeddings=embeddings.tolist())
+        
+        logger.info(f"{len(chunk_ids)} chunks recalculados desde ids tokenizados")
+        return len(chunk_ids)
     
     def query(self, query_text: str, n_results: int = 5, 
               where: Optional[Dict] = None,
-              where_document: Optional[Dict] = None) -> Dict:
+              where_document: Optional[Dict] = None,
+              ef_search: Optional[int] = None) -> Dict:
         """
         Busca documentos similares con filtros opcionales
         
@@ -110,28 +335,141 @@ class VectorStore:
             n_results: Número de resultados a retornar
             where: Filtros de metadatos
             where_document: Filtros de documento
+            ef_search: Candidatos a explorar en el grafo HNSW (None = valor
+                de la colección). Más alto mejora el recall a costa de latencia
+            
+        Returns:
+            Diccionario con resultados
+        """
+        logger.debug("Buscando: '%.50s...' (n_results=%d)", query_text, n_results)
+        
+        if self.embedding_engine is not None:
+            query_kwargs = {
+                'query_embeddings': [self.embedding_engine.encode_single(query_text).tolist()]
+            }
+        else:
+            query_kwargs = {'query_texts': [query_text]}
+        
+        return self._query(query_kwargs, n_results, where, where_document, ef_search)
+    
+    def query_batch(self, query_texts: List[str], n_results: int = 5,
+                    where: Optional[Dict] = None,
+                    where_document: Optional[Dict] = None,
+                    ef_search: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Busca varias consultas en una sola llamada a ChromaDB
+        
+        Los embeddings de todas las consultas se calculan en un único batch;
+        quien tenga varias preguntas independientes debería usar este método
+        en lugar de llamar a query una vez por pregunta.
+        
+        Args:
+            query_texts: Textos de consulta
+            n_results: Número de resultados por consulta
+            where: Filtros de metadatos (comunes a todas las consultas)
+            where_document: Filtros de documento
+            ef_search: Candidatos a explorar en el grafo HNSW (None = valor
+                de la colección)
+            
+        Returns:
+            Una lista de resultados (como query_with_scores) por consulta
+        """
+        if not query_texts:
+            return []
+        
+        logger.debug("Buscando %d consultas (n_results=%d)", len(query_texts), n_results)
+        
+        if self.embedding_engine is not None:
+            query_kwargs = {
+                'query_embeddings': self.embedding_engine.encode(list(query_texts)).tolist()
+            }
+        else:
+            query_kwargs = {'query_texts': list(query_texts)}
+        
+        results = self._query(query_kwargs, n_results, where, where_document, ef_search)
+        return [self._format_results(results, row) for row in range(len(query_texts))]
+    
+    def query_by_vector(self, embedding: Any, n_results: int = 5,
+                        where: Optional[Dict] = None,
+                        where_document: Optional[Dict] = None,
+                        ef_search: Optional[int] = None) -> Dict:
+        """
+        Busca documentos similares a partir de un embedding ya calculado
+        
+        Recupera max(rescore_candidates, 10 * n_results) candidatos del grafo
+        HNSW y se queda con los n_results de menor distancia coseno.
+        
+        Args:
+            embedding: Embedding de la consulta (mismo modelo que la colección)
+            n_results: Número de resultados a retornar
+            where: Filtros de metadatos
+            where_document: Filtros de documento
+            ef_search: Candidatos a explorar en el grafo HNSW (None = valor
+                de la colección)
             
         Returns:
             Diccionario con resultados
         """
-        logger.debug(f"Buscando: '{query_text[:50]}...' (n_results={n_results})")
+        logger.debug("Buscando por vector (n_results=%d)", n_results)
         
+        query_vector = np.asarray(embedding, dtype=np.float32).ravel()
+        query_kwargs = {'query_embeddings': [query_vector.tolist()]}
+        
+        return self._query(query_kwargs, n_results, where, where_document, ef_search,
+                           query_vector=query_vector)
+    
+    def _query(self, query_kwargs: Dict, n_results: int,
+               where: Optional[Dict], where_document: Optional[Dict],
+               ef_search: Optional[int],
+               query_vector: Optional[np.ndarray] = None) -> Dict:
+        """
+        Ejecuta la consulta sobre la colección (texto o embedding ya resuelto)
+        
+        Con query_vector se sobremuestrean candidatos (el grafo explora más
+        vecinos) y se recortan a los n_results de menor distancia.
+        """
         try:
             # Asegurar que n_results no exceda el número de documentos
             collection_count = self.get_collection_count()
             n_results = min(n_results, collection_count) if collection_count > 0 else n_results
             
+            # hnswlib explora max(ef, k) candidatos: para un ef_search mayor que
+            # el de la colección se pide k = ef_search y se recorta después
+            n_search = n_results
+            if ef_search is not None and ef_search > self.hnsw_search_ef:
+                n_search = max(n_results, ef_search)
+            
+            oversample = query_vector is not None and self.rescore_candidates > 0
+            if oversample:
+                n_search = max(n_search, self.rescore_candidates, 10 * n_results)
+            
+            if collection_count > 0:
+                n_search = min(n_search, collection_count)
+            
+            include = ['metadatas', 'documents', 'distances']
+            
             results = self.collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
+                **query_kwargs,
+                n_results=n_search,
                 where=where,
-                where_document=where_document
+                where_document=where_document,
+                include=include
             )
             
-            self._query_count += 1
+            if n_search > n_results:
+                # Con hnsw:space=cosine y vectores float32 las distancias ya son
+                # 1 - coseno exacto: basta ordenar por ellas (sin traer los
+                # embeddings) y recortar
+                for row, distances in enumerate(results['distances'] or []):
+                    order = np.argsort(distances, kind='stable')[:n_results].tolist()
+                    for key in ('ids', *include):
+                        if results.get(key):
+                            results[key][row] = [results[key][row][i] for i in order]
+            
+            self._query_count += len(next(iter(query_kwargs.values())))
             
             num_results = len(results['documents'][0]) if results['documents'] else 0
-            logger.debug(f"Encontrados {num_results} resultados")
+            logger.debug("Encontrados %d resultados", num_results)
             
             return results
             
@@ -139,29 +477,47 @@ class VectorStore:
             logger.error(f"Error en query: {e}", exc_info=True)
             raise
     
-    def query_with_scores(self, query_text: str, n_results: int = 5) -> List[Dict]:
+    def query_with_scores(self, query_text: Union[str, List[str]],
+                          n_results: int = 5) -> Union[List[Dict], List[List[Dict]]]:
         """
         Busca documentos y retorna resultados con scores de relevancia
         
         Args:
-            query_text: Texto de consulta
+            query_text: Texto de consulta, o lista de textos para buscarlos
+                en batch con query_batch
             n_results: Número de resultados
             
         Returns:
             Lista de diccionarios con documento, metadata, distancia y score
+            (una lista por consulta si query_text es una lista)
         """
+        if isinstance(query_text, list):
+            return self.query_batch(query_text, n_results)
+        
         results = self.query(query_text, n_results)
+        return self._format_results(results)
+    
+    def _format_results(self, results: Dict, row: int = 0) -> List[Dict]:
+        """
+        Convierte una fila de resultados de ChromaDB en diccionarios con score
         
+        Args:
+            results: Resultados de collection.query
+            row: Índice de la consulta dentro del batch
+            
+        Returns:
+            Lista de diccionarios con documento, metadata, distancia y score
+        """
         formatted_results = []
         
-        if results['documents'] and results['documents'][0]:
-            for i in range(len(results['documents'][0])):
+        if results['documents'] and results['documents'][row]:
+            for i in range(len(results['documents'][row])):
                 formatted_results.append({
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                    'id': results['ids'][0][i] if results['ids'] else None,
-                    'distance': results['distances'][0][i] if 'distances' in results else None,
-                    'relevance_score': 1.0 / (1.0 + results['distances'][0][i]) if 'distances' in results else None
+                    'document': results['documents'][row][i],
+                    'metadata': results['metadatas'][row][i] if results['metadatas'] else {},
+                    'id': results['ids'][row][i] if results['ids'] else None,
+                    'distance': results['distances'][row][i] if 'distances' in results else None,
+                    'relevance_score': 1.0 / (1.0 + results['distances'][row][i]) if 'distances' in results else None
                 })
         
         return formatted_results
@@ -181,6 +537,8 @@ class VectorStore:
             
             if text is not None:
                 update_kwargs['documents'] = [text]
+                if self.embedding_engine is not None:
+                    update_kwargs['embeddings'] = self.embedding_engine.encode([text]).tolist()
             
             if metadata is not None:
                 update_kwargs['metadatas'] = [metadata]
@@ -200,6 +558,7 @@ class VectorStore:
             ids: Lista de IDs a eliminar
         """
         try:
+            self._count_cache = None
             self.collection.delete(ids=ids)
             logger.info(f"Eliminados {len(ids)} documentos")
         except Exception as e:
@@ -214,6 +573,7 @@ class VectorStore:
             where: Filtro de metadatos
         """
         try:
+            self._count_cache = None
             self.collection.delete(where=where)
             logger.info(f"Eliminados documentos con filtro: {where}")
         except Exception as e:
@@ -263,16 +623,15 @@ class VectorStore:
                 offset=offset
             )
             
-            documents = []
-            if results['documents']:
-                for i in range(len(results['documents'])):
-                    documents.append({
-                        'id': results['ids'][i],
-                        'document': results['documents'][i],
-                        'metadata': results['metadatas'][i] if results['metadatas'] else {}
-                    })
+            if not results['documents']:
+                return []
             
-            return documents
+            # zip recorre las columnas una sola vez (sin indexar cada lista por fila)
+            metadatas = results['metadatas'] or [{}] * len(results['documents'])
+            return [
+                {'id': doc_id, 'document': document, 'metadata': metadata}
+                for doc_id, document, metadata in zip(results['ids'], results['documents'], metadatas)
+            ]
             
         except Exception as e:
             logger.error(f"Error listando documentos: {e}")
@@ -282,7 +641,10 @@ class VectorStore:
         """Elimina la colección actual"""
         logger.warning(f"Eliminando colección '{self.collection_name}'")
         try:
+            self._count_cache = None
             self.client.delete_collection(name=self.collection_name)
+            for path in self.tokens_dir.glob("*.npz"):
+                path.unlink()
             logger.info(f"Colección '{self.collection_name}' eliminada")
         except Exception as e:
             logger.error(f"Error eliminando colección: {e}")
@@ -292,18 +654,25 @@ class VectorStore:
         """Resetea la colección (elimina y recrea)"""
         logger.warning(f"Reseteando colección '{self.collection_name}'")
         self.delete_collection()
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"description": "Academic papers collection"}
-        )
+        self.collection = self._get_or_create_collection()
+        self._count_cache = None
         self._query_count = 0
         self._add_count = 0
         logger.info("Colección reseteada")
     
     def get_collection_count(self) -> int:
-        """Retorna el número de documentos en la colección"""
+        """
+        Retorna el número de documentos en la colección
+        
+        El conteo se cachea y se invalida en cada escritura hecha a través de
+        esta instancia, así que query no consulta a ChromaDB dos veces.
+        Escrituras de otros procesos no se ven hasta la siguiente invalidación.
+        """
+        if self._count_cache is not None:
+            return self._count_cache
         try:
-            return self.collection.count()
+            self._count_cache = self.collection.count()
+            return self._count_cache
         except Exception as e:
             logger.error(f"Error obteniendo conteo: {e}")
             return 0
@@ -320,6 +689,7 @@ class VectorStore:
             'document_count': self.get_collection_count(),
             'total_queries': self._query_count,
             'total_adds': self._add_count,
+            'hnsw_search_ef': self.hnsw_search_ef,
             'persist_directory': str(self.persist_directory)
         }
     
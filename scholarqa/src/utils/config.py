@@ -13,9 +13,27 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Directorios ya creados en este proceso: los accesores de Config se llaman en
+# cada petición y no necesitan repetir el mkdir
+_created_dirs = set()
+
+
+def _ensure_dir(path: Path) -> Path:
+    """Crea un directorio (con sus padres) la primera vez que se pide"""
+    if path not in _created_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _created_dirs.add(path)
+    return path
+
 
 class Config:
-    """Configuración centralizada y validada de la aplicación"""
+    """
+    Configuración centralizada y validada de la aplicación
+    
+    Las variables de entorno se leen una sola vez al importar el módulo: la
+    configuración es una instantánea y se puede sobrescribir asignando los
+    atributos de la clase (p. ej. en tests).
+    """
     
     # Directorios base
     BASE_DIR = Path(__file__).parent.parent.parent
@@ -27,11 +45,18 @@ class Config:
     # Modelos
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
     LLM_MODEL = os.getenv("LLM_MODEL", "models/downloaded/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+    EMBEDDING_ONNX_MODEL = os.getenv("EMBEDDING_ONNX_MODEL", "models/downloaded/minilm.onnx")
     
     # ChromaDB
     CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "data/vector_store")
     COLLECTION_NAME = os.getenv("COLLECTION_NAME", "academic_papers")
     CHROMA_BATCH_SIZE = int(os.getenv("CHROMA_BATCH_SIZE", 100))
+    HNSW_M = int(os.getenv("HNSW_M", 16))
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 128))
+    HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 100))
+    HNSW_SYNC_THRESHOLD = int(os.getenv("HNSW_SYNC_THRESHOLD", 1000))
+    RESCORE_CANDIDATES = int(os.getenv("RESCORE_CANDIDATES", 50))
+    CACHE_TOKENS = os.getenv("CACHE_TOKENS", "False").lower() == "true"
     
     # Flask
     FLASK_HOST = os.getenv("FLASK_HOST", "0.0.0.0")
@@ -39,26 +64,54 @@ class Config:
     FLASK_DEBUG = os.getenv("FLASK_DEBUG", "False").lower() == "true"
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 100))  # MB
     
+    # Gunicorn
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+    WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+    UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 2))
+    
     # Procesamiento de texto
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
     MAX_CHUNKS_PER_QUERY = int(os.getenv("MAX_CHUNKS_PER_QUERY", 5))
+    RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "False").lower() == "true"
+    RERANKER_MODEL = os.getenv("RERANKER_MODEL", "BAAI/bge-reranker-v2-m3")
+    RERANK_OVERSAMPLE = int(os.getenv("RERANK_OVERSAMPLE", 4))
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 32))
     USE_SEMANTIC_CHUNKING = os.getenv("USE_SEMANTIC_CHUNKING", "True").lower() == "true"
+    PDF_PARSER_RULES = os.getenv("PDF_PARSER_RULES", "50:0,200:25,500:50,*:100")
     
     # LLM Settings
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", 512))
     TEMPERATURE = float(os.getenv("TEMPERATURE", 0.7))
     TOP_P = float(os.getenv("TOP_P", 0.95))
     N_CTX = int(os.getenv("N_CTX", 2048))
-    N_GPU_LAYERS = int(os.getenv("N_GPU_LAYERS", 0))
+    # "auto" = todas las capas si llama.cpp tiene soporte de GPU
+    _N_GPU_LAYERS = os.getenv("N_GPU_LAYERS", "auto")
+    N_GPU_LAYERS = None if _N_GPU_LAYERS.lower() == "auto" else int(_N_GPU_LAYERS)
+    N_BATCH = int(os.getenv("N_BATCH", 512))
+    LLM_USE_MLOCK = os.getenv("LLM_USE_MLOCK", "False").lower() == "true"
     
     # Embeddings Settings
     EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
     NORMALIZE_EMBEDDINGS = os.getenv("NORMALIZE_EMBEDDINGS", "True").lower() == "true"
+    EMBEDDING_BETTERTRANSFORMER = os.getenv("EMBEDDING_BETTERTRANSFORMER", "True").lower() == "true"
+    EMBEDDING_COMPILE = os.getenv("EMBEDDING_COMPILE", "False").lower() == "true"
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+    AUTOTUNE_BATCH_SIZE = os.getenv("AUTOTUNE_BATCH_SIZE", "True").lower() == "true"
+    PARALLEL_ENCODE_THRESHOLD = int(os.getenv("PARALLEL_ENCODE_THRESHOLD", 512))
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 16))
+    EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", 10))
+    EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", 30))  # segundos
+    INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", 256))
+    INGEST_EMBED_WAIT_MS = float(os.getenv("INGEST_EMBED_WAIT_MS", 20))
     
     # Cache Settings
     ENABLE_CACHE = os.getenv("ENABLE_CACHE", "True").lower() == "true"
     CACHE_TTL = int(os.getenv("CACHE_TTL", 3600))  # segundos
+    CACHE_SIM_THRESHOLD = float(os.getenv("CACHE_SIM_THRESHOLD", 0.95))
+    CACHE_TTL_DAYS = int(os.getenv("CACHE_TTL_DAYS", 7))
+    EXACT_CACHE_SIZE = int(os.getenv("EXACT_CACHE_SIZE", 10000))
+    PDF_CACHE_TTL_DAYS = int(os.getenv("PDF_CACHE_TTL_DAYS", 30))
     
     # Performance
     MAX_WORKERS = int(os.getenv("MAX_WORKERS", 4))
@@ -72,23 +125,17 @@ class Config:
     @classmethod
     def get_upload_folder(cls) -> Path:
         """Retorna la carpeta de uploads"""
-        folder = cls.DATA_DIR / "uploads"
-        folder.mkdir(parents=True, exist_ok=True)
-        return folder
+        return _ensure_dir(cls.DATA_DIR / "uploads")
     
     @classmethod
     def get_pdfs_folder(cls) -> Path:
         """Retorna la carpeta de PDFs"""
-        folder = cls.DATA_DIR / "pdfs"
-        folder.mkdir(parents=True, exist_ok=True)
-        return folder
+        return _ensure_dir(cls.DATA_DIR / "pdfs")
     
     @classmethod
     def get_vector_store_path(cls) -> Path:
         """Retorna la ruta del vector store"""
-        path = cls.BASE_DIR / cls.CHROMA_PERSIST_DIR
-        path.mkdir(parents=True, exist_ok=True)
-        return path
+        return _ensure_dir(cls.BASE_DIR / cls.CHROMA_PERSIST_DIR)
     
     @classmethod
     def get_llm_model_path(cls) -> Path:
@@ -97,17 +144,37 @@ class Config:
             return cls.BASE_DIR / cls.LLM_MODEL
         return Path(cls.LLM_MODEL)
     
+    @classmethod
+    def get_embedding_onnx_path(cls) -> Path:
+        """Retorna la ruta completa del modelo de embeddings ONNX cuantizado"""
+        if cls.EMBEDDING_ONNX_MODEL.startswith("models/"):
+            return cls.BASE_DIR / cls.EMBEDDING_ONNX_MODEL
+        return Path(cls.EMBEDDING_ONNX_MODEL)
+    
+    @classmethod
+    def get_batch_size_cache_path(cls) -> Path:
+        """Retorna el archivo con los batch_size de embeddings ajustados"""
+        return cls.MODELS_DIR / "downloaded" / ".batch_size"
+    
     @classmethod
     def get_cache_dir(cls) -> Path:
         """Retorna el directorio de caché"""
-        cls.CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        return cls.CACHE_DIR
+        return _ensure_dir(cls.CACHE_DIR)
+    
+    @classmethod
+    def get_pdf_cache_dir(cls) -> Path:
+        """Retorna el directorio de caché de páginas extraídas de PDFs"""
+        return _ensure_dir(cls.CACHE_DIR / "pdf")
+    
+    @classmethod
+    def get_semantic_cache_path(cls) -> Path:
+        """Retorna el archivo donde se persiste la caché semántica de respuestas"""
+        return cls.get_cache_dir() / "semantic_cache.npz"
     
     @classmethod
     def get_logs_dir(cls) -> Path:
         """Retorna el directorio de logs"""
-        cls.LOGS_DIR.mkdir(parents=True, exist_ok=True)
-        return cls.LOGS_DIR
+        return _ensure_dir(cls.LOGS_DIR)
     
     @classmethod
     def validate(cls) -> dict:
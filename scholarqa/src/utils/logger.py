@@ -2,6 +2,7 @@
 Sistema de logging mejorado y estructurado
 """
 
+import copy
 import logging
 import sys
 from pathlib import Path
@@ -21,10 +22,52 @@ class ColoredFormatter(logging.Formatter):
         'RESET': '\033[0m'        # Reset
     }
     
-    def format(self, record):
+    def formatMessage(self, record):
+        # El registro es compartido con los demás handlers (p. ej. el de
+        # archivo): se colorea una copia y el original no se modifica nunca
+        colored = copy.copy(record)
         log_color = self.COLORS.get(record.levelname, self.COLORS['RESET'])
-        record.levelname = f"{log_color}{record.levelname}{self.COLORS['RESET']}"
-        return super().format(record)
+        colored.levelname = f"{log_color}{record.levelname}{self.COLORS['RESET']}"
+        return super().formatMessage(colored)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    Handler de archivo que no vuelca a disco en cada registro
+    
+    Los mensajes se acumulan en el buffer del fichero y solo se fuerza el
+    volcado con niveles >= flush_level; logging.shutdown (registrado con
+    atexit por el módulo logging) vacía el resto al terminar el proceso.
+    """
+    
+    def __init__(self, filename, buffer_size: int = 65536,
+                 flush_level: int = logging.WARNING, encoding: str = 'utf-8'):
+        """
+        Args:
+            filename: Ruta del archivo de log
+            buffer_size: Tamaño del buffer de escritura en bytes
+            flush_level: Nivel a partir del cual se vuelca inmediatamente
+            encoding: Codificación del archivo
+        """
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        super().__init__(filename, encoding=encoding)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= self.flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
 
 
 def setup_logging(log_level: str = "INFO", 
@@ -69,7 +112,7 @@ def setup_logging(log_level: str = "INFO",
         log_file = Path(log_file)
         log_file.parent.mkdir(parents=True, exist_ok=True)
         
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler = BufferedFileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(logging.DEBUG)  # Guardar todo en archivo
         file_formatter = logging.Formatter(log_format, datefmt=date_format)
         file_handler.setFormatter(file_formatter)
@@ -6,6 +6,12 @@ from pathlib import Path
 from typing import Optional, List
 import re
 
+# Patrón de sanitize_text compilado una sola vez
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]')
+# Los mismos caracteres restringidos a ASCII (los C1 0x80-0x9f no aparecen
+# en texto ASCII), para bytes.translate
+_ASCII_CONTROL_BYTES = bytes([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f])
+
 
 class ValidationError(Exception):
     """Error de validación"""
@@ -36,32 +42,37 @@ class FileValidator:
             'warnings': []
         }
         
-        # Verificar existencia
-        if not file_path.exists():
+        # Verificar existencia (un único stat da también el tamaño)
+        try:
+            file_size = file_path.stat().st_size
+        except (FileNotFoundError, NotADirectoryError):
             result['valid'] = False
             result['errors'].append('El archivo no existe')
             return result
         
-        # Verificar extensión
-        if file_path.suffix.lower() != '.pdf':
+        # Verificar extensión (equivale a suffix.lower() == '.pdf' sin calcular
+        # el sufijo: '.pdf' a secas es un archivo oculto sin extensión)
+        name = file_path.name
+        if len(name) <= 4 or name[-4:].lower() != '.pdf':
             result['valid'] = False
             result['errors'].append('El archivo debe ser PDF')
             return result
         
         # Verificar tamaño
-        file_size_mb = file_path.stat().st_size / 1024 / 1024
-        if file_size_mb > max_size_mb:
+        max_size = max_size_mb * 1024 * 1024
+        if file_size > max_size:
             result['valid'] = False
             result['errors'].append(f'El archivo excede {max_size_mb}MB')
             return result
         
-        if file_size_mb == 0:
+        if file_size == 0:
             result['valid'] = False
             result['errors'].append('El archivo está vacío')
             return result
         
         # Advertencias
-        if file_size_mb > max_size_mb * 0.8:
+        if file_size > max_size * 0.8:
+            file_size_mb = file_size / 1024 / 1024
             result['warnings'].append(f'El archivo es grande ({file_size_mb:.1f}MB)')
         
         return result
@@ -91,13 +102,12 @@ class TextValidator:
             'warnings': []
         }
         
-        if not question or not question.strip():
+        question = question.strip() if question else ''
+        if not question:
             result['valid'] = False
             result['errors'].append('La pregunta no puede estar vacía')
             return result
         
-        question = question.strip()
-        
         if len(question) < min_length:
             result['valid'] = False
             result['errors'].append(f'La pregunta debe tener al menos {min_length} caracteres')
@@ -122,13 +132,16 @@ class TextValidator:
         if not text:
             return ""
         
-        # Eliminar caracteres de control
-        text = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-        
-        # Normalizar espacios
-        text = re.sub(r'\s+', ' ', text)
+        # Eliminar caracteres de control. isascii() es O(1) y en texto ASCII
+        # bytes.translate borra sin pasar por el motor de regex
+        if text.isascii():
+            text = text.encode('ascii').translate(None, _ASCII_CONTROL_BYTES).decode('ascii')
+        else:
+            text = _CONTROL_CHARS.sub('', text)
         
-        return text.strip()
+        # Normalizar espacios: split() sin argumentos separa por rachas de
+        # espacios en blanco y descarta los extremos en una sola pasada
+        return ' '.join(text.split())
 
 
 class ConfigValidator:
@@ -0,0 +1,35 @@
+"""
+Punto de entrada WSGI para servir ScholarQA con gunicorn
+"""
+
+from pathlib import Path
+import logging
+import sys
+
+# Añadir src al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import app as app_module
+from app import app, create_embed_batchers, initialize_components
+
+logger = logging.getLogger(__name__)
+
+# Con preload_app los modelos se cargan una vez en el proceso maestro y los
+# workers los comparten copy-on-write tras el fork
+initialize_components()
+
+
+def restart_background_threads():
+    """
+    Recrea los hilos de fondo en un worker recién creado
+    
+    Los hilos no sobreviven al fork: los batchers del maestro quedan sin
+    consumidor en el worker y hay que arrancar unos nuevos.
+    """
+    if app_module.embedding_engine is None:
+        return
+    
+    app_module.embed_batcher, app_module.ingest_batcher = create_embed_batchers(
+        app_module.embedding_engine
+    )
+    logger.info("EmbedBatchers reiniciados en el worker")
@@ -0,0 +1,22 @@
+"""
+Fixtures compartidas por los tests
+"""
+
+import pytest
+from pathlib import Path
+import sys
+
+# Añadir src al path (una sola vez para todos los módulos de tests)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+
+@pytest.fixture(scope="session")
+def embedding_engine():
+    """
+    Motor de embeddings cargado una sola vez por sesión
+    
+    Cargar el modelo domina el tiempo de los tests; los tests que cambian
+    atributos del motor deben hacerlo con monkeypatch.
+    """
+    from core.embeddings import EmbeddingEngine
+    return EmbeddingEngine("sentence-transformers/all-MiniLM-L6-v2")
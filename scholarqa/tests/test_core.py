@@ -4,15 +4,10 @@ Tests para los componentes core de ScholarQA
 
 import pytest
 from pathlib import Path
-import sys
 import tempfile
 import shutil
 
-# Añadir src al path
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
-
 from core.pdf_processor import PDFProcessor
-from core.embeddings import EmbeddingEngine
 from core.vector_store import VectorStore
 
 
@@ -49,10 +44,10 @@ class TestPDFProcessor:
 class TestEmbeddingEngine:
     """Tests para EmbeddingEngine"""
     
-    def setup_method(self):
-        """Setup para cada test"""
-        # Usar un modelo pequeño para tests
-        self.engine = EmbeddingEngine("sentence-transformers/all-MiniLM-L6-v2")
+    @pytest.fixture(autouse=True)
+    def setup(self, embedding_engine):
+        """Setup para cada test (modelo compartido por la sesión)"""
+        self.engine = embedding_engine
     
     def test_encode_single(self):
         """Test encoding de un texto"""
@@ -140,15 +135,20 @@ class TestVectorStore:
 class TestIntegration:
     """Tests de integración"""
     
-    def setup_method(self):
-        """Setup para tests de integración"""
+    @pytest.fixture(autouse=True)
+    def setup(self, embedding_engine):
+        """Setup para tests de integración (cleanup tras el yield)"""
         self.temp_dir = tempfile.mkdtemp()
         self.processor = PDFProcessor()
-        self.embedding_engine = EmbeddingEngine("sentence-transformers/all-MiniLM-L6-v2")
-        self.vector_store = VectorStore(self.temp_dir, "integration_test")
-    
-    def teardown_method(self):
-        """Cleanup"""
+        self.embedding_engine = embedding_engine
+        self.vector_store = VectorStore(
+            self.temp_dir,
+            "integration_test",
+            embedding_engine=self.embedding_engine
+        )
+        
+        yield
+        
         if Path(self.temp_dir).exists():
             shutil.rmtree(self.temp_dir)
     
@@ -7,13 +7,17 @@ from pathlib import Path
 import sys
 import tempfile
 import shutil
-
-# Añadir src al path
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+import logging
+import threading
+from concurrent.futures import Future
+import numpy as np
 
 from core.text_splitter import SemanticTextSplitter, RecursiveTextSplitter
 from core.cache_manager import CacheManager, EmbeddingCache
-from core.pdf_processor import PDFProcessor
+from core.semantic_cache import SemanticCache
+from core.exact_cache import ExactCache
+from core.embed_batcher import EmbedBatcher
+from core.pdf_processor import PDFProcessor, parse_parser_rules
 from core.embeddings import EmbeddingEngine
 from core.vector_store import VectorStore
 
@@ -45,6 +49,14 @@ class TestSemanticTextSplitter:
         chunks = splitter.split_text("")
         
         assert len(chunks) == 0
+    
+    def test_iter_chunks_matches_split_text(self):
+        """Test chunking semántico en streaming con párrafos partidos entre páginas"""
+        text = ("Introducción breve.\n\n" + "Resultados. " * 30 + "\n\nConclusión final.\n\n") * 3
+        pages = [text[:37], text[37:401], text[401:402], text[402:]]
+        splitter = SemanticTextSplitter(chunk_size=120, chunk_overlap=20)
+        
+        assert list(splitter.iter_chunks(pages)) == splitter.split_text(text)
 
 
 class TestRecursiveTextSplitter:
@@ -65,6 +77,30 @@ class TestRecursiveTextSplitter:
         chunks = splitter.split_text(text)
         
         assert len(chunks) > 1
+    
+    def test_iter_chunks_is_lazy(self):
+        """Test generador de chunks equivalente a split_text"""
+        text = "Line one.\nLine two, longer.\n\n" * 20
+        splitter = RecursiveTextSplitter(chunk_size=30, chunk_overlap=5)
+        
+        chunks = splitter.iter_chunks(text)
+        
+        assert next(chunks) == splitter.split_text(text)[0]
+        assert [splitter.split_text(text)[0]] + list(chunks) == splitter.split_text(text)
+    
+    def test_split_by_length_rejects_non_positive_step(self):
+        """Test overlap >= chunk_size rechazado en vez de bucle infinito"""
+        splitter = RecursiveTextSplitter(chunk_size=10, chunk_overlap=10)
+        
+        with pytest.raises(ValueError):
+            splitter._split_by_length("x" * 50)
+    
+    def test_unbroken_word_split_by_slices(self):
+        """Test palabras sin separadores divididas en trozos consecutivos"""
+        text = "a" * 25 + " " + "b" * 70
+        splitter = RecursiveTextSplitter(chunk_size=30, chunk_overlap=5)
+        
+        assert splitter.split_text(text) == ["a" * 25, "b" * 30, "b" * 30, "b" * 10]
 
 
 class TestCacheManager:
@@ -113,6 +149,84 @@ class TestCacheManager:
         stats = self.cache.get_stats()
         
         assert stats['memory_items'] == 2
+    
+    def test_memory_lru_eviction(self):
+        """Test límite LRU de la caché en memoria"""
+        cache = CacheManager(ttl=60, max_memory_items=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert list(cache.memory_cache) == ["a", "c"]
+        assert cache.get("b") is None
+    
+    def test_memory_layer_thread_safe(self):
+        """Test get/set concurrentes con desalojo LRU y barridos en memoria"""
+        cache = CacheManager(ttl=60, max_memory_items=20)
+        cache.SWEEP_INTERVAL = 10
+        errors = []
+        
+        def worker(n):
+            try:
+                for i in range(5000):
+                    key = f"k{(i * 7 + n) % 64}"
+                    if i % 2:
+                        cache.set(key, i)
+                    else:
+                        cache.get(key)
+            except Exception as e:
+                errors.append(e)
+        
+        # Cambios de hilo muy frecuentes para provocar el entrelazado
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        
+        assert errors == []
+        assert len(cache.memory_cache) <= 20
+    
+    def test_disk_sharding(self):
+        """Test que los archivos se reparten por prefijo de la clave"""
+        key = self.cache._generate_key("test", "shard")
+        self.cache.set(key, "value")
+        
+        assert (self.temp_dir / key[:2] / f"{key[2:]}.pkl").exists()
+        assert self.cache.get_stats()['disk_items'] == 1
+        
+        # Una instancia nueva lee desde disco
+        assert CacheManager(cache_dir=self.temp_dir, ttl=60).get(key) == "value"
+    
+    def test_legacy_flat_files_removed(self):
+        """Test que los archivos del formato plano anterior se eliminan al arrancar"""
+        key = self.cache._generate_key("test", "shard")
+        self.cache.set(key, "value")
+        legacy_file = self.temp_dir / f"{'ab' * 32}.pkl"
+        legacy_file.write_bytes(b"legacy")
+        
+        cache = CacheManager(cache_dir=self.temp_dir, ttl=60)
+        
+        assert not legacy_file.exists()
+        assert cache.get(key) == "value"
+        assert cache.get_stats()['disk_items'] == 1
+    
+    def test_array_roundtrip_from_disk(self):
+        """Test arrays numpy guardados en formato binario y leídos desde disco"""
+        key = self.cache._generate_key("embedding", "text")
+        embedding = np.random.rand(384).astype(np.float32)
+        
+        self.cache.set(key, embedding)
+        cached = CacheManager(cache_dir=self.temp_dir, ttl=60).get(key)
+        
+        assert cached.dtype == np.float32
+        assert np.array_equal(cached, embedding)
 
 
 class TestEmbeddingCache:
@@ -137,6 +251,170 @@ class TestEmbeddingCache:
         cached = self.emb_cache.get_embedding(text)
         
         assert cached == embedding
+    
+    def test_batch_embeddings_partial_hits(self):
+        """Test batch con aciertos parciales e índices de fallos"""
+        self.emb_cache.set_embedding("a", [1.0])
+        self.emb_cache.set_embedding("c", [3.0])
+        
+        embeddings, miss_indices = self.emb_cache.get_batch_embeddings(["a", "b", "c", "d"])
+        
+        assert embeddings == [[1.0], None, [3.0], None]
+        assert miss_indices == [1, 3]
+    
+    def test_int8_quantized_storage(self):
+        """Test embeddings numpy guardados en int8 y recuperados en float32"""
+        embedding = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+        embedding /= np.linalg.norm(embedding)
+        self.emb_cache.set_embedding("q", embedding)
+        
+        reloaded = EmbeddingCache(cache_dir=self.temp_dir)
+        quantized = reloaded.get_embedding("q", dequantize=False)
+        restored = reloaded.get_embedding("q")
+        
+        assert quantized.values.dtype == np.int8
+        assert restored.dtype == np.float32
+        assert float(restored @ embedding) > 0.999
+
+
+class TestSemanticCache:
+    """Tests para la caché semántica de respuestas"""
+    
+    def setup_method(self):
+        """Setup para cada test"""
+        self.cache = SemanticCache(dimension=4, ttl=60, max_items=2)
+    
+    def test_semantic_hit(self):
+        """Test hit con una pregunta casi idéntica"""
+        self.cache.add(np.array([1.0, 0.0, 0.0, 0.0]), {"answer": "A"})
+        
+        cached = self.cache.lookup(np.array([0.99, 0.05, 0.0, 0.0]), threshold=0.95)
+        
+        assert cached == {"answer": "A"}
+    
+    def test_semantic_miss(self):
+        """Test miss con una pregunta distinta"""
+        self.cache.add(np.array([1.0, 0.0, 0.0, 0.0]), {"answer": "A"})
+        
+        assert self.cache.lookup(np.array([0.0, 1.0, 0.0, 0.0])) is None
+    
+    def test_evicts_oldest(self):
+        """Test que se descarta la entrada más antigua al llenarse"""
+        self.cache.add(np.array([1.0, 0.0, 0.0, 0.0]), "A")
+        self.cache.add(np.array([0.0, 1.0, 0.0, 0.0]), "B")
+        self.cache.add(np.array([0.0, 0.0, 1.0, 0.0]), "C")
+        
+        assert self.cache.lookup(np.array([1.0, 0.0, 0.0, 0.0])) is None
+        assert self.cache.lookup(np.array([0.0, 0.0, 1.0, 0.0])) == "C"
+        assert self.cache.get_stats()['items'] == 2
+    
+    def test_half_precision_storage(self):
+        """Test almacenamiento en float16 sin perder el hit"""
+        rng = np.random.default_rng(0)
+        embedding = rng.standard_normal(384)
+        cache = SemanticCache(dimension=384)
+        cache.add(embedding, "A")
+        
+        assert cache._embeddings.dtype == np.float16
+        assert cache.lookup(embedding, threshold=0.999) == "A"
+    
+    def test_persists_across_instances(self):
+        """Test caché semántica guardada en disco y recargada"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "semantic_cache.npz"
+            SemanticCache(dimension=4, persist_path=path).add(
+                np.array([1.0, 0.0, 0.0, 0.0]), {"answer": "A"}
+            )
+            
+            reloaded = SemanticCache(dimension=4, persist_path=path)
+            assert reloaded.lookup(np.array([1.0, 0.01, 0.0, 0.0])) == {"answer": "A"}
+            
+            reloaded.clear()
+            assert not path.exists()
+
+    
+    def test_discards_cache_saved_for_other_collection_version(self):
+        """Test caché guardada descartada si la colección cambió"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "semantic_cache.npz"
+            SemanticCache(dimension=4, persist_path=path, index_version=10).add(
+                np.array([1.0, 0.0, 0.0, 0.0]), {"answer": "A"}
+            )
+            
+            assert SemanticCache(dimension=4, persist_path=path, index_version=10).get_stats()['items'] == 1
+            assert SemanticCache(dimension=4, persist_path=path, index_version=12).get_stats()['items'] == 0
+
+class TestExactCache:
+    """Tests para la caché exacta de preguntas"""
+    
+    def setup_method(self):
+        """Setup para cada test"""
+        self.cache = ExactCache(maxsize=10, ttl=60)
+    
+    def test_normalized_hit(self):
+        """Test hit ignorando mayúsculas y espacios extremos"""
+        self.cache.set("¿Qué es HNSW?", {"answer": "A"})
+        
+        assert self.cache.get("  ¿qué es hnsw? ") == {"answer": "A"}
+        assert self.cache.get_stats()['hits'] == 1
+    
+    def test_miss_and_clear(self):
+        """Test miss y limpieza"""
+        self.cache.set("pregunta", "A")
+        
+        assert self.cache.get("otra pregunta") is None
+        
+        self.cache.clear()
+        assert self.cache.get("pregunta") is None
+
+
+class _CountingEngine:
+    """Motor de embeddings mínimo que registra el tamaño de cada llamada"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def encode(self, texts, show_progress=False):
+        self.calls.append(len(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+class TestEmbedBatcher:
+    """Tests para el agrupador de embeddings"""
+    
+    def test_batches_concurrent_requests(self):
+        """Test que las peticiones se agrupan en lotes acotados"""
+        engine = _CountingEngine()
+        batcher = EmbedBatcher(engine, max_batch_size=4, max_wait_ms=50)
+        
+        try:
+            futures = [batcher.submit("x" * i) for i in range(10)]
+            results = [f.result(timeout=1.0) for f in futures]
+        finally:
+            batcher.close()
+        
+        assert [r[0] for r in results] == [float(i) for i in range(10)]
+        assert max(engine.calls) <= 4
+        assert sum(engine.calls) == 10
+        assert len(engine.calls) < 10
+    
+    def test_submit_many_coalesces_requests(self):
+        """Test que varias peticiones multi-texto comparten una llamada"""
+        engine = _CountingEngine()
+        batcher = EmbedBatcher(engine, max_batch_size=100, max_wait_ms=50)
+        
+        try:
+            first = batcher.submit_many(["a", "bb", "ccc"])
+            second = batcher.submit_many(["dddd", "eeeee"])
+            single = batcher.submit("ffffff")
+            results = [first.result(timeout=1.0), second.result(timeout=1.0), single.result(timeout=1.0)]
+        finally:
+            batcher.close()
+        
+        assert results[0][:, 0].tolist() == [1.0, 2.0, 3.0]
+        assert results[1][:, 0].tolist() == [4.0, 5.0]
+        assert results[2].tolist() == [6.0, 1.0]
+        assert engine.calls == [6]
 
 
 class TestOptimizedPDFProcessor:
@@ -168,17 +446,130 @@ class TestOptimizedPDFProcessor:
         """Test limpiar caché de páginas"""
         self.processor.clear_cache()
         assert len(self.processor._page_cache) == 0
+    
+    def test_text_cache_is_bounded(self):
+        """Test límite LRU de los textos completos en memoria"""
+        fitz = pytest.importorskip("fitz")
+        processor = PDFProcessor(max_cached_texts=2)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i in range(3):
+                paths.append(Path(temp_dir) / f"paper{i}.pdf")
+                doc = fitz.open()
+                doc.new_page().insert_text((50, 72), f"Documento {i}")
+                doc.save(paths[-1])
+                doc.close()
+            
+            for path in paths:
+                processor.extract_text(path)
+            
+            assert list(processor._page_cache) == [processor._get_file_hash(p) for p in paths[1:]]
+    
+    def test_process_reuses_open_document_metadata(self):
+        """Test metadatos cacheados al extraer el texto"""
+        fitz = pytest.importorskip("fitz")
+        processor = PDFProcessor()
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "paper.pdf"
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 72), "Documento")
+            doc.save(path)
+            doc.close()
+            
+            result = processor.process(path)
+            assert "Documento" in result['text']
+            assert result['metadata']['num_pages'] == 1
+            assert processor._get_file_hash(path) in processor._meta_cache
+            
+            result['metadata']['title'] = "modificado"
+            assert processor.extract_metadata(path)['title'] == "paper"
+    
+    def test_iter_chunks_matches_chunk_text(self):
+        """Test chunking en streaming equivalente al chunking completo"""
+        pages = ["Página uno. " * 40, "Página dos. " * 55, "Fin."]
+        
+        streamed = list(self.processor.iter_chunks(pages, chunk_size=100, chunk_overlap=20))
+        expected = self.processor.chunk_text("".join(pages), chunk_size=100, chunk_overlap=20)
+        
+        assert streamed == expected
+    
+    def test_parallel_extraction_matches_sequential(self):
+        """Test extracción por procesos idéntica a la secuencial"""
+        fitz = pytest.importorskip("fitz")
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_path = Path(temp_dir) / "paper.pdf"
+            doc = fitz.open()
+            for i in range(60):
+                doc.new_page().insert_text((50, 72), f"Página {i} de un artículo académico")
+            doc.save(pdf_path)
+            doc.close()
+            
+            sequential = self.processor.extract_text(pdf_path, use_cache=False, workers=1)
+            parallel = self.processor.extract_text(pdf_path, use_cache=False, workers=2)
+        
+        assert parallel == sequential
+        assert "Página 59" in parallel
+    
+    def test_parallel_pypdf_fallback_matches_sequential(self, monkeypatch):
+        """Test extracción por procesos con pypdf cuando falta PyMuPDF"""
+        fitz = pytest.importorskip("fitz")
+        from core import pdf_processor
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_path = Path(temp_dir) / "paper.pdf"
+            doc = fitz.open()
+            for i in range(60):
+                doc.new_page().insert_text((50, 72), f"Página {i} de un artículo académico")
+            doc.save(pdf_path)
+            doc.close()
+            
+            monkeypatch.setattr(pdf_processor, "fitz", None)
+            sequential = self.processor.extract_text(pdf_path, use_cache=False, workers=1)
+            parallel = self.processor.extract_text(pdf_path, use_cache=False, workers=2)
+        
+        assert parallel == sequential
+        assert "Página 59" in parallel
+    
+    def test_content_cache_skips_reextraction(self):
+        """Test caché de páginas por contenido: un PDF renombrado no se reanaliza"""
+        fitz = pytest.importorskip("fitz")
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_dir = Path(temp_dir)
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 72), "Contenido del artículo")
+            doc.save(temp_dir / "original.pdf")
+            doc.close()
+            shutil.copy(temp_dir / "original.pdf", temp_dir / "copia.pdf")
+            
+            processor = PDFProcessor(cache=CacheManager(temp_dir / "cache"))
+            first = processor.extract_text(temp_dir / "original.pdf", use_cache=False)
+            
+            processor._iter_pages_fitz = None  # Fallaría si se volviera a extraer
+            second = processor.extract_text(temp_dir / "copia.pdf", use_cache=False)
+        
+        assert second == first
+        assert "Contenido del artículo" in first
+    
+    def test_parser_rules_by_page_count(self):
+        """Test selección de estrategia de extracción según tamaño"""
+        processor = PDFProcessor(parser_rules=parse_parser_rules("500:50,*:100,50:0,200:25"))
+        
+        assert processor.parser_rules[0] == (50, 0)
+        assert [processor._pages_per_task(n) for n in (8, 50, 120, 400, 2000)] == [0, 0, 25, 50, 100]
 
 
 class TestOptimizedEmbeddingEngine:
     """Tests para el motor de embeddings optimizado"""
     
-    def setup_method(self):
-        """Setup para cada test"""
-        self.engine = EmbeddingEngine(
-            "sentence-transformers/all-MiniLM-L6-v2",
-            batch_size=16
-        )
+    @pytest.fixture(autouse=True)
+    def setup(self, embedding_engine, monkeypatch):
+        """Setup para cada test (modelo compartido por la sesión)"""
+        monkeypatch.setattr(embedding_engine, "batch_size", 16)
+        self.engine = embedding_engine
     
     def test_similarity(self):
         """Test cálculo de similitud"""
@@ -190,6 +581,18 @@ class TestOptimizedEmbeddingEngine:
         assert 0 <= similarity <= 1
         assert similarity > 0.5  # Textos similares
     
+    def test_normalized_similarity_skips_norms(self):
+        """Test coseno como producto escalar con embeddings normalizados"""
+        rng = np.random.default_rng(0)
+        a, b = rng.random((2, 384), dtype=np.float32)
+        a /= np.linalg.norm(a)
+        b /= np.linalg.norm(b)
+        
+        assert self.engine._sim == self.engine._cosine_fast
+        assert EmbeddingEngine._cosine_fast(a, b) == pytest.approx(
+            EmbeddingEngine._cosine_full(a, b), abs=1e-6
+        )
+    
     def test_find_most_similar(self):
         """Test búsqueda de textos similares"""
         query = "artificial intelligence"
@@ -204,6 +607,55 @@ class TestOptimizedEmbeddingEngine:
         assert len(results) == 2
         assert results[0][2] > results[1][2]  # Primer resultado más similar
     
+    def test_build_index_matches_brute_force(self):
+        """Test búsqueda sobre el índice de candidatos reutilizable"""
+        candidates = ["AI and machine learning", "Cooking recipes", "Neural networks"]
+        expected = self.engine.find_most_similar("artificial intelligence", candidates, top_k=2)
+        
+        self.engine.build_index(candidates)
+        results = self.engine.find_most_similar("artificial intelligence", top_k=2)
+        
+        assert [r[0] for r in results] == [r[0] for r in expected]
+        assert np.allclose([r[2] for r in results], [r[2] for r in expected], atol=1e-5)
+    
+    def test_memory_cache_reuses_embeddings(self, monkeypatch):
+        """Test caché en memoria de encode por hash del texto"""
+        monkeypatch.setattr(self.engine, "cache_size", 10)
+        texts = ["Cached text", "Another text", "Cached text"]
+        
+        first = self.engine.encode(texts)
+        encoded = self.engine.get_stats()['total_encoded']
+        second = self.engine.encode(texts)
+        
+        assert np.allclose(first, second)
+        assert np.allclose(first[0], first[2])
+        assert self.engine.get_stats()['total_encoded'] == encoded
+    
+    def test_autotune_bypasses_memory_cache(self, monkeypatch):
+        """Test que el ajuste de batch_size mide el modelo y no la caché"""
+        monkeypatch.setattr(self.engine, "cache_size", 10)
+        encode_model = self.engine._encode_model
+        calls = []
+        
+        def counting_encode_model(texts, batch_size, *args):
+            calls.append((batch_size, len(set(texts))))
+            return encode_model(texts, batch_size, *args)
+        
+        monkeypatch.setattr(self.engine, "_encode_model", counting_encode_model)
+        batch_size = self.engine.autotune_batch_size(candidates=(4, 8), num_samples=8)
+        
+        assert batch_size in (4, 8)
+        assert calls == [(4, 4), (4, 8), (8, 8)]
+    
+    def test_encode_pretokenized_matches_encode(self):
+        """Test embeddings desde ids tokenizados equivalentes a encode"""
+        texts = ["Short text", "A somewhat longer text about neural networks"]
+        
+        expected = self.engine.encode(texts)
+        pretokenized = self.engine.encode_pretokenized(self.engine.tokenize(texts))
+        
+        assert np.allclose(pretokenized, expected, atol=1e-5)
+    
     def test_get_stats(self):
         """Test obtener estadísticas"""
         self.engine.encode_single("Test text")
@@ -239,6 +691,17 @@ class TestOptimizedVectorStore:
         
         assert self.vector_store.get_collection_count() == 150
     
+    def test_add_documents_parallel_batches(self):
+        """Test inserción de lotes en paralelo con el embedding de ChromaDB"""
+        self.vector_store.add_workers = 3
+        texts = [f"Document {i}" for i in range(150)]
+        ids = [f"doc{i}" for i in range(150)]
+        
+        self.vector_store.add_documents(texts, [{"id": i} for i in range(150)], ids, batch_size=50)
+        
+        assert self.vector_store.get_collection_count() == 150
+        assert self.vector_store.get_document("doc120")['document'] == "Document 120"
+    
     def test_query_with_scores(self):
         """Test query con scores de relevancia"""
         texts = ["Machine learning", "Python programming", "Data science"]
@@ -251,6 +714,66 @@ class TestOptimizedVectorStore:
         assert len(results) > 0
         assert 'relevance_score' in results[0]
     
+    def test_query_batch(self):
+        """Test varias consultas en una sola llamada"""
+        texts = ["Machine learning", "Python programming", "Data science"]
+        self.vector_store.add_documents(texts, [{"topic": t} for t in texts])
+        
+        batched = self.vector_store.query_batch(["machine learning", "python"], n_results=2)
+        
+        assert len(batched) == 2
+        assert batched[0] == self.vector_store.query_with_scores("machine learning", n_results=2)
+        assert batched[1] == self.vector_store.query_with_scores("python", n_results=2)
+        assert self.vector_store.query_batch([]) == []
+    
+    def test_query_by_vector(self):
+        """Test búsqueda con un embedding precalculado"""
+        texts = ["Alpha", "Beta", "Gamma"]
+        metadatas = [{"n": i} for i in range(3)]
+        
+        self.vector_store.add_documents(texts, metadatas, embeddings=np.eye(3))
+        
+        results = self.vector_store.query_by_vector(np.array([0.1, 0.9, 0.0]), n_results=1)
+        
+        assert results['documents'][0] == ["Beta"]
+    
+    def test_query_by_vector_exact_rescoring(self):
+        """Test que el top-n coincide con el coseno exacto sobre los candidatos"""
+        rng = np.random.default_rng(0)
+        embeddings = rng.standard_normal((40, 8)).astype(np.float32)
+        texts = [f"Doc {i}" for i in range(40)]
+        metadatas = [{"n": i} for i in range(40)]
+        ids = [f"id_{i}" for i in range(40)]
+        
+        self.vector_store.add_documents(texts, metadatas, ids, embeddings=embeddings)
+        
+        query = rng.standard_normal(8).astype(np.float32)
+        results = self.vector_store.query_by_vector(query, n_results=3)
+        
+        cosine = (embeddings @ query) / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+        expected = [f"id_{i}" for i in np.argsort(-cosine)[:3]]
+        
+        assert results['ids'][0] == expected
+        assert results['embeddings'] is None
+    
+    def test_token_ids_sidecar(self, embedding_engine):
+        """Test guardar y recuperar ids tokenizados junto a la colección"""
+        engine = embedding_engine
+        store = VectorStore(
+            self.temp_dir,
+            collection_name="test_tokens",
+            embedding_engine=engine,
+            cache_tokens=True
+        )
+        texts = ["Machine learning", "Python programming"]
+        
+        store.add_documents(texts, [{"n": 0}, {"n": 1}], ids=["a", "b"])
+        token_ids = store.load_token_ids()
+        
+        assert set(token_ids) == {"a", "b"}
+        assert np.array_equal(token_ids["a"], engine.tokenize(["Machine learning"])[0])
+        assert store.reembed_from_tokens() == 2
+    
     def test_update_document(self):
         """Test actualizar documento"""
         texts = ["Original text"]
@@ -277,6 +800,30 @@ class TestOptimizedVectorStore:
         
         assert self.vector_store.get_collection_count() == 2
     
+    def test_get_existing_ids(self):
+        """Test comprobar IDs ya indexados"""
+        self.vector_store.add_documents(["Doc 1", "Doc 2"], [{"id": 0}, {"id": 1}], ["doc1", "doc2"])
+        
+        assert self.vector_store.get_existing_ids(["doc1", "doc3", "doc2"]) == {"doc1", "doc2"}
+        assert self.vector_store.get_existing_ids([]) == set()
+    
+    def test_generated_ids_unique_across_batches(self):
+        """Test IDs generados sin colisiones entre lotes consecutivos"""
+        self.vector_store.add_documents(["Doc 1", "Doc 2"], [{"id": 0}, {"id": 1}])
+        self.vector_store.add_documents(["Doc 3", "Doc 4"], [{"id": 2}, {"id": 3}])
+        
+        assert self.vector_store.get_collection_count() == 4
+    
+    def test_collection_count_cache_invalidated(self):
+        """Test conteo cacheado que se invalida al escribir"""
+        self.vector_store.add_documents(["Doc 1", "Doc 2"], [{"id": 0}, {"id": 1}], ["doc1", "doc2"])
+        assert self.vector_store.get_collection_count() == 2
+        assert self.vector_store._count_cache == 2
+        
+        self.vector_store.delete_documents(["doc1"])
+        assert self.vector_store._count_cache is None
+        assert self.vector_store.get_collection_count() == 1
+        
     def test_get_stats(self):
         """Test obtener estadísticas"""
         texts = ["Doc 1", "Doc 2"]
@@ -290,12 +837,202 @@ class TestOptimizedVectorStore:
         assert stats['total_adds'] == 2
 
 
+class _FailingLastInsertStore:
+    """Vector store falso cuya inserción del último lote falla"""
+    
+    def __init__(self, fail_on: str):
+        self.fail_on = fail_on
+    
+    def get_existing_ids(self, ids):
+        return set()
+    
+    def add_documents(self, texts, metadatas, ids, embeddings=None):
+        if self.fail_on in texts:
+            raise RuntimeError("fallo al insertar")
+
+
+class _ImmediateBatcher:
+    """EmbedBatcher falso que resuelve cada lote al momento"""
+    
+    def submit_many(self, texts):
+        future = Future()
+        future.set_result(np.zeros((len(texts), 4), dtype=np.float32))
+        return future
+
+
+class TestIngestPipeline:
+    """Tests para la indexación en streaming de app._ingest_pdf"""
+    
+    def test_failed_last_insert_does_not_hang(self, monkeypatch):
+        """Test que un fallo en la última inserción se propaga sin bloquearse"""
+        import app
+        
+        class Processor:
+            def iter_pages(self, filepath, workers=None):
+                return []
+            
+            def iter_chunks(self, pages, chunk_size, chunk_overlap):
+                return iter(["c1", "c2", "c3"])
+            
+            def extract_metadata(self, filepath):
+                return {'title': "Paper"}
+        
+        monkeypatch.setattr(app, "pdf_processor", Processor())
+        monkeypatch.setattr(app, "vector_store", _FailingLastInsertStore("c3"))
+        monkeypatch.setattr(app, "ingest_batcher", _ImmediateBatcher())
+        monkeypatch.setattr(app.Config, "CHROMA_BATCH_SIZE", 1)
+        
+        errors = []
+        
+        def run():
+            try:
+                app._ingest_pdf(Path("paper.pdf"), "paper.pdf")
+            except RuntimeError as e:
+                errors.append(e)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        
+        assert not thread.is_alive()
+        assert len(errors) == 1
+    
+    def test_large_document_uses_parallel_encode(self, monkeypatch):
+        """Test que pasado el umbral los lotes se agrupan para el pool de procesos"""
+        import app
+        
+        chunks = [f"c{i}" for i in range(12)]
+        
+        class Processor:
+            def iter_pages(self, filepath, workers=None):
+                return []
+            
+            def iter_chunks(self, pages, chunk_size, chunk_overlap):
+                return iter(chunks)
+            
+            def extract_metadata(self, filepath):
+                return {'title': "Paper"}
+        
+        class Engine:
+            def __init__(self):
+                self.sizes = []
+            
+            def encode_parallel(self, texts, num_workers=4):
+                self.sizes.append(len(texts))
+                return np.zeros((len(texts), 4), dtype=np.float32)
+        
+        class Batcher(_ImmediateBatcher):
+            def __init__(self):
+                self.sizes = []
+            
+            def submit_many(self, texts):
+                self.sizes.append(len(texts))
+                return super().submit_many(texts)
+        
+        engine, batcher = Engine(), Batcher()
+        monkeypatch.setattr(app, "pdf_processor", Processor())
+        monkeypatch.setattr(app, "vector_store", _FailingLastInsertStore("ninguno"))
+        monkeypatch.setattr(app, "embedding_engine", engine)
+        monkeypatch.setattr(app, "ingest_batcher", batcher)
+        monkeypatch.setattr(app.Config, "CHROMA_BATCH_SIZE", 2)
+        monkeypatch.setattr(app.Config, "PARALLEL_ENCODE_THRESHOLD", 4)
+        
+        added, skipped, _ = app._ingest_pdf(Path("paper.pdf"), "paper.pdf")
+        
+        assert (added, skipped) == (12, 0)
+        assert batcher.sizes == [2, 2]
+        assert engine.sizes == [4, 4]
+    
+    def test_ingest_opens_pdf_once(self, monkeypatch):
+        """Test que los metadatos salen de la apertura que extrae las páginas"""
+        fitz = pytest.importorskip("fitz")
+        import app
+        
+        class Store:
+            def __init__(self):
+                self.metadatas = []
+            
+            def get_existing_ids(self, ids):
+                return set()
+            
+            def add_documents(self, texts, metadatas, ids, embeddings=None):
+                self.metadatas.extend(metadatas)
+        
+        opened = []
+        fitz_open = fitz.open
+        
+        def counting_open(*args, **kwargs):
+            if args:
+                opened.append(args[0])
+            return fitz_open(*args, **kwargs)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "paper.pdf"
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 72), "Documento " * 30)
+            doc.set_metadata({'title': "Un artículo"})
+            doc.save(path)
+            doc.close()
+            
+            store = Store()
+            monkeypatch.setattr(app, "pdf_processor", PDFProcessor(max_workers=1))
+            monkeypatch.setattr(app, "vector_store", store)
+            monkeypatch.setattr(app, "ingest_batcher", _ImmediateBatcher())
+            monkeypatch.setattr(fitz, "open", counting_open)
+            
+            added, skipped, metadata = app._ingest_pdf(path, "paper.pdf")
+        
+        assert added > 0 and skipped == 0
+        assert metadata['title'] == "Un artículo"
+        assert {m['title'] for m in store.metadatas} == {"Un artículo"}
+        assert len(opened) == 1
+
+
+
+class TestAskEndpoint:
+    """Tests para /api/ask"""
+    
+    def test_ef_search_validation_and_cache_bypass(self, monkeypatch):
+        """Test ef_search booleano rechazado y cachés ignoradas con un ef_search propio"""
+        import app
+        
+        class LLM:
+            def answer_question(self, question, context_chunks, max_tokens=None):
+                return {'answer': "R", 'context_used': len(context_chunks)}
+        
+        class Store:
+            def query_by_vector(self, embedding, n_results, ef_search):
+                return {'documents': [["doc"]], 'metadatas': [[{'source': "paper.pdf"}]]}
+        
+        class Batcher:
+            def submit(self, text):
+                future = Future()
+                future.set_result(np.ones(4, dtype=np.float32))
+                return future
+        
+        exact_cache = ExactCache(maxsize=10, ttl=60)
+        monkeypatch.setattr(app, "initialize_components", lambda *args: None)
+        monkeypatch.setattr(app, "llm_engine", LLM())
+        monkeypatch.setattr(app, "vector_store", Store())
+        monkeypatch.setattr(app, "embed_batcher", Batcher())
+        monkeypatch.setattr(app, "exact_cache", exact_cache)
+        monkeypatch.setattr(app, "semantic_cache", None)
+        monkeypatch.setattr(app, "reranker", None)
+        client = app.app.test_client()
+        
+        assert client.post('/api/ask', json={'question': "q", 'ef_search': True}).status_code == 400
+        
+        client.post('/api/ask', json={'question': "q"})
+        assert client.post('/api/ask', json={'question': "q"}).get_json()['cache_hit']
+        assert not client.post('/api/ask', json={'question': "q", 'ef_search': 500}).get_json()['cache_hit']
+
 class TestPerformance:
     """Tests de rendimiento"""
     
-    def test_large_batch_embeddings(self):
+    def test_large_batch_embeddings(self, embedding_engine, monkeypatch):
         """Test procesamiento de lote grande de embeddings"""
-        engine = EmbeddingEngine(batch_size=64)
+        monkeypatch.setattr(embedding_engine, "batch_size", 64)
+        engine = embedding_engine
         
         texts = [f"Text number {i}" for i in range(200)]
         
@@ -321,6 +1058,22 @@ class TestPerformance:
         
         assert len(chunks) > 0
         assert elapsed < 5  # Debería ser rápido
+    
+    def test_log_performance_logs_when_function_raises(self, caplog):
+        """Test que los decoradores registran la medición aunque la función falle"""
+        from utils.performance import timeit, log_performance
+        
+        def failing():
+            raise RuntimeError("fallo")
+        
+        with caplog.at_level(logging.DEBUG, logger="utils.performance"):
+            for decorator in (timeit, log_performance):
+                with pytest.raises(RuntimeError):
+                    decorator(failing)()
+        
+        messages = [record.getMessage() for record in caplog.records]
+        assert any(m.startswith("failing ejecutado en") for m in messages)
+        assert any(m.startswith("failing: tiempo=") for m in messages)
 
 
 if __name__ == "__main__":